@@ -1 +1,4 @@
-__version__ = '1.5'
\ No newline at end of file
+__version__ = '1.5'
+
+from .api import HolmesGeo, HolmesGeoConfig, CSVSink, NDJSONSink
+from .utils.records import IPRecord
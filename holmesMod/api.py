@@ -0,0 +1,133 @@
+import csv
+import json
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from .utils.bogon import load_bogon_table
+from .utils.engine import EnrichmentEngine
+from .utils.ip_checker import quiet_output, _user_agent_at
+from .utils.records import record_schema
+
+DEFAULT_CACHE_SIZE = 100000
+
+
+class HolmesGeoConfig(NamedTuple):
+    virtot: bool = False
+    no_rdns: bool = False
+    include_bogons: bool = False
+    bogon_list: Optional[str] = None
+    cache_size: int = DEFAULT_CACHE_SIZE
+
+
+# ── Sinks ─────────────────────────────────────────────────────────────────────
+# A sink receives every record HolmesGeo.enrich yields: write(record, schema), then close().
+
+class CSVSink:
+    # CSV with the same columns and 'N/A' placeholders as the CLI output
+    def __init__(self, path_or_file):
+        self._owns_file = isinstance(path_or_file, str)
+        self._file = open(path_or_file, 'w', newline='') if self._owns_file else path_or_file
+        self._writer = csv.writer(self._file)
+        self._header_written = False
+
+    def write(self, record, schema):
+        if not self._header_written:
+            self._writer.writerow(schema.header)
+            self._header_written = True
+        self._writer.writerow(schema.to_row(record))
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+
+
+class NDJSONSink:
+    # One JSON object per record; missing values are null
+    def __init__(self, path_or_file):
+        self._owns_file = isinstance(path_or_file, str)
+        self._file = open(path_or_file, 'w') if self._owns_file else path_or_file
+
+    def write(self, record, schema):
+        values = dict(zip(schema.header, schema.values(record)))
+        self._file.write(json.dumps(values) + '\n')
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+
+
+# ── Library entry point ───────────────────────────────────────────────────────
+
+class HolmesGeo:
+    # Enrichment without side effects: nothing is printed, no result or log files are
+    # created and no logging is configured. Results come back as IPRecord tuples, and
+    # output only happens through sinks the caller attaches.
+    #
+    #     with HolmesGeo(HolmesGeoConfig(no_rdns=True)) as geo:
+    #         for record in geo.enrich(["8.8.8.8", "example.com"]):
+    #             print(record.ip, record.country, record.asn_org)
+
+    def __init__(self, config=None, sinks=(), readers=None, outsrc_index=None):
+        self.config = config or HolmesGeoConfig()
+        self.sinks = list(sinks)
+        with quiet_output():
+            self._engine = EnrichmentEngine(self.config.virtot, self.config.no_rdns, readers, outsrc_index)
+        self._bogons = None if self.config.include_bogons else load_bogon_table(self.config.bogon_list)
+        self._records = OrderedDict()
+        self.stats = {'enriched': 0, 'failed': 0, 'bogon': 0, 'cached': 0}
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def schema(self, user_agents=None):
+        return record_schema(self.config.no_rdns, self.config.virtot, user_agents is not None)
+
+    def _lookup(self, entry):
+        if entry in self._records:
+            self._records.move_to_end(entry)
+            self.stats['cached'] += 1
+            return self._records[entry]
+        with quiet_output():
+            record = self._engine.enrich_record(entry)
+        self._records[entry] = record
+        if len(self._records) > self.config.cache_size:
+            self._records.popitem(last=False)
+        return record
+
+    def enrich_one(self, entry, user_agent=None):
+        # IPRecord for one IP or domain, or None for private/reserved or unresolvable entries
+        entry = str(entry).strip()
+        if self._bogons and self._bogons.classify(entry):
+            self.stats['bogon'] += 1
+            return None
+        record = self._lookup(entry)
+        if record is None:
+            self.stats['failed'] += 1
+            return None
+        self.stats['enriched'] += 1
+        return record._replace(user_agent=user_agent) if user_agent is not None else record
+
+    def enrich(self, entries, user_agents=None):
+        # Lazily yield an IPRecord per entry that could be enriched, in input order.
+        # entries may be any iterable (a list, a file, a generator over a socket ...).
+        # As in the CSV, entries past the end of user_agents get "N/A".
+        schema = self.schema(user_agents)
+        for i, entry in enumerate(entries):
+            record = self.enrich_one(entry, _user_agent_at(user_agents, i))
+            if record is None:
+                continue
+            for sink in self.sinks:
+                sink.write(record, schema)
+            yield record
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+        self._engine.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,24 +1,124 @@
 import sys
 import os
 from termcolor import colored
-from holmesMod.utils.cli import parse_arguments, display_banner
-from holmesMod.utils.ip_ext import apache_ipext, csv_ipext, read_stdin_ips
+from holmesMod.utils.cli import parse_arguments, display_banner, display_guides
+from holmesMod.utils.ip_ext import (apache_ipext, csv_ipext, read_stdin_ips, iter_apache_records,
+                                    resolve_time_window, iter_line_entries, iter_csv_ips)
+from holmesMod.utils.aggregate import aggregate_apache
 from holmesMod.utils.ip_checker import ipcheck_mod, get_ssl_registrar
 from holmesMod.utils.file_utils import get_output_path
-from holmesMod.utils.config import ensure_dirs_exist, setup_logging
+from holmesMod.utils.config import ensure_dirs_exist, setup_logging, RESULTS_DIR
+from holmesMod.utils.server import serve
+from holmesMod.utils.bogon import BogonFilter, load_bogon_table
+from holmesMod.utils.sketch import find_heavy_hitters, report_heavy_hitters
+from holmesMod.utils.stream import stream_stdin
+from holmesMod.utils.profiling import run_profiled
+from holmesMod.utils.workqueue import open_queue, run_worker
+from holmesMod.utils.extdedup import dedup_external, UniqueOnlyCache
+from holmesMod.utils.pipeline import run_pipeline, parse_stage_workers
+from holmesMod.utils.cache import caches, parse_cache_limits
+from holmesMod.utils.multifile import expand_inputs, iter_apache_files, merged_output_name, run_multi
 
 def main():
     ensure_dirs_exist()
-    logger = setup_logging()
-    display_banner()
     args = parse_arguments()
+    # In streaming mode stdout carries only results; banner and guides are skipped
+    logger = setup_logging(stream=sys.stderr if args.stream else None)
+    if not args.stream:
+        display_banner()
+        display_guides()
+
+    if args.profile == "sample" and args.pipeline:
+        # The sampler only sees the main thread, where the pipeline just waits for results
+        colored_print("[!] Error: --profile sample cannot profile --pipeline stages; use --profile.", "red", "bold")
+        sys.exit(1)
+    if args.profile or args.profile_memory:
+        run_profiled(lambda: run(args), RESULTS_DIR, args.profile or "cprofile", console=sys.stderr if args.stream else None,
+                     memory=args.profile_memory)
+    else:
+        run(args)
+
+def run(args):
+    try:
+        for name, capacity in parse_cache_limits(args.cache_limits).items():
+            caches.configure(name, capacity=capacity)
+    except ValueError as e:
+        colored_print(f"[!] Error: {e}", "red", "bold")
+        sys.exit(1)
+
+    if args.pipeline:
+        unsupported = [flag for flag, used in (
+            ("--resume", args.resume), ("--incremental", args.incremental), ("--workers", args.workers > 1),
+            ("--coordinator", args.coordinator), ("--vt-budget", args.vt_budget is not None),
+        ) if used]
+        if unsupported:
+            colored_print(f"[!] Error: {', '.join(unsupported)} cannot be combined with --pipeline.", "red", "bold")
+            sys.exit(1)
+
+    if args.vt_budget is not None and (args.workers > 1 or args.coordinator):
+        # The budget is spent by the in-process VirusTotal plan, which sharded runs do not use
+        colored_print("[!] Error: --vt-budget cannot be combined with --workers or --coordinator.", "red", "bold")
+        sys.exit(1)
+
+    if not args.incremental:
+        ignored = [flag for flag, used in (
+            ("--max-age", args.max_age is not None), ("--refresh-on-db-update", args.refresh_on_db_update),
+        ) if used]
+        if ignored:
+            colored_print(f"[!] Error: {', '.join(ignored)} only apply with --incremental.", "red", "bold")
+            sys.exit(1)
+
+    if args.serve:
+        serve(args.serve, args.virtot, no_rdns=args.no_rdns, cache_size=args.cache_size,
+              db_check_interval=args.db_check_interval)
+        return
+
+    if args.worker:
+        run_worker(open_queue(args.worker), lease_seconds=args.lease_seconds)
+        return
     
+    bogons = None
+    if not args.include_bogons:
+        try:
+            bogons = BogonFilter(load_bogon_table(args.bogon_list))
+        except OSError as e:
+            colored_print(f"[!] Error: Cannot read bogon list {e.filename}: {e.strerror}", "red", "bold")
+            sys.exit(1)
+
+    run_opts = dict(
+        no_rdns=args.no_rdns,
+        no_output=args.no_output,
+        resume=args.resume,
+        checkpoint_every=args.checkpoint_every,
+        incremental=args.incremental,
+        max_age_hours=args.max_age,
+        refresh_on_db_update=args.refresh_on_db_update,
+        workers=args.workers,
+        bogons=bogons,
+        work_queue=open_queue(args.coordinator) if args.coordinator else None,
+        vt_budget=args.vt_budget,
+    )
+
+    if args.stream:
+        stream_stdin(sys.stdout, args.virtot, no_rdns=args.no_rdns, ndjson=args.ndjson,
+                     bogons=run_opts['bogons'], cache_size=args.cache_size)
+        return
+
     is_piped_input = not sys.stdin.isatty()
+    if is_piped_input and args.top is not None:
+        run_top_k(iter_line_entries(sys.stdin), get_output_path(), args, run_opts)
+        return
+    if is_piped_input and args.pipeline:
+        run_pipelined("stdin", [], get_output_path(), args, run_opts)
+        return
+    if is_piped_input and args.dedup_memory:
+        run_external_dedup(iter_line_entries(sys.stdin), get_output_path(), args, run_opts)
+        return
     if is_piped_input:
         ips = read_stdin_ips()
         if ips:
             outp = get_output_path()
-            ipcheck_mod(ips, outp, args.virtot, no_rdns=args.no_rdns, no_output=args.no_output)
+            ipcheck_mod(ips, outp, args.virtot, **run_opts)
         else:
             colored_print("[!] No valid IP addresses received from stdin.", "red", "bold")
         return
@@ -31,32 +131,148 @@ def main():
         colored_print(f"[!] Error: File path is required for '{args.mode}' mode.", "red", "bold")
         sys.exit(1)
         
-    outp = get_output_path(args.file)
+    # A directory, a quoted pattern or several paths: one shared cache across all files
+    files = expand_inputs(args.inputs)
+    if not files:
+        colored_print(f"[!] Error: No input files match {' '.join(args.inputs)}.", "red", "bold")
+        sys.exit(1)
+    multi = len(files) > 1
+    args.file = files[0]
+    outp = get_output_path(merged_output_name(files) if multi else args.file)
+
+    since = until = None
+    if args.since or args.until:
+        if args.mode != "apache":
+            colored_print("[!] Error: --since/--until are only supported with --apache.", "red", "bold")
+            sys.exit(1)
+    if (args.since or args.until) and not multi:
+        try:
+            since, until = resolve_time_window(args.file, args.since, args.until)
+        except FileNotFoundError:
+            colored_print(f"[!] Error: File {args.file} not found.", "red", "bold")
+            return
+        except ValueError as e:
+            colored_print(f"[!] Error: {e}", "red", "bold")
+            sys.exit(1)
+        colored_print(f"[+] Time window: {since or 'start of log'} to {until or 'end of log'}", "green")
         
+    if args.aggregate:
+        if args.mode != "apache":
+            colored_print("[!] Error: --aggregate is only supported with --apache.", "red", "bold")
+            sys.exit(1)
+        bucket = None if args.aggregate == "total" else args.aggregate
+        records = iter_apache_files(files, args.since, args.until) if multi else iter_apache_records(args.file, since, until)
+        try:
+            aggregate_apache(records, outp, bucket, no_rdns=args.no_rdns,
+                             no_output=args.no_output, bogons=run_opts['bogons'])
+        except FileNotFoundError:
+            colored_print(f"[!] Error: File {args.file} not found.", "red", "bold")
+        return
+
+    if args.top is not None:
+        if args.mode != "apache":
+            colored_print("[!] Error: --top is only supported with --apache or piped input.", "red", "bold")
+            sys.exit(1)
+        try:
+            records = iter_apache_files(files, args.since, args.until) if multi else iter_apache_records(args.file, since, until)
+            run_top_k((ip for ip, _, _ in records), outp, args, run_opts)
+        except FileNotFoundError:
+            colored_print(f"[!] Error: File {args.file} not found.", "red", "bold")
+        return
+
+    if args.dedup_memory:
+        if args.mode == "apache":
+            colored_print("[!] Error: --dedup-memory is only supported with --csv, --check or piped input.", "red", "bold")
+            sys.exit(1)
+        try:
+            run_external_dedup(iter_file_entries(args.mode, files, args.column), outp, args, run_opts)
+        except FileNotFoundError as e:
+            colored_print(f"[!] Error: File {e.filename} not found.", "red", "bold")
+        return
+
+    if args.pipeline:
+        if since or until or args.since or args.until:
+            colored_print("[!] Error: --since/--until are not supported with --pipeline.", "red", "bold")
+            sys.exit(1)
+        run_pipelined(args.mode, files, outp, args, run_opts)
+        return
+
+    if multi:
+        def ipcheck(ips, output_path, user_agents, cache):
+            # Each output gets its own bogon counters, so its summary only covers its entries
+            opts = dict(run_opts, bogons=BogonFilter(bogons.table) if bogons else None)
+            ipcheck_mod(ips, output_path, args.virtot, user_agents, cache=cache, **opts)
+
+        run_multi(args.mode, files, ipcheck, get_output_path, per_file=args.per_file,
+                  column=args.column, since=args.since, until=args.until)
+        return
+
     if args.mode == "apache":
-        result = apache_ipext(args.file)
+        result = apache_ipext(args.file, since, until)
         if isinstance(result, tuple) and len(result) == 2:
             ips, user_agents = result
             if ips:
-                ipcheck_mod(ips, outp, args.virtot, user_agents, no_rdns=args.no_rdns, no_output=args.no_output)
+                ipcheck_mod(ips, outp, args.virtot, user_agents, **run_opts)
         else:
             ips = result
             if ips:
-                ipcheck_mod(ips, outp, args.virtot, no_rdns=args.no_rdns, no_output=args.no_output)
+                ipcheck_mod(ips, outp, args.virtot, **run_opts)
     
     elif args.mode == "csv":
         ips = csv_ipext(args.file, args.column)
         if ips:
-            ipcheck_mod(ips, outp, args.virtot, no_rdns=args.no_rdns, no_output=args.no_output)
+            ipcheck_mod(ips, outp, args.virtot, **run_opts)
     
     elif args.mode == "check":
         try:
             with open(args.file, 'r') as ip_file:
                 ips = ip_file.readlines()
-                ipcheck_mod(ips, outp, args.virtot, no_rdns=args.no_rdns, no_output=args.no_output)
+                ipcheck_mod(ips, outp, args.virtot, **run_opts)
         except FileNotFoundError:
             colored_print(f"[!] Error: File {args.file} not found.", "red", "bold")
 
+def run_top_k(entries, outp, args, run_opts):
+    # Count every entry in a fixed-size sketch, then enrich only the heaviest hitters
+    top, total, distinct = find_heavy_hitters(entries, args.top)
+    if not top:
+        colored_print("[!] No valid IP addresses found in the input.", "red", "bold")
+        return
+    report_heavy_hitters(top, total, distinct)
+    ipcheck_mod([entry for entry, _, _ in top], outp, args.virtot, **run_opts)
+
+def iter_file_entries(mode, files, column=None):
+    # Raw (not deduplicated) entries of CSV or IP-list files, read chunk by chunk
+    for path in files:
+        if mode == "csv":
+            for ips in iter_csv_ips(path, column):
+                yield from ips
+        else:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                yield from f
+
+def run_external_dedup(entries, outp, args, run_opts):
+    # Deduplicate out of core, then enrich each unique entry exactly once; the unique
+    # entries are read back from disk, so neither list has to fit in memory (which is
+    # also why VirusTotal calls are made per entry here rather than planned up front)
+    with dedup_external(entries, args.dedup_memory, keep_order=not args.dedup_sorted) as unique:
+        if not len(unique):
+            colored_print("[!] No valid IP addresses found in the input.", "red", "bold")
+            return
+        ipcheck_mod(unique, outp, args.virtot, cache=UniqueOnlyCache(), vt_plan=False, **run_opts)
+
+def run_pipelined(mode, files, outp, args, run_opts):
+    try:
+        stage_workers = parse_stage_workers(args.stage_workers)
+    except ValueError as e:
+        colored_print(f"[!] Error: {e}", "red", "bold")
+        sys.exit(1)
+    try:
+        run_pipeline(mode, files, outp, args.virtot, no_rdns=args.no_rdns, no_output=args.no_output,
+                     bogons=run_opts['bogons'], column=args.column, stage_workers=stage_workers,
+                     queue_size=args.queue_size)
+    except FileNotFoundError as e:
+        colored_print(f"[!] Error: File {e.filename} not found.", "red", "bold")
+
 def colored_print(message, color, style=None):
     print(colored(message, color, attrs=[style] if style else []))
 
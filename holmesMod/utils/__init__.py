@@ -1,4 +1,4 @@
 from termcolor import colored
 
-def colored_print(message, color, style=None):
-    print(colored(message, color, attrs=[style] if style else []))
\ No newline at end of file
+def colored_print(message, color, style=None, file=None):
+    print(colored(message, color, attrs=[style] if style else []), file=file)
\ No newline at end of file
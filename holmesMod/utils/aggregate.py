@@ -0,0 +1,152 @@
+import os
+import csv
+from collections import Counter
+
+import pandas as pd
+
+from . import colored_print
+from .engine import EnrichmentEngine
+from .records import FIELD_BY_COLUMN, MISSING
+from .ip_checker import setup_logger, _get_log_path, logger
+
+# Dimension name -> (summary column label, header column(s) used to build its key)
+DIMENSIONS = {
+    'country': ('Country', ('Country',)),
+    'asn': ('ASN', ('ASN Number', 'ASN Organization')),
+    'network': ('Network', ('Network',)),
+    'category': ('IP Category', ('IP Category',)),
+}
+BUCKET_FORMATS = {
+    'minute': '%Y-%m-%d %H:%M',
+    'hour': '%Y-%m-%d %H:00',
+}
+UNKNOWN = 'Unknown'
+
+
+class Aggregator:
+    # Running hit counters keyed by enriched attributes, overall and per time bucket.
+    # Each distinct IP is enriched once; memory grows with distinct IPs and keys,
+    # never with the number of log lines.
+
+    def __init__(self, engine, bucket=None, bogons=None):
+        self.engine = engine
+        self.bogons = bogons
+        self.bucket_format = BUCKET_FORMATS.get(bucket)
+        self.fields = {
+            dimension: [FIELD_BY_COLUMN[column] for column in columns]
+            for dimension, (_, columns) in DIMENSIONS.items()
+        }
+        self._keys = {}
+        self.totals = {dimension: Counter() for dimension in DIMENSIONS}
+        self.unique_ips = {dimension: Counter() for dimension in DIMENSIONS}
+        self.timeline = {dimension: Counter() for dimension in DIMENSIONS}
+        self.lines = 0
+
+    def _keys_for(self, ip):
+        keys = self._keys.get(ip)
+        if keys is None:
+            # Private/reserved sources are grouped under their range label, not enriched
+            label = self.bogons.check(ip) if self.bogons else None
+            record = self.engine.enrich_record(ip) if label is None else None
+            keys = {}
+            for dimension, fields in self.fields.items():
+                if label is not None:
+                    keys[dimension] = label
+                elif record is None:
+                    keys[dimension] = UNKNOWN
+                else:
+                    values = (getattr(record, field) for field in fields)
+                    keys[dimension] = ' '.join(MISSING if value is None else str(value) for value in values)
+                self.unique_ips[dimension][keys[dimension]] += 1
+            self._keys[ip] = keys
+        return keys
+
+    @property
+    def distinct_ips(self):
+        return len(self._keys)
+
+    def add(self, ip, timestamp=None):
+        self.lines += 1
+        keys = self._keys_for(ip)
+        bucket = timestamp.strftime(self.bucket_format) if self.bucket_format and timestamp else None
+        for dimension, key in keys.items():
+            self.totals[dimension][key] += 1
+            if bucket:
+                self.timeline[dimension][(bucket, key)] += 1
+
+    def tables(self):
+        # name -> (columns, rows) for every summary table
+        tables = {}
+        for dimension, (label, _) in DIMENSIONS.items():
+            rows = [
+                (key, hits, self.unique_ips[dimension][key])
+                for key, hits in self.totals[dimension].most_common()
+            ]
+            tables[dimension] = ([label, 'Hits', 'Unique IPs'], rows)
+            if self.bucket_format:
+                rows = [
+                    (bucket, key, hits)
+                    for (bucket, key), hits in sorted(self.timeline[dimension].items())
+                ]
+                tables[f'{dimension}_timeline'] = (['Bucket', label, 'Hits'], rows)
+        return tables
+
+
+def _summary_base(output_file_path):
+    # <name>_ipinfo, or <name>_ipinfo_v{i} when an earlier summary already exists
+    base_path = os.path.splitext(output_file_path)[0]
+    candidate, i = base_path, 1
+    while os.path.exists(f'{candidate}_agg.xlsx'):
+        candidate = f'{base_path}_v{i}'
+        i += 1
+    return candidate
+
+
+def aggregate_apache(records, output_file_path, bucket=None, no_rdns=False, no_output=False, top=10, bogons=None):
+    # records: iterable of (ip, user_agent, timestamp) as produced by iter_apache_records
+    base_path = _summary_base(output_file_path)
+    log_path = _get_log_path(base_path + '.csv')
+    setup_logger(log_path)
+    logger.info(f"Aggregation session started (bucket: {bucket or 'none'}).")
+
+    with EnrichmentEngine(no_rdns=no_rdns) as engine:
+        aggregator = Aggregator(engine, bucket, bogons)
+        for ip, _, timestamp in records:
+            aggregator.add(ip, timestamp)
+
+    tables = aggregator.tables()
+
+    colored_print(f"\n[AGGREGATE] {aggregator.lines} log lines, {aggregator.distinct_ips} distinct IPs", 'yellow', 'bold')
+    for dimension in DIMENSIONS:
+        columns, rows = tables[dimension]
+        colored_print(f"\n[+] Top {top} by {dimension}", 'green', 'bold')
+        print(f"{columns[0]:<45} {columns[1]:>10} {columns[2]:>11}")
+        for key, hits, unique in rows[:top]:
+            print(f"{key[:45]:<45} {hits:>10} {unique:>11}")
+
+    logger.info(f"Aggregation complete. Lines: {aggregator.lines}, distinct IPs: {aggregator.distinct_ips}")
+    if no_output:
+        colored_print(f'\n[LOG] Error log saved to: {log_path}', 'cyan', 'bold')
+        return tables
+
+    written = []
+    for name, (columns, rows) in tables.items():
+        path = f'{base_path}_agg_{name}.csv'
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        written.append(path)
+
+    excel_file = f'{base_path}_agg.xlsx'
+    with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
+        for name, (columns, rows) in tables.items():
+            pd.DataFrame(rows, columns=columns).to_excel(writer, sheet_name=name[:31], index=False)
+
+    colored_print('\n[STAGE-1]', 'yellow', 'bold')
+    for path in written:
+        print(f'Summary saved to: {path}')
+    colored_print(f'[LOG] Error log saved to: {log_path}', 'red', 'bold')
+    colored_print('[STAGE-2]', 'magenta', 'bold')
+    print(f'Summary saved to: {excel_file}')
+    return tables
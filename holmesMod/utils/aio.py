@@ -0,0 +1,205 @@
+import asyncio
+import ipaddress
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .ip_checker import (
+    _build_header,
+    _enrich_resolved,
+    _report_unresolved,
+    get_ssl_registrar,
+    open_geo_readers,
+    close_geo_readers,
+    load_outsrc_index,
+)
+from .records import nullable, record_schema
+from .cache import acached
+
+DEFAULT_CONCURRENCY = 100
+DEFAULT_VT_CONCURRENCY = 4
+
+
+# ── Async DNS ─────────────────────────────────────────────────────────────────
+# The resolver calls themselves are blocking libc calls run in an executor (asyncio has
+# no native DNS client), so the number of lookups in flight is capped by the executor's
+# threads. Results share the rdns and dns caches of the synchronous code, and cache hits
+# never leave the event loop.
+
+@acached('rdns', key=lambda ip, executor=None: (ip,))
+async def async_rdns(ip, executor=None):
+    loop = asyncio.get_running_loop()
+    try:
+        hostname, _, _ = await loop.run_in_executor(executor, socket.gethostbyaddr, ip)
+        return hostname
+    except (socket.herror, socket.gaierror):
+        return "N/A"
+
+
+@acached('dns', key=lambda name, executor=None: (name,))
+async def async_resolve_host(name, executor=None):
+    # IPv4 address of a hostname, or None when it does not resolve
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor, socket.gethostbyname, name)
+    except socket.gaierror:
+        return None
+
+
+async def _async_resolve_entry(entry, no_rdns, executor=None):
+    # Async counterpart of ip_checker._resolve_entry
+    domain = None
+    try:
+        ipaddress.ip_address(entry)
+        ip = entry
+        rev_dns = await async_rdns(ip, executor) if not no_rdns else "N/A"
+        if rev_dns != "N/A":
+            domain = rev_dns
+    except ValueError:
+        domain = entry
+        ip = await async_resolve_host(entry, executor)
+        if ip is None:
+            return None, domain, "N/A"
+        rev_dns = await async_rdns(ip, executor) if not no_rdns else "N/A"
+    return ip, domain, rev_dns
+
+
+# ── Engine ────────────────────────────────────────────────────────────────────
+
+class AsyncEnrichmentEngine:
+    # Batch enrichment for asyncio applications. This is an asyncio front-end over the
+    # blocking lookups, not a non-blocking client: DNS, GeoIP, category and VirusTotal
+    # calls run on a thread pool. Unless an executor is passed in, the engine owns one
+    # with `concurrency` threads, so every entry in flight has a thread to run on.
+    # VirusTotal calls are capped separately (across every caller of this engine) so a
+    # slow API cannot hold every slot. Results are yielded as they complete.
+
+    def __init__(self, virtot=False, no_rdns=False, concurrency=DEFAULT_CONCURRENCY,
+                 vt_concurrency=DEFAULT_VT_CONCURRENCY, readers=None, outsrc_index=None, executor=None):
+        self.virtot = virtot
+        self.no_rdns = no_rdns
+        self.concurrency = concurrency
+        self.vt_concurrency = vt_concurrency
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='holmesgeo-aio')
+        self._owns_readers = readers is None
+        self.readers = readers if readers is not None else open_geo_readers()
+        self.outsrc_index = outsrc_index if outsrc_index is not None else load_outsrc_index()
+        self._vt_slots = None
+
+    def _vt_semaphore(self):
+        # One semaphore per engine, created on the loop that first needs it
+        loop = asyncio.get_running_loop()
+        if self._vt_slots is None or self._vt_slots[0] is not loop:
+            self._vt_slots = (loop, asyncio.Semaphore(self.vt_concurrency))
+        return self._vt_slots[1]
+
+    def header(self, user_agents=None):
+        return _build_header(self.no_rdns, self.virtot, user_agents)
+
+    def schema(self, user_agents=None):
+        return record_schema(self.no_rdns, self.virtot, user_agents is not None)
+
+    async def enrich_record(self, entry, user_agent=None, vt_slots=None):
+        # Return the IPRecord for one entry, or None when it cannot be enriched
+        loop = asyncio.get_running_loop()
+        entry = entry.strip()
+
+        ip, domain, rev_dns = await _async_resolve_entry(entry, self.no_rdns, self.executor)
+        if ip is None:
+            await loop.run_in_executor(self.executor, _report_unresolved, entry, self.outsrc_index)
+            return None
+
+        record, error = await loop.run_in_executor(
+            self.executor,
+            partial(_enrich_resolved, ip, domain, rev_dns, self.no_rdns, self.readers, self.outsrc_index),
+        )
+        if error:
+            return None
+
+        if self.virtot:
+            async with vt_slots or self._vt_semaphore():
+                cert_cn, registrar = await loop.run_in_executor(
+                    self.executor, get_ssl_registrar, domain if domain else ip
+                )
+            record = record._replace(certificate_cn=nullable(cert_cn), registrar=nullable(registrar))
+
+        if user_agent is not None:
+            record = record._replace(user_agent=user_agent)
+        return record
+
+    async def enrich_entry(self, entry, user_agent=None, vt_slots=None):
+        # Return the row list for one entry, or None when it cannot be enriched
+        record = await self.enrich_record(entry, user_agent, vt_slots)
+        if record is None:
+            return None
+        return self.schema([] if user_agent is not None else None).to_row(record)
+
+    async def enrich(self, entries, user_agents=None):
+        # Async iterator of (index, entry, record-or-None) in completion order.
+        # entries may be a regular or an async iterable; at most `concurrency` entries
+        # are in flight, so large inputs are consumed lazily.
+        schema = self.schema(user_agents)
+        pending = {}
+
+        async def run(idx, entry):
+            user_agent = None
+            if user_agents is not None:
+                user_agent = user_agents[idx] if idx < len(user_agents) else "N/A"
+            record = await self.enrich_record(entry, user_agent)
+            return idx, entry, schema.to_dict(record) if record is not None else None
+
+        source = _aiter_indexed(entries)
+        exhausted = False
+        try:
+            while pending or not exhausted:
+                while not exhausted and len(pending) < self.concurrency:
+                    try:
+                        idx, entry = await source.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    task = asyncio.ensure_future(run(idx, entry))
+                    pending[task] = idx
+
+                if not pending:
+                    break
+
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    del pending[task]
+                    yield task.result()
+        finally:
+            # The caller stopped iterating early (or failed): don't leave lookups running
+            for task in pending:
+                task.cancel()
+
+    async def enrich_all(self, entries, user_agents=None):
+        # Convenience wrapper: records in input order, failures dropped
+        results = [item async for item in self.enrich(entries, user_agents)]
+        results.sort(key=lambda item: item[0])
+        return [record for _, _, record in results if record is not None]
+
+    def close(self):
+        if self._owns_executor:
+            # Called from the event loop (__aexit__), so don't wait for stragglers
+            self.executor.shutdown(wait=False)
+        if self._owns_readers:
+            close_geo_readers(self.readers)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+async def _aiter_indexed(entries):
+    if hasattr(entries, '__aiter__'):
+        idx = 0
+        async for entry in entries:
+            yield idx, entry
+            idx += 1
+    else:
+        for idx, entry in enumerate(entries):
+            yield idx, entry
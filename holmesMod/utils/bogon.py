@@ -0,0 +1,117 @@
+import os
+import ipaddress
+from collections import Counter
+
+from .config import DB_DIR
+
+LOCAL_BOGON_LIST = os.path.join(DB_DIR, 'bogons.txt')
+
+# Special-purpose ranges (RFC 6890 and friends) that GeoIP databases never cover
+BUILTIN_RANGES = [
+    ('0.0.0.0/8', 'This Network'),
+    ('10.0.0.0/8', 'Private'),
+    ('100.64.0.0/10', 'CGNAT'),
+    ('127.0.0.0/8', 'Loopback'),
+    ('169.254.0.0/16', 'Link-Local'),
+    ('172.16.0.0/12', 'Private'),
+    ('192.0.0.0/24', 'IETF Protocol'),
+    ('192.0.2.0/24', 'Documentation'),
+    ('192.88.99.0/24', 'Reserved'),
+    ('192.168.0.0/16', 'Private'),
+    ('198.18.0.0/15', 'Benchmarking'),
+    ('198.51.100.0/24', 'Documentation'),
+    ('203.0.113.0/24', 'Documentation'),
+    ('224.0.0.0/4', 'Multicast'),
+    ('240.0.0.0/4', 'Reserved'),
+    ('255.255.255.255/32', 'Broadcast'),
+    ('::/128', 'Unspecified'),
+    ('::1/128', 'Loopback'),
+    ('::ffff:0:0/96', 'IPv4-Mapped'),
+    ('64:ff9b:1::/48', 'Private'),
+    ('100::/64', 'Discard'),
+    ('2001:db8::/32', 'Documentation'),
+    ('fc00::/7', 'Private'),
+    ('fe80::/10', 'Link-Local'),
+    ('ff00::/8', 'Multicast'),
+]
+
+
+class BogonTable:
+    # Precompiled range table: for each IP version, one dict per prefix length mapping the
+    # masked network integer to its label. A lookup tries the prefix lengths present in the
+    # table from most to least specific, so overlapping entries resolve to the narrowest one
+    # and cost stays a handful of dict probes no matter how many ranges are loaded.
+
+    def __init__(self, ranges=()):
+        self._tables = {4: {}, 6: {}}
+        for cidr, label in ranges:
+            self.add(cidr, label)
+
+    def add(self, cidr, label='Bogon'):
+        network = ipaddress.ip_network(cidr, strict=False)
+        by_prefix = self._tables[network.version].setdefault(network.prefixlen, {})
+        by_prefix[int(network.network_address) >> (network.max_prefixlen - network.prefixlen)] = label
+        self._compile()
+
+    def _compile(self):
+        self._order = {
+            version: sorted(tables.items(), key=lambda item: item[0], reverse=True)
+            for version, tables in self._tables.items()
+        }
+
+    def load_file(self, path):
+        # One CIDR or IP per line, optionally followed by a label; '#' starts a comment
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                parts = line.split(None, 1)
+                try:
+                    self.add(parts[0], parts[1].strip() if len(parts) > 1 else 'Bogon')
+                except ValueError:
+                    continue
+
+    def classify(self, entry):
+        # Label for an IP inside a listed range, or None (including for non-IP entries)
+        try:
+            ip = ipaddress.ip_address(entry.strip())
+        except ValueError:
+            return None
+        value = int(ip)
+        bits = ip.max_prefixlen
+        for prefixlen, networks in self._order[ip.version]:
+            label = networks.get(value >> (bits - prefixlen))
+            if label is not None:
+                return label
+        return None
+
+
+def load_bogon_table(extra_list=None):
+    table = BogonTable(BUILTIN_RANGES)
+    if os.path.isfile(LOCAL_BOGON_LIST):
+        table.load_file(LOCAL_BOGON_LIST)
+    if extra_list:
+        table.load_file(extra_list)
+    return table
+
+
+class BogonFilter:
+    # Counts entries sorted out by the pre-filter, per category
+
+    def __init__(self, table):
+        self.table = table
+        self.counts = Counter()
+
+    def check(self, entry):
+        label = self.table.classify(entry)
+        if label is not None:
+            self.counts[label] += 1
+        return label
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def summary(self):
+        return ", ".join(f"{label}: {count}" for label, count in self.counts.most_common())
@@ -0,0 +1,194 @@
+import time
+import logging
+import threading
+import functools
+from collections import OrderedDict
+
+from . import colored_print
+
+logger = logging.getLogger("ipcheck")
+
+# Namespace defaults: capacity (entries, 0 disables), ttl and negative_ttl (seconds, None
+# for no expiry, 0 to never store), and which values count as negative (failed lookups)
+DEFAULT_NAMESPACES = {
+    'rdns': dict(capacity=100000, ttl=3600, negative_ttl=300, negative=lambda value: value == "N/A"),
+    'dns': dict(capacity=100000, ttl=3600, negative_ttl=300, negative=lambda value: value is None),
+    'outsource': dict(capacity=200000, ttl=None),
+    'geoip': dict(capacity=200000, ttl=None),
+    # An empty VirusTotal answer may be a quota or network error, so it is not kept
+    'virustotal': dict(capacity=50000, ttl=86400, negative_ttl=0,
+                       negative=lambda value: tuple(value) == ("N/A", "N/A")),
+}
+
+
+class CacheNamespace:
+    # LRU map with optional expiry, safe to share between threads. Positive and negative
+    # results can have different lifetimes; hits, misses, evictions (capacity) and
+    # expirations (TTL) are counted for the run summary.
+    #
+    # clear() starts a new generation. A lookup that was already running when the cache
+    # was cleared passes the generation it started in to store(), and its (possibly
+    # stale) result is dropped instead of outliving the clear.
+
+    def __init__(self, name, capacity=100000, ttl=None, negative_ttl=None, negative=None):
+        self.name = name
+        self.capacity = capacity
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.negative = negative
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.expirations = self.negative_hits = 0
+
+    def lookup(self, key):
+        # (True, value) for a live entry, else (False, None)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                value, expires, is_negative = item
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.negative_hits += is_negative
+                    return True, value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def store(self, key, value, generation=None):
+        if not self.capacity:
+            return
+        is_negative = bool(self.negative and self.negative(value))
+        ttl = self.negative_ttl if is_negative else self.ttl
+        if ttl == 0:
+            return
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, expires, is_negative)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries), 'capacity': self.capacity, 'hits': self.hits, 'misses': self.misses,
+            'negative_hits': self.negative_hits, 'evictions': self.evictions, 'expirations': self.expirations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CacheRegistry:
+    # The process-wide set of namespaces. Namespaces are created on first use from
+    # DEFAULT_NAMESPACES, and configure() can resize them before or during a run.
+
+    def __init__(self, defaults=DEFAULT_NAMESPACES):
+        self._defaults = defaults
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def namespace(self, name):
+        namespace = self._namespaces.get(name)
+        if namespace is None:
+            with self._lock:
+                namespace = self._namespaces.get(name)
+                if namespace is None:
+                    namespace = self._namespaces[name] = CacheNamespace(name, **self._defaults.get(name, {}))
+        return namespace
+
+    def configure(self, name, **settings):
+        namespace = self.namespace(name)
+        for setting, value in settings.items():
+            setattr(namespace, setting, value)
+        return namespace
+
+    def clear(self, name=None):
+        for namespace in ([self.namespace(name)] if name else list(self._namespaces.values())):
+            namespace.clear()
+
+    def stats(self):
+        return {name: namespace.stats() for name, namespace in sorted(self._namespaces.items())}
+
+    def report(self, console=None):
+        # One line per namespace that saw lookups
+        lines = []
+        for name, stats in self.stats().items():
+            if stats['hits'] + stats['misses'] == 0:
+                continue
+            lines.append(f"{name}: {stats['hits']} hits ({stats['negative_hits']} negative), {stats['misses']} misses, "
+                         f"{stats['hit_rate']:.0%} hit rate, {stats['evictions']} evicted, {stats['expirations']} expired, "
+                         f"{stats['size']}/{stats['capacity']} entries")
+        if not lines:
+            return
+        colored_print("\n[CACHE] Lookup caches:", 'cyan', 'bold', file=console)
+        for line in lines:
+            colored_print(f"  {line}", 'cyan', file=console)
+            logger.info(f"Cache {line}")
+
+
+caches = CacheRegistry()
+
+
+def cached(name, key=None):
+    # Memoise func in namespace `name`. key(*args, **kwargs) builds the cache key (default:
+    # the positional arguments); exceptions are not cached.
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            namespace = caches.namespace(name)
+            cache_key = key(*args, **kwargs) if key else args
+            generation = namespace.generation
+            found, value = namespace.lookup(cache_key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            namespace.store(cache_key, value, generation)
+            return value
+        wrapper.uncached = func
+        return wrapper
+    return decorate
+
+
+def acached(name, key=None):
+    # cached() for coroutine functions: hits are answered on the event loop, and results
+    # share the namespace (and keys) of the synchronous lookups
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            namespace = caches.namespace(name)
+            cache_key = key(*args, **kwargs) if key else args
+            generation = namespace.generation
+            found, value = namespace.lookup(cache_key)
+            if found:
+                return value
+            value = await func(*args, **kwargs)
+            namespace.store(cache_key, value, generation)
+            return value
+        wrapper.uncached = func
+        return wrapper
+    return decorate
+
+
+def parse_cache_limits(spec):
+    # "rdns=50000,geoip=0" -> {'rdns': 50000, 'geoip': 0}
+    limits = {}
+    for part in filter(None, (spec or '').split(',')):
+        name, _, capacity = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_NAMESPACES or not capacity.strip().isdigit():
+            raise ValueError(f"Invalid cache limit '{part}' (namespaces: {', '.join(DEFAULT_NAMESPACES)})")
+        limits[name] = int(capacity)
+    return limits
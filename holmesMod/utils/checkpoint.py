@@ -0,0 +1,89 @@
+import os
+import json
+import glob
+import hashlib
+from datetime import datetime
+
+CHECKPOINT_SUFFIX = '.checkpoint.json'
+VT_RESULTS_SUFFIX = '.vt.jsonl'
+DEFAULT_CHECKPOINT_EVERY = 100
+
+
+def run_fingerprint(ip_list, header):
+    # Identify a run by its input entries and output columns, so a checkpoint is only
+    # resumed for the same input processed with the same options.
+    digest = hashlib.sha256()
+    digest.update('\x1f'.join(header).encode('utf-8'))
+    for entry in ip_list:
+        digest.update(b'\n')
+        digest.update(entry.strip().encode('utf-8', errors='replace'))
+    return digest.hexdigest()
+
+
+def checkpoint_path(output_file_path):
+    return output_file_path + CHECKPOINT_SUFFIX
+
+
+def save_checkpoint(output_file_path, fingerprint, total, completed, skipped, csv_bytes):
+    # csv_bytes is the flushed size of the CSV at this point; anything past it was
+    # written after the checkpoint and is truncated on resume.
+    state = {
+        'output': output_file_path,
+        'fingerprint': fingerprint,
+        'total': total,
+        'completed': completed,
+        'skipped': skipped,
+        'csv_bytes': csv_bytes,
+        'updated': datetime.now().isoformat(timespec='seconds'),
+    }
+    path = checkpoint_path(output_file_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def find_checkpoint(results_dir, fingerprint):
+    # Return the most recent checkpoint state for this fingerprint whose CSV still exists
+    candidates = []
+    for path in glob.glob(os.path.join(results_dir, f'*{CHECKPOINT_SUFFIX}')):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if state.get('fingerprint') == fingerprint and os.path.exists(state.get('output', '')):
+            candidates.append(state)
+
+    if not candidates:
+        return None
+    return max(candidates, key=lambda state: state['updated'])
+
+
+def vt_results_path(output_file_path):
+    # VirusTotal answers of a run, one JSON line per call, so --resume does not pay twice
+    return output_file_path + VT_RESULTS_SUFFIX
+
+
+def load_vt_results(path):
+    # target -> (certificate, registrar) from a results log; a line cut short by the
+    # interruption is ignored
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                target, certificate, registrar = json.loads(line)
+            except ValueError:
+                continue
+            results[target] = (certificate, registrar)
+    return results
+
+
+def clear_checkpoint(output_file_path):
+    for path in (checkpoint_path(output_file_path), vt_results_path(output_file_path)):
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,8 +1,18 @@
 import argparse
 from termcolor import colored
 
+description = "[#] HolmesGeo - A Simple Tool for IP Geolocation Check v4.0 [#]"
+description = description.replace('HolmesGeo', colored('HolmesGeo', 'red', attrs=['bold']))
+description = description.replace('A Simple Tool for IP Geolocation Check', colored('A Simple Tool for IP Geolocation Check', 'green', attrs=['bold']))
+
+def positive_int(value):
+    # argparse type for counts that must be at least 1
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a number >= 1, got {value}")
+    return number
+
 def display_banner():
-    global description
     ascii_art = r'''
                   .----.
       .---------. | == |
@@ -19,10 +29,6 @@ def display_banner():
     ascii_art = ascii_art.replace('ASIA', colored('ASIA', 'red', attrs=['bold']))
     print(colored(ascii_art, 'cyan', attrs=['bold']))
 
-    description = "[#] HolmesGeo - A Simple Tool for IP Geolocation Check v4.0 [#]"
-    description = description.replace('HolmesGeo', colored('HolmesGeo', 'red', attrs=['bold']))
-    description = description.replace('A Simple Tool for IP Geolocation Check', colored('A Simple Tool for IP Geolocation Check', 'green', attrs=['bold']))
-
 
 def display_guides():
 
@@ -37,7 +43,23 @@ def display_guides():
 | Additional Options:                                                          |
 |  - Use --no-rdns to disable reverse DNS lookups (speeds up processing).      |
 |  - Use --virtot to perform additional certificate and registrar lookup.      |
+|  - Use --vt-budget N to cap VirusTotal calls (busiest targets go first).     |
 |  - Use --no-output to skip file generation (console output only).            |
+|  - Use --resume to continue an interrupted run from its last checkpoint.     |
+|  - Use --workers N to enrich across N processes on multi-core hosts.         |
+|  - Use --coordinator/--worker QUEUE to spread one run over several hosts.    |
+|  - Use --pipeline to overlap reading, DNS waits and writing (threads).       |
+|  - Use --since/--until TIME to read one time window of an Apache log.        |
+|  - Use --top K to enrich only the K busiest IPs of a huge log or pipe.       |
+|  - Use --dedup-memory MB to dedupe inputs larger than RAM via spill files.   |
+|  - Pass several files, a directory or a quoted glob as one input.            |
+|  - Use --aggregate [minute|hour] for per-country/ASN hit counts (Apache).    |
+|  - Use --include-bogons to enrich private/reserved addresses as well.        |
+|  - Use --incremental to reuse rows from the previous result of this input.   |
+|  - Use --stream [--ndjson] to run as a pipeline stage (tail -F | ...).       |
+|  - Use --profile [sample] [--profile-memory] to find a run's hot spots.      |
+|  - Use --cache-limits rdns=N,... to size lookup caches (stats in summary).   |
+|  - Use --serve [ADDRESS] to run a lookup daemon with a JSON batch API.       |
 |                                                                              |
 | Usage Example:                                                               |
 | python3 -m holmesMod.main --apache apache.log                                |
@@ -47,12 +69,19 @@ def display_guides():
 | python3 -m holmesMod.main --check list_ip.txt --virtot                       |
 | python3 -m holmesMod.main --check list_ip.txt --no-rdns                      |
 | python3 -m holmesMod.main --check list_ip.txt --no-output                    |
+| python3 -m holmesMod.main --apache apache.log --since 02:00 --until 02:45    |
 | python3 -m holmesMod.main --apache apache.log --virtot                       |
+| python3 -m holmesMod.main --apache /var/log/apache2/ --per-file              |
 | python3 -m holmesMod.main --csv file.csv --virtot                            |
 | python3 -m holmesMod.main --csv file.csv --column source_ip --virtot         |
 | cat ip.txt | python3 -m holmesMod.main --virtot                              |
 | cat ip.txt | python3 -m holmesMod.main --no-rdns                             |
 | cat ip.txt | python3 -m holmesMod.main --no-output                           |
+| tail -F access.log | python3 -m holmesMod.main --stream --ndjson             |
+| python3 -m holmesMod.main --check big.txt --coordinator /shared/q.db         |
+| python3 -m holmesMod.main --worker /shared/q.db                              |
+| python3 -m holmesMod.main --serve 127.0.0.1:8787                             |
+| python3 -m holmesMod.main --serve unix:/run/holmesgeo.sock                   |
 |                                                                              |
 | ./chk.sh --check samples/iplist.txt                                          |
 | ./chk.sh --check samples/iplist.txt --no-rdns                                |
@@ -73,35 +102,109 @@ def parse_arguments():
     
     parser = argparse.ArgumentParser(description=description)
     input_group = parser.add_mutually_exclusive_group()
-    input_group.add_argument("--apache", metavar="FILE", 
-                        help="Extract IPs from an Apache log file")
-    input_group.add_argument("--csv", metavar="FILE", 
-                        help="Extract IPs from a CSV file")
-    input_group.add_argument("--check", metavar="FILE", 
-                        help="Perform IP check from a text file with one IP per line")
+    input_group.add_argument("--apache", metavar="PATH", nargs="+",
+                        help="Extract IPs from Apache log files (files, directories or quoted globs)")
+    input_group.add_argument("--csv", metavar="PATH", nargs="+",
+                        help="Extract IPs from CSV files (files, directories or quoted globs)")
+    input_group.add_argument("--check", metavar="PATH", nargs="+",
+                        help="Perform IP check from text files with one IP per line")
     
+    parser.add_argument("--per-file", action="store_true",
+                        help="With several input files, write one result per file instead of a merged one")
     parser.add_argument("--column", default=None, 
                         help="Column name containing IP addresses in CSV mode")
     parser.add_argument("--virtot", action="store_true",
                         help="Perform additional certificate and registrar lookup")
+    parser.add_argument("--vt-budget", type=int, default=None, metavar="N",
+                        help="With --virtot, make at most N VirusTotal calls, for the targets with the most hits")
     parser.add_argument("--no-rdns", action="store_true",
                         help="Disable reverse DNS lookups (speeds up processing)")
     parser.add_argument("--no-output", action="store_true",
                         help="Skip file generation and output results to console only")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run of the same input from its last checkpoint")
+    parser.add_argument("--checkpoint-every", type=int, default=100, metavar="N",
+                        help="Save a resumable checkpoint every N entries (0 disables, default 100)")
+    parser.add_argument("--workers", type=positive_int, default=1, metavar="N",
+                        help="Enrich unique entries across N worker processes (default 1)")
+    parser.add_argument("--coordinator", metavar="QUEUE", default=None,
+                        help="Split the unique entries into leased work units on a SQLite queue file and "
+                             "merge the results of --worker processes on other hosts into one output")
+    parser.add_argument("--worker", metavar="QUEUE", default=None,
+                        help="Enrich work units leased from a coordinator's queue file with this host's "
+                             "resolver and VirusTotal key until interrupted")
+    parser.add_argument("--lease-seconds", type=float, default=300, metavar="SECONDS",
+                        help="Worker mode: how long a leased unit may go without progress before the "
+                             "coordinator hands it to another worker (default 300)")
+    parser.add_argument("--dedup-memory", type=float, default=None, metavar="MB",
+                        help="CSV/check/stdin: deduplicate out of core within this memory budget "
+                             "(sorted spill files and a k-way merge) and enrich each unique entry once")
+    parser.add_argument("--dedup-sorted", action="store_true",
+                        help="With --dedup-memory, emit unique entries sorted by address instead of "
+                             "in first-seen order (saves the second merge pass)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Run read, extract, dedupe, enrich and write as concurrent stages connected by "
+                             "bounded queues, and report per-stage queue depth")
+    parser.add_argument("--stage-workers", metavar="SPEC", default=None,
+                        help="Pipeline mode: threads per stage, e.g. extract=2,enrich=32 (default extract=1,enrich=16)")
+    parser.add_argument("--queue-size", type=positive_int, default=8, metavar="N",
+                        help="Pipeline mode: batches each queue between two stages may hold (default 8)")
+    parser.add_argument("--include-bogons", action="store_true",
+                        help="Do not filter out private, reserved and bogon addresses before enrichment")
+    parser.add_argument("--bogon-list", metavar="FILE", default=None,
+                        help="Extra CIDR list (one per line, optional label) to treat as bogons")
+    parser.add_argument("--since", metavar="TIME", default=None,
+                        help="Apache mode: only read lines stamped at or after TIME "
+                             "(HH:MM, YYYY-MM-DD HH:MM or 10/Oct/2026:02:00:00 +0000)")
+    parser.add_argument("--until", metavar="TIME", default=None,
+                        help="Apache mode: only read lines stamped before TIME")
+    parser.add_argument("--top", type=positive_int, default=None, metavar="K",
+                        help="Apache/stdin: count hits in a fixed-size sketch and enrich only the K heaviest IPs")
+    parser.add_argument("--aggregate", nargs="?", const="total", choices=["total", "minute", "hour"],
+                        help="Apache mode: emit hit counts per country, ASN, network and category "
+                             "instead of one row per line, optionally per minute or hour")
+    parser.add_argument("--incremental", nargs="?", const="auto", metavar="PREVIOUS_CSV",
+                        help="Reuse rows for IPs already enriched in a previous result file "
+                             "(default: the latest result for the same input)")
+    parser.add_argument("--max-age", type=float, default=None, metavar="HOURS",
+                        help="In incremental mode, re-enrich rows older than this many hours")
+    parser.add_argument("--refresh-on-db-update", action="store_true",
+                        help="In incremental mode, re-enrich rows older than the current GeoIP database build")
+    parser.add_argument("--serve", nargs="?", const="127.0.0.1:8787", metavar="ADDRESS",
+                        help="Run as a lookup daemon on HOST:PORT or unix:/path/to.sock (default 127.0.0.1:8787)")
+    parser.add_argument("--cache-limits", metavar="SPEC", default=None,
+                        help="Capacity of the in-process lookup caches, e.g. rdns=50000,geoip=0 (0 disables; "
+                             "namespaces: rdns, dns, outsource, geoip, virustotal)")
+    parser.add_argument("--cache-size", type=int, default=100000,
+                        help="Number of enriched entries the lookup daemon keeps in memory")
+    parser.add_argument("--db-check-interval", type=float, default=60, metavar="SECONDS",
+                        help="How often the lookup daemon checks for updated GeoIP databases")
+    parser.add_argument("--stream", action="store_true",
+                        help="Enrich stdin line by line as it arrives and write each result immediately "
+                             "(only results go to stdout, everything else to stderr)")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Write one JSON object per line instead of CSV (implies --stream)")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=["cprofile", "sample"],
+                        help="Profile the run (cProfile, or a low-overhead stack sampler) "
+                             "and write a ranked report plus the raw profile next to the results")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Also trace allocations with tracemalloc (slow; implies --profile) and report "
+                             "the biggest allocation sites near the memory peak and at exit")
     
-    display_guides()
     args = parser.parse_args()
+    args.stream = args.stream or args.ndjson
     if args.apache:
         args.mode = "apache"
-        args.file = args.apache
+        args.inputs = args.apache
     elif args.csv:
         args.mode = "csv"
-        args.file = args.csv
+        args.inputs = args.csv
     elif args.check:
         args.mode = "check"
-        args.file = args.check
+        args.inputs = args.check
     else:
         args.mode = None
-        args.file = None
+        args.inputs = []
+    args.file = args.inputs[0] if args.inputs else None
     
     return args
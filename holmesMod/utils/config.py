@@ -15,13 +15,14 @@ SYSTEM_CITY_DB = os.path.join(SYSTEM_DB_DIR, 'GeoLite2-City.mmdb')
 SYSTEM_ASN_DB = os.path.join(SYSTEM_DB_DIR, 'GeoLite2-ASN.mmdb')
 SYSTEM_COUNTRY_DB = os.path.join(SYSTEM_DB_DIR, 'GeoLite2-Country.mmdb')
 
-def setup_logging(verbose=False):
+def setup_logging(verbose=False, stream=None):
+    # stream defaults to stdout; streaming mode keeps stdout for results and logs to stderr
     log_level = logging.DEBUG if verbose else logging.INFO
     logging.basicConfig(
         level=log_level,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         handlers=[
-            logging.StreamHandler(sys.stdout)
+            logging.StreamHandler(stream or sys.stdout)
         ]
     )
     return logging.getLogger('holmesMod')
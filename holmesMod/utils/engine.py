@@ -0,0 +1,70 @@
+from .ip_checker import (
+    _enrich_record,
+    _user_agent_at,
+    open_geo_readers,
+    close_geo_readers,
+    load_outsrc_index,
+)
+from .records import record_schema
+
+
+class EnrichmentEngine:
+    # In-process enrichment that yields one dict per enriched entry instead of CSV text.
+    # GeoIP readers and the outsource index can be passed in so long-lived callers
+    # (the Streamlit app, services) load them once and share them between runs.
+
+    def __init__(self, virtot=False, no_rdns=False, readers=None, outsrc_index=None):
+        self.virtot = virtot
+        self.no_rdns = no_rdns
+        self._owns_readers = readers is None
+        self.readers = readers if readers is not None else open_geo_readers()
+        self.outsrc_index = outsrc_index if outsrc_index is not None else load_outsrc_index()
+
+    def schema(self, user_agents=None):
+        return record_schema(self.no_rdns, self.virtot, user_agents is not None)
+
+    def header(self, user_agents=None):
+        return list(self.schema(user_agents).header)
+
+    def enrich_records(self, entries, user_agents=None):
+        # Yield IPRecords for the entries that could be enriched
+        for i, entry in enumerate(entries):
+            record, _ = _enrich_record(
+                entry, self.virtot, _user_agent_at(user_agents, i), self.no_rdns, self.readers, self.outsrc_index
+            )
+            if record is not None:
+                yield record
+
+    def enrich_record(self, entry, user_agent=None):
+        # Enrich a single entry as it arrives from a stream; returns an IPRecord or None
+        record, _ = _enrich_record(entry, self.virtot, user_agent, self.no_rdns, self.readers, self.outsrc_index)
+        return record
+
+    def enrich_rows(self, entries, user_agents=None):
+        # Yield the raw row lists, in the same column order as header()
+        schema = self.schema(user_agents)
+        for record in self.enrich_records(entries, user_agents):
+            yield schema.to_row(record)
+
+    def enrich_entry(self, entry, user_agent=None):
+        # Row-list form of enrich_record. Pass a user agent (even "N/A") to get the
+        # User Agent column, as in Apache mode.
+        record = self.enrich_record(entry, user_agent)
+        if record is None:
+            return None
+        return self.schema([] if user_agent is not None else None).to_row(record)
+
+    def enrich(self, entries, user_agents=None):
+        schema = self.schema(user_agents)
+        for record in self.enrich_records(entries, user_agents):
+            yield schema.to_dict(record)
+
+    def close(self):
+        if self._owns_readers:
+            close_geo_readers(self.readers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
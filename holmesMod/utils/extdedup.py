@@ -0,0 +1,242 @@
+import os
+import mmap
+import heapq
+import logging
+import socket
+import tempfile
+from collections.abc import Sequence
+
+from . import colored_print
+logger = logging.getLogger("ipcheck")
+
+DEFAULT_MEMORY_MB = 256
+READ_BLOCK = 1 << 16
+
+# Every entry is stored as a fixed-width record: a tag byte and 16 bytes of payload.
+# IPs (tag 0) are the address as a 128-bit big-endian integer, IPv4 as ::ffff:a.b.c.d,
+# so sorting records sorts addresses. Anything else (hostnames, tag 1) is kept once in
+# memory and its record holds its index in that list; such entries are rare in IP exports.
+RECORD_SIZE = 17
+INDEX_SIZE = 8
+IP_TAG, NAME_TAG = b'\x00', b'\x01'
+V4_MAPPED = b'\x00' * 10 + b'\xff\xff'
+
+# Rough Python cost of one buffered entry (bytes object plus set/dict slot), used to turn
+# the memory budget into a number of entries per spill run
+ENTRY_COST = 120
+
+
+def pack_ip(entry):
+    # 16-byte big-endian form of an IP, or None for anything else (inet_pton is strict,
+    # C-speed parsing: no leading zeros or short forms for IPv4)
+    try:
+        return V4_MAPPED + socket.inet_pton(socket.AF_INET, entry)
+    except OSError:
+        pass
+    try:
+        return socket.inet_pton(socket.AF_INET6, entry)
+    except OSError:
+        return None
+
+
+def unpack_ip(packed):
+    # Canonical text form; IPv6 addresses may be spelled differently from the input
+    if packed[:12] == V4_MAPPED:
+        return socket.inet_ntop(socket.AF_INET, packed[12:])
+    return socket.inet_ntop(socket.AF_INET6, packed)
+
+
+def _write_run(records, tmp_dir):
+    # One sorted spill file; returns its path
+    fd, path = tempfile.mkstemp(prefix='holmesgeo_dedup_', suffix='.run', dir=tmp_dir)
+    with os.fdopen(fd, 'wb') as f:
+        f.writelines(records)
+    return path
+
+
+def _read_run(path, size):
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(READ_BLOCK - READ_BLOCK % size)
+            if not block:
+                return
+            for start in range(0, len(block), size):
+                yield block[start:start + size]
+
+
+def _unique_sorted(records, key_size):
+    # Drop consecutive records whose first key_size bytes repeat (input is sorted)
+    last = None
+    for record in records:
+        key = record[:key_size]
+        if key != last:
+            last = key
+            yield record
+
+
+class UniqueEntries(Sequence):
+    # The deduplicated entries, read from a file of fixed-width records through mmap, so
+    # len() and entries[i] are O(1) and the list itself never has to fit in memory.
+    # Can be passed as ip_list to ipcheck_mod; delete the file with close().
+
+    # Tells ipcheck_mod's worker pool that the entries need no further deduplication
+    unique = True
+
+    def __init__(self, path, names):
+        self.path = path
+        self._names = names
+        self._file = open(path, 'rb')
+        size = os.path.getsize(path)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._len = size // RECORD_SIZE
+
+    def _decode(self, record):
+        if record[:1] == IP_TAG:
+            return unpack_ip(record[1:])
+        return self._names[int.from_bytes(record[1:], 'big')]
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._len))]
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError(index)
+        offset = index * RECORD_SIZE
+        return self._decode(self._map[offset:offset + RECORD_SIZE])
+
+    def __iter__(self):
+        for record in _read_run(self.path, RECORD_SIZE):
+            yield self._decode(record)
+
+    def close(self):
+        if self._map:
+            self._map.close()
+        self._file.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ExternalDeduper:
+    # Deduplicates more entries than fit in memory: entries are buffered up to the memory
+    # budget, spilled as sorted runs of fixed-width records and combined with a k-way merge
+    # (heapq.merge), which only holds one record per run at a time.
+    #
+    # The result comes out sorted by address. With keep_order, each record also carries
+    # the position of the entry's first occurrence; after the first merge the unique
+    # records are re-sorted by that position (a second round of runs and merge), which
+    # restores first-seen order at the cost of another pass over the unique entries.
+
+    def __init__(self, memory_mb=DEFAULT_MEMORY_MB, keep_order=True, tmp_dir=None):
+        self.keep_order = keep_order
+        self.tmp_dir = tmp_dir
+        self.run_limit = max(int(memory_mb * 1024 * 1024 // ENTRY_COST), 1024)
+        self.seen = 0
+        self._buffer = {}
+        self._runs = []
+        self._names = []
+        self._name_ids = {}
+
+    def _pack(self, entry):
+        packed = pack_ip(entry)
+        if packed is not None:
+            return IP_TAG + packed
+        name_id = self._name_ids.get(entry)
+        if name_id is None:
+            name_id = self._name_ids[entry] = len(self._names)
+            self._names.append(entry)
+        return NAME_TAG + name_id.to_bytes(16, 'big')
+
+    def add(self, entry):
+        entry = entry.strip()
+        if not entry:
+            return
+        record = self._pack(entry)
+        # Within a run only the first occurrence matters
+        self._buffer.setdefault(record, self.seen)
+        self.seen += 1
+        if len(self._buffer) >= self.run_limit:
+            self._spill()
+
+    def extend(self, entries):
+        for entry in entries:
+            self.add(entry)
+
+    def _buffered_records(self):
+        if self.keep_order:
+            return sorted(record + index.to_bytes(INDEX_SIZE, 'big') for record, index in self._buffer.items())
+        return sorted(self._buffer)
+
+    def _spill(self):
+        self._runs.append(_write_run(self._buffered_records(), self.tmp_dir))
+        self._buffer.clear()
+
+    def _merged(self, record_size):
+        # Unique records (by entry) from every run and the in-memory buffer, sorted
+        streams = [_read_run(path, record_size) for path in self._runs]
+        streams.append(iter(self._buffered_records()))
+        # Equal entries sort by first-seen position, so the first of each is the earliest
+        return _unique_sorted(heapq.merge(*streams), RECORD_SIZE)
+
+    def finish(self):
+        # Merge everything into a UniqueEntries file and remove the spill files
+        spilled = len(self._runs)
+        try:
+            if not self.keep_order:
+                unique = self._merged(RECORD_SIZE)
+            else:
+                unique = self._reorder(self._merged(RECORD_SIZE + INDEX_SIZE))
+            path = _write_run(unique, self.tmp_dir)
+        finally:
+            for run in self._runs:
+                os.unlink(run)
+            self._runs = []
+            self._buffer.clear()
+
+        result = UniqueEntries(path, self._names)
+        msg = (f"External dedup: {self.seen} entries, {len(result)} unique "
+               f"({spilled} spill runs of up to {self.run_limit} entries)")
+        colored_print(f"[+] {msg}\n", 'green')
+        logger.info(msg)
+        return result
+
+    def _reorder(self, records):
+        # Second pass for keep_order: sort the unique records by first-seen position
+        runs = []
+        batch = []
+        try:
+            for record in records:
+                batch.append(record[RECORD_SIZE:] + record[:RECORD_SIZE])
+                if len(batch) >= self.run_limit:
+                    batch.sort()
+                    runs.append(_write_run(batch, self.tmp_dir))
+                    batch = []
+            batch.sort()
+            streams = [_read_run(path, RECORD_SIZE + INDEX_SIZE) for path in runs] + [iter(batch)]
+            for record in heapq.merge(*streams):
+                yield record[INDEX_SIZE:]
+        finally:
+            for run in runs:
+                os.unlink(run)
+
+
+class UniqueOnlyCache(dict):
+    # cache= for ipcheck_mod when every entry is already unique: nothing is looked up a
+    # second time, so nothing is kept and memory does not grow with the input
+    def __setitem__(self, key, value):
+        pass
+
+
+def dedup_external(entries, memory_mb=DEFAULT_MEMORY_MB, keep_order=True, tmp_dir=None):
+    deduper = ExternalDeduper(memory_mb, keep_order, tmp_dir)
+    deduper.extend(entries)
+    return deduper.finish()
@@ -0,0 +1,142 @@
+import os
+import threading
+from collections.abc import Mapping
+from datetime import datetime, timezone
+
+import geoip2.database
+
+from .config import get_db_path
+from .ip_checker import open_geo_readers, colored_print, logger
+from .cache import caches
+
+DB_NAMES = ('city', 'asn', 'country')
+DEFAULT_CHECK_INTERVAL = 60
+DEFAULT_CLOSE_GRACE = 60
+
+
+def _db_stamp(db_name):
+    # (path, inode, mtime, size) of the file get_db_path currently points at, or None
+    path = get_db_path(db_name)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return path, st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class GeoDatabases(Mapping):
+    # Read-only mapping of db name -> geoip2 Reader that follows geoipupdate.
+    #
+    # Each database is tracked by path, inode and mtime. When one changes, the new file is
+    # opened off the lookup path (in the watcher thread or the caller of check()), and the
+    # whole mapping is swapped with a single assignment, so lookups never wait on a lock.
+    # Replaced readers are closed only after a grace period, because an in-flight lookup
+    # may still be reading from the old memory map.
+
+    def __init__(self, watch=False, check_interval=DEFAULT_CHECK_INTERVAL,
+                 close_grace=DEFAULT_CLOSE_GRACE, on_reload=None):
+        self.check_interval = check_interval
+        self.close_grace = close_grace
+        self._on_reload = [on_reload] if on_reload else []
+        self._current = open_geo_readers()
+        self._stamps = {name: _db_stamp(name) for name in DB_NAMES}
+        self._check_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        if watch:
+            self.start_watching()
+
+    # Mapping interface: always served from the current snapshot
+    def __getitem__(self, db_name):
+        return self._current[db_name]
+
+    def __iter__(self):
+        return iter(self._current)
+
+    def __len__(self):
+        return len(self._current)
+
+    def add_reload_callback(self, callback):
+        # callback(changed_names) runs after a swap, e.g. to drop cached lookups
+        self._on_reload.append(callback)
+
+    def build_epochs(self):
+        return {
+            name: reader.metadata().build_epoch if reader is not None else None
+            for name, reader in self._current.items()
+        }
+
+    def build_dates(self):
+        return {
+            name: datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC') if epoch else None
+            for name, epoch in self.build_epochs().items()
+        }
+
+    def check(self):
+        # Reload any database whose file changed; returns the list of reloaded names
+        if not self._check_lock.acquire(blocking=False):
+            return []
+        try:
+            changed = {}
+            for name in DB_NAMES:
+                stamp = _db_stamp(name)
+                if stamp is None or stamp == self._stamps.get(name):
+                    continue
+                try:
+                    reader = geoip2.database.Reader(stamp[0])
+                    reader.metadata()
+                except Exception as e:
+                    # A half-written file: keep serving the old one and retry next round
+                    msg = f"Could not open updated GeoIP database {stamp[0]}: {e}"
+                    colored_print(f"[!] {msg}", 'yellow')
+                    logger.warning(msg)
+                    continue
+                changed[name] = (reader, stamp)
+
+            if not changed:
+                return []
+
+            previous = self._current
+            updated = dict(previous)
+            for name, (reader, stamp) in changed.items():
+                updated[name] = reader
+                self._stamps[name] = stamp
+            self._current = updated
+
+            self._retire([previous[name] for name in changed if previous.get(name) is not None])
+            names = sorted(changed)
+            msg = f"Reloaded GeoIP databases: {', '.join(names)} (build {self.build_dates()})"
+            colored_print(f"[+] {msg}", 'green')
+            logger.info(msg)
+            caches.clear('geoip')
+            for callback in self._on_reload:
+                callback(names)
+            return names
+        finally:
+            self._check_lock.release()
+
+    def _retire(self, readers):
+        if not readers:
+            return
+        timer = threading.Timer(self.close_grace, lambda: [reader.close() for reader in readers])
+        timer.daemon = True
+        timer.start()
+
+    def start_watching(self):
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="geoip-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"GeoIP database watcher error: {e}")
+
+    def close(self):
+        self._stop.set()
+        for reader in self._current.values():
+            if reader is not None:
+                reader.close()
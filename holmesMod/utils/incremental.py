@@ -0,0 +1,95 @@
+import os
+import csv
+import json
+import glob
+import time
+
+ENRICHED_AT_SUFFIX = '.enriched.json'
+REUSABLE_SKIP_COLUMNS = ('User Agent',)
+
+
+def find_previous_result(output_file_path):
+    # Most recently written CSV for the same input: <name>_ipinfo.csv or <name>_ipinfo_v{i}.csv
+    base_path = os.path.splitext(output_file_path)[0]
+    candidates = [path for path in [f'{base_path}.csv'] + glob.glob(f'{base_path}_v*.csv') if os.path.isfile(path)]
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+
+def enriched_at_path(csv_path):
+    return csv_path + ENRICHED_AT_SUFFIX
+
+
+def save_enriched_at(csv_path, enriched_at):
+    # Sidecar with the time each IP was actually enriched, so rows copied forward from
+    # earlier runs keep their original age instead of looking fresh every day.
+    tmp_path = enriched_at_path(csv_path) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(enriched_at, f)
+    os.replace(tmp_path, enriched_at_path(csv_path))
+
+
+class PreviousResults:
+    # Keyed index of a previous result file, reshaped to the current column layout
+
+    def __init__(self, path, rows, enriched_at, max_age_hours=None, db_epoch=None):
+        self.path = path
+        self.rows = rows
+        self.enriched_at = enriched_at
+        self.max_age = max_age_hours * 3600 if max_age_hours else None
+        self.db_epoch = db_epoch
+        self.expired = 0
+
+    def _expired(self, ip, now=None):
+        enriched_at = self.enriched_at.get(ip, 0)
+        now = now or time.time()
+        return bool((self.max_age and now - enriched_at > self.max_age) or (self.db_epoch and enriched_at < self.db_epoch))
+
+    def is_reusable(self, ip, now=None):
+        return ip in self.rows and not self._expired(ip, now)
+
+    def get(self, ip, now=None):
+        # Return (row, enriched_at) for a reusable IP, or None when it must be re-enriched
+        row = self.rows.get(ip)
+        if row is None:
+            return None
+        if self._expired(ip, now):
+            self.expired += 1
+            return None
+        return list(row), self.enriched_at.get(ip, 0)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def load_previous_results(csv_path, header, max_age_hours=None, db_epoch=None):
+    # Returns PreviousResults, or None when the file cannot be reused with this header
+    reusable = [column for column in header if column not in REUSABLE_SKIP_COLUMNS]
+
+    with open(csv_path, newline='', encoding='utf-8', errors='replace') as f:
+        reader = csv.reader(f)
+        previous_header = next(reader, None)
+        if not previous_header or any(column not in previous_header for column in reusable):
+            return None
+
+        positions = [previous_header.index(column) for column in reusable]
+        ip_pos = previous_header.index('IP Address')
+        rows = {}
+        for record in reader:
+            if len(record) != len(previous_header):
+                continue
+            rows[record[ip_pos]] = [record[pos] for pos in positions]
+
+    # Without a sidecar, fall back to the file's modification time for every row
+    fallback = os.path.getmtime(csv_path)
+    enriched_at = dict.fromkeys(rows, fallback)
+    sidecar = enriched_at_path(csv_path)
+    if os.path.exists(sidecar):
+        try:
+            with open(sidecar) as f:
+                enriched_at.update((ip, ts) for ip, ts in json.load(f).items() if ip in rows)
+        except (OSError, ValueError):
+            pass
+
+    return PreviousResults(csv_path, rows, enriched_at, max_age_hours, db_epoch)
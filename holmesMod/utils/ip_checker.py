@@ -1,4 +1,6 @@
 import os
+import contextvars
+from contextlib import contextmanager
 import requests
 import csv
 import socket
@@ -8,12 +10,25 @@ import pandas as pd
 import glob
 import sys
 import logging
+import time
 from datetime import datetime
 from openpyxl import load_workbook
 from openpyxl.styles import Alignment, Border, Side
 from termcolor import colored
 
 from .config import get_db_path
+from .checkpoint import (
+    DEFAULT_CHECKPOINT_EVERY,
+    run_fingerprint,
+    save_checkpoint,
+    find_checkpoint,
+    clear_checkpoint,
+    vt_results_path,
+)
+from .outsource import OutsourceIndex
+from .cache import cached, caches
+from .records import IPRecord, nullable, record_schema
+from .incremental import find_previous_result, load_previous_results, save_enriched_at
 
 
 # ── Logger setup ─────────────────────────────────────────────────────────────
@@ -45,47 +60,96 @@ def _get_log_path(output_file_path: str) -> str:
     return f"{base}_errors_{timestamp}.log"
 
 
-# A module-level fallback logger (no-op until setup_logger is called)
+# A module-level fallback logger (no-op until setup_logger is called). The NullHandler keeps
+# library callers without any logging setup from getting warnings on stderr.
 logger = logging.getLogger("ipcheck")
+logger.addHandler(logging.NullHandler())
 
+# Set while the library API enriches, so console messages are dropped for that caller only
+_quiet = contextvars.ContextVar("holmesgeo_quiet", default=False)
 
-# ── Helpers ───────────────────────────────────────────────────────────────────
 
-def outsrc_check(ip_domain):
+@contextmanager
+def quiet_output():
+    token = _quiet.set(True)
     try:
-        db_path = os.path.join(os.path.dirname(get_db_path('city')), 'outsource_db')
+        yield
+    finally:
+        _quiet.reset(token)
 
-        if not os.path.exists(db_path):
-            msg = f"Outsource database directory not found at {db_path}"
-            colored_print(f"[!] {msg}", "yellow", "bold")
-            logger.warning(msg)
-            return "N/A"
 
-        outsrc_files = glob.glob(os.path.join(db_path, "*.txt"))
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+# (path, mtime, size) of the outsource lists behind the last index built in this process
+_outsrc_stamp = None
 
-        if not outsrc_files:
-            msg = f"No outsource database files found in {db_path}"
-            colored_print(f"[!] {msg}", "yellow", "bold")
+
+def _outsrc_loaded(outsrc_files):
+    # outsrc_check results are cached by entry alone, so drop them when the lists change
+    global _outsrc_stamp
+    stamp = []
+    for file in sorted(outsrc_files):
+        try:
+            st = os.stat(file)
+        except OSError:
+            continue
+        stamp.append((file, st.st_mtime_ns, st.st_size))
+    stamp = tuple(stamp)
+    if stamp != _outsrc_stamp:
+        _outsrc_stamp = stamp
+        caches.clear('outsource')
+
+
+def load_outsrc_index():
+    # Read every outsource list once and map each entry to the categories it belongs to.
+    # Callers that check many entries should build this once and pass it to outsrc_check.
+    # Domain entries also match their subdomains; "*.example.com" matches subdomains only.
+    index = OutsourceIndex()
+    db_path = os.path.join(os.path.dirname(get_db_path('city')), 'outsource_db')
+
+    if not os.path.exists(db_path):
+        msg = f"Outsource database directory not found at {db_path}"
+        colored_print(f"[!] {msg}", "yellow", "bold")
+        logger.warning(msg)
+        _outsrc_loaded([])
+        return index
+
+    outsrc_files = glob.glob(os.path.join(db_path, "*.txt"))
+    _outsrc_loaded(outsrc_files)
+
+    if not outsrc_files:
+        msg = f"No outsource database files found in {db_path}"
+        colored_print(f"[!] {msg}", "yellow", "bold")
+        logger.warning(msg)
+        return index
+
+    for file in outsrc_files:
+        category = os.path.basename(file).replace('.txt', '').upper()
+        try:
+            with open(file, 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    index.add(line, category)
+        except Exception as e:
+            msg = f"Error reading outsource database file {file}: {e}"
+            colored_print(f"[!] {msg}", "yellow")
             logger.warning(msg)
-            return "N/A"
-
-        found_categories = []
-
-        for file in outsrc_files:
-            try:
-                with open(file, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read().splitlines()
-                    content = [line.strip() for line in content if line.strip()]
-
-                    if ip_domain in content:
-                        category = os.path.basename(file).replace('.txt', '').upper()
-                        found_categories.append(category)
-            except Exception as e:
-                msg = f"Error reading outsource database file {file}: {e}"
-                colored_print(f"[!] {msg}", "yellow")
-                logger.warning(msg)
-                continue
+            continue
+
+    return index
+
 
+@cached('outsource', key=lambda ip_domain, outsrc_index=None: (ip_domain, id(outsrc_index)))
+def outsrc_check(ip_domain, outsrc_index=None):
+    # Cached per entry and index, so callers passing their own index get its answers;
+    # load_outsrc_index clears the cache when the lists change
+    try:
+        if outsrc_index is None:
+            outsrc_index = load_outsrc_index()
+
+        found_categories = outsrc_index.get(ip_domain)
         return ", ".join(found_categories) if found_categories else "N/A"
 
     except Exception as e:
@@ -95,6 +159,7 @@ def outsrc_check(ip_domain):
         return "N/A"
 
 
+@cached('rdns')
 def rdns(ip):
     try:
         hostname, _, _ = socket.gethostbyaddr(ip)
@@ -103,6 +168,16 @@ def rdns(ip):
         return "N/A"
 
 
+@cached('dns')
+def resolve_host(name):
+    # IPv4 address of a hostname, or None when it does not resolve
+    try:
+        return socket.gethostbyname(name)
+    except socket.gaierror:
+        return None
+
+
+@cached('virustotal')
 def get_ssl_registrar(ip):
     certificate = "N/A"
     registrar = "N/A"
@@ -200,17 +275,54 @@ def get_ssl_registrar(ip):
     return certificate, registrar
 
 
-def get_ip_info(ip, no_rdns=False):
-    city_info = None
-    country_info = None
-    asn_info = None
+def open_geo_readers(mode=geoip2.database.MODE_AUTO):
+    # Open the City, ASN and Country databases once so they can be reused across lookups.
+    # A database that cannot be found is reported and left as None.
+    readers = {}
+    for db_name in ('city', 'asn', 'country'):
+        db_file = get_db_path(db_name)
+        try:
+            readers[db_name] = geoip2.database.Reader(db_file, mode=mode)
+        except FileNotFoundError:
+            msg = f"Database file not found: {db_file}"
+            colored_print(f"[!] Error: {msg}", 'red', 'bold')
+            logger.error(msg)
+            readers[db_name] = None
+    return readers
+
+
+def geo_build_epoch(readers):
+    # Newest build time (epoch seconds) among the open GeoIP databases, or None
+    epochs = [reader.metadata().build_epoch for reader in readers.values() if reader is not None]
+    return max(epochs) if epochs else None
+
+
+def close_geo_readers(readers):
+    for reader in readers.values():
+        if reader is not None:
+            reader.close()
+
+
+def _geo_lookup(reader, method, label, ip):
+    try:
+        return getattr(reader, method)(ip)
+    except geoip2.errors.AddressNotFoundError:
+        msg = f"No {label} info found for IP: {ip}"
+        colored_print(f"[!] {msg}", 'yellow', 'bold')
+        logger.warning(msg)
+        return None
+
 
-    citymmdb = get_db_path('city')
-    asnmmdb = get_db_path('asn')
-    countmmdb = get_db_path('country')
+def _intern(value):
+    return sys.intern(value) if value else None
 
+
+def get_ip_info(ip, no_rdns=False, readers=None, rev_dns=None):
+    # Returns an IPRecord (category, VirusTotal and user agent fields still empty) or None.
+    # rev_dns can be passed in when the caller already resolved it
     if not no_rdns:
-        rev_dns = rdns(ip)
+        if rev_dns is None:
+            rev_dns = rdns(ip)
         if rev_dns == "N/A":
             msg = f"No reverse DNS found for IP: {ip}"
             colored_print(f"[!] {msg}", 'yellow')
@@ -218,69 +330,50 @@ def get_ip_info(ip, no_rdns=False):
     else:
         rev_dns = "N/A"
 
-    try:
-        with geoip2.database.Reader(citymmdb) as reader:
-            try:
-                city_info = reader.city(ip)
-            except geoip2.errors.AddressNotFoundError:
-                msg = f"No city info found for IP: {ip}"
-                colored_print(f"[!] {msg}", 'yellow', 'bold')
-                logger.warning(msg)
-    except FileNotFoundError:
-        msg = f"Database file not found: {citymmdb}"
-        colored_print(f"[!] Error: {msg}", 'red', 'bold')
-        logger.error(msg)
+    record = _geo_record(ip, readers)
+    if record is None:
+        return None
+    return record._replace(reverse_dns=nullable(rev_dns)) if not no_rdns else record
 
-    try:
-        with geoip2.database.Reader(asnmmdb) as reader:
-            try:
-                asn_info = reader.asn(ip)
-            except geoip2.errors.AddressNotFoundError:
-                msg = f"No ASN info found for IP: {ip}"
-                colored_print(f"[!] {msg}", 'yellow', 'bold')
-                logger.warning(msg)
-    except FileNotFoundError:
-        msg = f"Database file not found: {asnmmdb}"
-        colored_print(f"[!] Error: {msg}", 'red', 'bold')
-        logger.error(msg)
+
+@cached('geoip', key=lambda ip, readers=None: ip)
+def _geo_record(ip, readers=None):
+    # GeoIP part of get_ip_info. Cached by IP alone: every reader set in a process opens
+    # the same files, and GeoDatabases clears this namespace when it reloads them (after
+    # the swap, so lookups still running on the old readers cannot store their results).
+    owns_readers = readers is None
+    if owns_readers:
+        readers = open_geo_readers()
 
     try:
-        with geoip2.database.Reader(countmmdb) as reader:
-            try:
-                country_info = reader.country(ip)
-            except geoip2.errors.AddressNotFoundError:
-                msg = f"No country info found for IP: {ip}"
-                colored_print(f"[!] {msg}", 'yellow', 'bold')
-                logger.warning(msg)
-    except FileNotFoundError:
-        msg = f"Database file not found: {countmmdb}"
-        colored_print(f"[!] Error: {msg}", 'red', 'bold')
-        logger.error(msg)
+        city_info = _geo_lookup(readers['city'], 'city', 'city', ip) if readers.get('city') else None
+        asn_info = _geo_lookup(readers['asn'], 'asn', 'ASN', ip) if readers.get('asn') else None
+        country_info = _geo_lookup(readers['country'], 'country', 'country', ip) if readers.get('country') else None
+    finally:
+        if owns_readers:
+            close_geo_readers(readers)
 
     if city_info and country_info and asn_info:
-        network = 'N/A'
+        network = None
         try:
             network = f"{asn_info.ip_address}/{asn_info.prefix_len}"
         except AttributeError:
             pass
 
-        result = [
-            ip,
-            city_info.city.names.get('en', 'N/A'),
-            city_info.location.latitude if city_info.location.latitude else 'N/A',
-            city_info.location.longitude if city_info.location.longitude else 'N/A',
-            country_info.country.names.get('en', 'N/A'),
-            country_info.country.iso_code if country_info.country.iso_code else 'N/A',
-            city_info.continent.names.get('en', 'N/A'),
-            asn_info.autonomous_system_number if asn_info else 'N/A',
-            asn_info.autonomous_system_organization if asn_info else 'N/A',
-            network,
-        ]
-
-        if not no_rdns:
-            result.append(rev_dns)
-
-        return result
+        # Names repeat across millions of rows: intern them so every record shares one copy
+        return IPRecord(
+            ip=ip,
+            city=_intern(city_info.city.names.get('en')),
+            # 0.0 has always been written as N/A (a falsy check), so keep it missing
+            latitude=city_info.location.latitude or None,
+            longitude=city_info.location.longitude or None,
+            country=_intern(country_info.country.names.get('en')),
+            country_code=_intern(country_info.country.iso_code),
+            continent=_intern(city_info.continent.names.get('en')),
+            asn_number=asn_info.autonomous_system_number,
+            asn_org=_intern(asn_info.autonomous_system_organization),
+            network=network,
+        )
 
     # One or more DB lookups failed — log it as an error entry
     missing = [name for name, info in [("city", city_info), ("country", country_info), ("ASN", asn_info)] if not info]
@@ -291,27 +384,13 @@ def get_ip_info(ip, no_rdns=False):
 # ── Core processing helpers ───────────────────────────────────────────────────
 
 def _build_header(no_rdns, virtot, user_agents):
-    header = [
-        'IP Address', 'IP Category', 'City', 'City Latitude', 'City Longitude',
-        'Country', 'Country Code', 'Continent', 'ASN Number', 'ASN Organization', 'Network',
-    ]
-    if not no_rdns:
-        header.append('Reverse DNS')
-    if virtot:
-        header.extend(['Certificate CN', 'Domain Registrar URL'])
-    if user_agents is not None:
-        header.append('User Agent')
-    return header
+    return list(record_schema(no_rdns, virtot, user_agents is not None).header)
 
 
-def _process_single_entry(entry, idx, virtot, user_agents, no_rdns):
-    # Resolve one entry (IP or domain) and return the row list, or None on failure.
-    # Also returns a list of error strings encountered during processing.
-    entry = entry.strip()
+def _resolve_entry(entry, no_rdns):
+    # Return (ip, domain, rev_dns) for an IP or domain entry; ip is None when a domain
+    # cannot be resolved.
     domain = None
-    ip_cat = "N/A"
-    errors = []
-
     try:
         ipaddress.ip_address(entry)
         ip = entry
@@ -323,60 +402,189 @@ def _process_single_entry(entry, idx, virtot, user_agents, no_rdns):
             rev_dns = "N/A"
     except ValueError:
         domain = entry
-        try:
-            ip = socket.gethostbyname(entry)
-            rev_dns = rdns(ip) if not no_rdns else "N/A"
-        except socket.gaierror:
-            ip_cat = outsrc_check(domain)
-            msg = f"Cannot resolve domain: '{entry}' (category: {ip_cat})"
-            colored_print(f"[!] Cannot resolve domain: {entry}. Skipping.", 'red', 'bold')
-            print(f'But the domain is categorized as {ip_cat}')
-            logger.error(msg)
-            errors.append(msg)
-            return None, errors
-
-    # Category lookup
-    ip_cat = outsrc_check(ip)
+        ip = resolve_host(entry)
+        if ip is None:
+            return None, domain, "N/A"
+        rev_dns = rdns(ip) if not no_rdns else "N/A"
+    return ip, domain, rev_dns
+
+
+def _report_unresolved(entry, outsrc_index):
+    ip_cat = outsrc_check(entry, outsrc_index)
+    msg = f"Cannot resolve domain: '{entry}' (category: {ip_cat})"
+    colored_print(f"[!] Cannot resolve domain: {entry}. Skipping.", 'red', 'bold')
+    if not _quiet.get():
+        print(f'But the domain is categorized as {ip_cat}')
+    logger.error(msg)
+    return msg
+
+
+def _enrich_resolved(ip, domain, rev_dns, no_rdns, readers=None, outsrc_index=None):
+    # Category + GeoIP stage for an already-resolved entry. Returns (record, error message).
+    ip_cat = outsrc_check(ip, outsrc_index)
     if ip_cat == "N/A" and domain and domain != "N/A":
-        domain_cat = outsrc_check(domain)
+        domain_cat = outsrc_check(domain, outsrc_index)
         if domain_cat != "N/A":
             ip_cat = domain_cat
 
-    ip_info = get_ip_info(ip, no_rdns)
-    if not ip_info:
+    record = get_ip_info(ip, no_rdns, readers, rev_dns)
+    if not record:
         msg = f"Could not retrieve GeoIP information for IP: '{ip}'. Entry skipped."
         colored_print(f"[!] Could not retrieve information for IP: {ip}. Skipping.", 'red')
         logger.error(msg)
-        errors.append(msg)
+        return None, msg
+
+    return record._replace(category=nullable(ip_cat)), None
+
+
+def _enrich_record(entry, virtot, user_agent, no_rdns, readers=None, outsrc_index=None):
+    # Resolve one entry (IP or domain) into an IPRecord, or None on failure.
+    # Also returns a list of error strings encountered during processing.
+    entry = entry.strip()
+    errors = []
+
+    ip, domain, rev_dns = _resolve_entry(entry, no_rdns)
+    if ip is None:
+        errors.append(_report_unresolved(entry, outsrc_index))
         return None, errors
 
-    ip_info.insert(1, ip_cat)
+    record, error = _enrich_resolved(ip, domain, rev_dns, no_rdns, readers, outsrc_index)
+    if error:
+        errors.append(error)
+        return None, errors
 
     if virtot:
         cert_cn, registrar = get_ssl_registrar(domain if domain else ip)
-        ip_info.extend([cert_cn, registrar])
+        record = record._replace(certificate_cn=nullable(cert_cn), registrar=nullable(registrar))
 
-    if user_agents is not None:
-        ip_info.append(user_agents[idx] if idx < len(user_agents) else "N/A")
+    if user_agent is not None:
+        record = record._replace(user_agent=user_agent)
+
+    return record, errors
+
+
+def _user_agent_at(user_agents, idx):
+    if user_agents is None:
+        return None
+    return user_agents[idx] if idx < len(user_agents) else "N/A"
+
+
+def _entry_record(entry, cache, sharded, virtot, no_rdns, readers=None, outsrc_index=None):
+    # Record (without User Agent) for an entry, enriched only the first time the run sees
+    # it. cache maps entry -> IPRecord, or None for entries that could not be enriched,
+    # and may be shared by several ipcheck_mod calls (e.g. one per input file).
+    if entry in cache:
+        return cache[entry]
+    if sharded:
+        record = sharded.record_for(entry)
+    else:
+        record, _ = _enrich_record(entry, virtot, None, no_rdns, readers, outsrc_index)
+    cache[entry] = record
+    return record
 
-    return ip_info, errors
+
+def _record_row(record, idx, virtot, user_agents, no_rdns):
+    # Row list in the column order of _build_header, with the entry's own user agent
+    if user_agents is not None:
+        record = record._replace(user_agent=_user_agent_at(user_agents, idx))
+    return record_schema(no_rdns, virtot, user_agents is not None).to_row(record)
 
 
 # ── Public API ────────────────────────────────────────────────────────────────
 
-def process_ips_only(ip_list, virtot=False, user_agents=None, no_rdns=False):
-    # Process IPs and stream results to stdout only (no file output).
-    stdout_writer = csv.writer(sys.stdout, lineterminator='\n')
+def resolve_output_path(output_file_path):
+    # Avoid overwriting existing files by picking the next free _v{i} suffix
+    if not os.path.exists(output_file_path):
+        return output_file_path
+
+    base_path = os.path.splitext(output_file_path)[0]
+    i = 1
+    while os.path.exists(f'{base_path}_v{i}.csv'):
+        i += 1
+    return f'{base_path}_v{i}.csv'
+
+
+def _start_sharded(entries, workers, virtot, no_rdns, work_queue=None, unique=False):
+    # Imported lazily: the parallel and workqueue modules themselves import from this one
+    if work_queue is not None:
+        from .workqueue import QueueEnricher
+        return QueueEnricher(entries, work_queue, virtot, no_rdns)
+    from .parallel import ShardedEnricher
+    return ShardedEnricher(entries, workers, virtot, no_rdns, unique=unique)
+
+
+def _entries_from(ip_list, start):
+    # ip_list[start:] without copying it (ip_list may be an on-disk UniqueEntries)
+    return (ip_list[i] for i in range(start, len(ip_list)))
+
+
+def _start_vt_plan(ip_list, start, cache, sharded, no_rdns, readers, outsrc_index, vt_budget=None, skip=None,
+                   results_path=None):
+    # Planned VirusTotal calls (see vtplan): the main loop calls prepare(i) before entry i,
+    # which enriches the next window of entries without VirusTotal, makes one call per
+    # distinct target and puts the finished records in cache. sharded, if any, must have
+    # been started without virtot.
+    from .vtplan import WindowedVTPlan
+    return WindowedVTPlan(ip_list, cache, sharded, no_rdns, readers, outsrc_index, vt_budget, skip,
+                          start=start, results_path=results_path)
+
 
-    for i, entry in enumerate(ip_list):
-        row, _ = _process_single_entry(entry, i, virtot, user_agents, no_rdns)
-        if row is not None:
-            stdout_writer.writerow(row)
+def _report_bogons(bogons):
+    if bogons and bogons.total:
+        msg = f"{bogons.total} private/reserved entries filtered out before enrichment ({bogons.summary()})"
+        colored_print(f"\n[+] {msg}", 'cyan', 'bold')
+        logger.info(msg)
 
+
+def process_ips_only(ip_list, virtot=False, user_agents=None, no_rdns=False, workers=1, bogons=None, cache=None,
+                     work_queue=None, vt_plan=True, vt_budget=None):
+    # Process IPs and stream results to stdout only (no file output).
+    stdout_writer = csv.writer(sys.stdout, lineterminator='\n')
+    readers = open_geo_readers()
+    outsrc_index = load_outsrc_index()
+    cache = {} if cache is None else cache
+    sharded = None
+    if workers > 1 or work_queue is not None:
+        # Workers make their own VirusTotal calls; the windowed plan only runs in-process
+        vt_plan = False
+        pending = (
+            entry for entry in ip_list
+            if entry.strip() not in cache and not (bogons and bogons.table.classify(entry))
+        )
+        sharded = _start_sharded(pending, workers, virtot and not vt_plan, no_rdns, work_queue,
+                                 unique=getattr(ip_list, 'unique', False))
+
+    vt = None
+    try:
+        if virtot and vt_plan:
+            vt = _start_vt_plan(ip_list, 0, cache, sharded, no_rdns, readers, outsrc_index, vt_budget,
+                                skip=bogons.table.classify if bogons else None)
+        for i, entry in enumerate(ip_list):
+            if vt:
+                vt.prepare(i)
+            entry = entry.strip()
+            if bogons and bogons.check(entry):
+                continue
+            record = _entry_record(entry, cache, sharded, virtot, no_rdns, readers, outsrc_index)
+            if record is not None:
+                stdout_writer.writerow(_record_row(record, i, virtot, user_agents, no_rdns))
+    finally:
+        close_geo_readers(readers)
+        if sharded:
+            sharded.close()
+            sharded.report()
+
+    if vt:
+        vt.report()
+    _report_bogons(bogons)
+    caches.report()
     colored_print('\n\n[STAGE-1] Processing completed (no files saved)', 'yellow', 'bold')
 
 
-def ipcheck_mod(ip_list, output_file_path, virtot=False, user_agents=None, no_rdns=False, no_output=False):
+def ipcheck_mod(ip_list, output_file_path, virtot=False, user_agents=None, no_rdns=False, no_output=False,
+                resume=False, checkpoint_every=DEFAULT_CHECKPOINT_EVERY,
+                incremental=None, max_age_hours=None, refresh_on_db_update=False, workers=1,
+                bogons=None, cache=None, work_queue=None, vt_plan=True, vt_budget=None):
     # ── no_output mode: stdout only, but still set up a logger ───────────────
     if no_output:
         log_path = _get_log_path(output_file_path)
@@ -386,7 +594,8 @@ def ipcheck_mod(ip_list, output_file_path, virtot=False, user_agents=None, no_rd
         header = _build_header(no_rdns, virtot, user_agents)
         stdout_writer = csv.writer(sys.stdout, lineterminator='\n')
         stdout_writer.writerow(header)
-        process_ips_only(ip_list, virtot, user_agents, no_rdns)
+        process_ips_only(ip_list, virtot, user_agents, no_rdns, workers, bogons, cache, work_queue,
+                         vt_plan, vt_budget)
 
         colored_print(f'\n[LOG] Error log saved to: {log_path}', 'cyan', 'bold')
         return
@@ -395,44 +604,158 @@ def ipcheck_mod(ip_list, output_file_path, virtot=False, user_agents=None, no_rd
     results_dir = os.path.dirname(output_file_path)
     os.makedirs(results_dir, exist_ok=True)
 
-    # Resolve output file path (avoid overwriting existing files)
-    if os.path.exists(output_file_path):
-        base_path = os.path.splitext(output_file_path)[0]
-        i = 1
-        while os.path.exists(f'{base_path}_v{i}.csv'):
-            i += 1
-        outfp = f'{base_path}_v{i}.csv'
+    header = _build_header(no_rdns, virtot, user_agents)
+    total = len(ip_list)
+    fingerprint = run_fingerprint(ip_list, header)
+
+    # Pick the previous result file before this run creates a new one
+    previous_path = None
+    if incremental:
+        previous_path = find_previous_result(output_file_path) if incremental == 'auto' else incremental
+
+    # Continue a previous run of the same input from its last checkpoint
+    state = find_checkpoint(results_dir, fingerprint) if resume else None
+    if state:
+        outfp = state['output']
+        start = state['completed']
+        skipped = state['skipped']
+        with open(outfp, 'r+b') as f:
+            f.truncate(state['csv_bytes'])
     else:
-        outfp = output_file_path
+        outfp = resolve_output_path(output_file_path)
+        start = 0
+        skipped = 0
 
     # Set up the logger next to the output file
     log_path = _get_log_path(outfp)
     setup_logger(log_path)
     logger.info(f"Session started. Output file: {outfp}")
+    if state:
+        msg = f"Resuming from checkpoint: {start}/{total} entries already processed."
+        colored_print(f"[+] {msg}", 'green', 'bold')
+        logger.info(msg)
+    elif resume:
+        colored_print("[!] No checkpoint found for this input, starting from the beginning.", 'yellow')
 
-    header = _build_header(no_rdns, virtot, user_agents)
     stdout_writer = csv.writer(sys.stdout, lineterminator='\n')
-
-    with open(outfp, mode='w', newline='') as file:
+    readers = open_geo_readers()
+    outsrc_index = load_outsrc_index()
+
+    db_epoch = geo_build_epoch(readers)
+    if db_epoch:
+        logger.info(f"GeoIP database build: {datetime.fromtimestamp(db_epoch).isoformat(sep=' ')} (epoch {db_epoch})")
+
+    previous = None
+    enriched_at = {}
+    if previous_path:
+        previous = load_previous_results(previous_path, header, max_age_hours,
+                                         db_epoch if refresh_on_db_update else None)
+        if previous is None:
+            msg = f"Previous results {previous_path} have different columns; enriching everything."
+            colored_print(f"[!] {msg}", 'yellow')
+            logger.warning(msg)
+        else:
+            msg = f"Incremental mode: {len(previous)} previously enriched IPs loaded from {previous_path}"
+            colored_print(f"[+] {msg}", 'green')
+            logger.info(msg)
+    elif incremental:
+        colored_print("[!] No previous results found, enriching everything.", 'yellow')
+
+    cache = {} if cache is None else cache
+    sharded = None
+    if workers > 1 or work_queue is not None:
+        # Workers make their own VirusTotal calls; the windowed plan only runs in-process
+        vt_plan = False
+        pending = (
+            entry for entry in _entries_from(ip_list, start)
+            if entry.strip() not in cache
+            and not (previous and previous.is_reusable(entry.strip()))
+            and not (bogons and bogons.table.classify(entry))
+        )
+        sharded = _start_sharded(pending, workers, virtot and not vt_plan, no_rdns, work_queue,
+                                 unique=getattr(ip_list, 'unique', False))
+
+    vt = None
+    if virtot and vt_plan:
+        def skip(entry):
+            return bool((previous and previous.is_reusable(entry)) or (bogons and bogons.table.classify(entry)))
+        vt = _start_vt_plan(ip_list, start, cache, sharded, no_rdns, readers, outsrc_index, vt_budget, skip,
+                            results_path=vt_results_path(outfp))
+
+    reused = 0
+    with open(outfp, mode='a' if state else 'w', newline='') as file:
         writer = csv.writer(file)
-        writer.writerow(header)
+        if not state:
+            writer.writerow(header)
         stdout_writer.writerow(header)
 
-        total = len(ip_list)
-        skipped = 0
-
-        for i, entry in enumerate(ip_list):
-            row, errors = _process_single_entry(entry, i, virtot, user_agents, no_rdns)
-
-            if row is None:
-                skipped += 1
-                continue
-
-            writer.writerow(row)
-            stdout_writer.writerow(row)
+        completed = start
+        try:
+            for i in range(start, total):
+                # Planned VirusTotal calls are made a window at a time, inside this loop, so
+                # rows keep flowing and an interruption is checkpointed like any other
+                if vt:
+                    vt.prepare(i)
+                entry = ip_list[i].strip()
+                # Private/reserved addresses are counted per category and never enriched
+                bogon = bogons.check(entry) if bogons else None
+                reusable = previous.get(entry) if previous and not bogon else None
+                if bogon:
+                    row = None
+                elif reusable:
+                    row, enriched_at[entry] = reusable
+                    if user_agents is not None:
+                        row.append(_user_agent_at(user_agents, i))
+                    reused += 1
+                else:
+                    record = _entry_record(entry, cache, sharded, virtot, no_rdns, readers, outsrc_index)
+                    row = _record_row(record, i, virtot, user_agents, no_rdns) if record is not None else None
+                    if row is not None and incremental:
+                        enriched_at.setdefault(row[0], time.time())
+                completed = i + 1
+
+                if row is None:
+                    skipped += 1
+                else:
+                    writer.writerow(row)
+                    stdout_writer.writerow(row)
+
+                if checkpoint_every and completed % checkpoint_every == 0:
+                    file.flush()
+                    save_checkpoint(outfp, fingerprint, total, completed, skipped, file.tell())
+        except BaseException:
+            # Interrupted (Ctrl+C, network failure, ...): keep what has been paid for
+            file.flush()
+            save_checkpoint(outfp, fingerprint, total, completed, skipped, file.tell())
+            msg = f"Run interrupted after {completed}/{total} entries. Re-run with --resume to continue."
+            colored_print(f"\n[!] {msg}", 'yellow', 'bold')
+            logger.warning(msg)
+            raise
+        finally:
+            close_geo_readers(readers)
+            if sharded:
+                sharded.close()
+            if vt:
+                vt.close()
+
+    clear_checkpoint(outfp)
+    if sharded:
+        sharded.report()
+    if vt:
+        vt.report()
+    if incremental:
+        save_enriched_at(outfp, enriched_at)
 
     # Summary line in the log
-    logger.info(f"Processing complete. Total: {total}, Skipped/Errored: {skipped}, Written: {total - skipped}")
+    bogon_total = bogons.total if bogons else 0
+    logger.info(f"Processing complete. Total: {total}, Private/Reserved: {bogon_total}, "
+                f"Skipped/Errored: {skipped - bogon_total}, Written: {total - skipped}")
+    _report_bogons(bogons)
+    if previous:
+        msg = f"Incremental: {reused} rows reused from {previous.path}, {previous.expired} expired and re-enriched"
+        colored_print(f"\n[+] {msg}", 'green')
+        logger.info(msg)
+    caches.report()
 
     colored_print('\n\n\n[STAGE-1]', 'yellow', 'bold')
     print(f'Result saved to: {outfp}')
@@ -484,5 +807,7 @@ def colored_print(message, color, style=None):
         'light_yellow': 'yellow', 'light_red': 'red', 'light_green': 'green',
         'light_blue': 'blue', 'light_magenta': 'magenta', 'light_cyan': 'cyan',
     }
+    if _quiet.get():
+        return
     mapped_color = color_map.get(color, color)
     print(colored(message, mapped_color, attrs=[style] if style else []))
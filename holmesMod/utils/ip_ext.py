@@ -3,39 +3,264 @@ import socket
 import ipaddress
 import sys
 import pandas as pd
+from array import array
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from termcolor import colored
 
-def apache_ipext(log_file_path):
-    ip_pattern = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
-    user_agent_pattern = re.compile(r'"([^"]*)"$')
-    
+APACHE_IP_PATTERN = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
+APACHE_UA_PATTERN = re.compile(r'"([^"]*)"$')
+APACHE_TIME_PATTERN = re.compile(r'\[(\d{2})/(\w{3})/(\d{4}):(\d{2}):(\d{2}):(\d{2}) ([+-])(\d{2})(\d{2})\]')
+MONTHS = {name: i for i, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+
+@lru_cache(maxsize=4096)
+def _apache_datetime(day, month, year, hour, minute, second, sign, tz_hours, tz_minutes):
+    offset = timedelta(hours=int(tz_hours), minutes=int(tz_minutes))
+    tz = timezone(-offset if sign == '-' else offset)
+    return datetime(int(year), MONTHS[month], int(day), int(hour), int(minute), int(second), tzinfo=tz)
+
+def parse_apache_time(line):
+    # Timezone-aware datetime of the bracketed [10/Oct/2000:13:55:36 -0700] stamp, or None.
+    # Busy logs repeat the same second many times, so parsed stamps are memoized.
+    match = APACHE_TIME_PATTERN.search(line)
+    if not match:
+        return None
+    try:
+        return _apache_datetime(*match.groups())
+    except (KeyError, ValueError):
+        return None
+
+def parse_apache_line(line):
+    # Return (ip, user_agent) for one log line, or None when it carries no valid IP
+    ip_match = APACHE_IP_PATTERN.search(line)
+    if not ip_match:
+        return None
+    ip = ip_match.group()
+    try:
+        ipaddress.ip_address(ip)
+    except ValueError:
+        # Invalid IP format
+        return None
+    ua_match = APACHE_UA_PATTERN.search(line)
+    return ip, ua_match.group(1) if ua_match else "N/A"
+
+# ── Time window ──────────────────────────────────────────────────────────────
+# Apache writes a line when a request completes but stamps it with the request start,
+# so a log is only roughly in time order. The window search backs off by this much
+# and keeps reading this far past --until before it stops.
+ORDER_SLACK = timedelta(seconds=60)
+TIME_OF_DAY_PATTERN = re.compile(r'^(\d{1,2}):(\d{2})(?::(\d{2}))?$')
+
+def first_apache_time(log_file_path, max_lines=1000):
+    # Timestamp of the first stamped line, used as the reference date and timezone for bounds
+    with open(log_file_path, 'r', encoding='utf-8', errors='replace') as file:
+        for i, line in enumerate(file):
+            if i >= max_lines:
+                break
+            ts = parse_apache_time(line)
+            if ts:
+                return ts
+    return None
+
+def parse_time_bound(value, reference=None):
+    # Accepts "02:00[:SS]" (on the reference day), ISO 8601 ("2026-10-10 02:00", "...T02:00+07:00")
+    # or the Apache form "10/Oct/2026:02:00:00 +0000". Bounds without a timezone take the log's.
+    value = value.strip()
+    ref_tz = reference.tzinfo if reference else timezone.utc
+    match = TIME_OF_DAY_PATTERN.match(value)
+    if match:
+        if reference is None:
+            raise ValueError(f"'{value}' needs a date: the log has no timestamped lines")
+        hour, minute, second = (int(part or 0) for part in match.groups())
+        return reference.replace(hour=hour, minute=minute, second=second, microsecond=0)
+    ts = parse_apache_time(f'[{value}]')
+    if ts:
+        return ts
+    try:
+        ts = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Unrecognised time '{value}' (use HH:MM, YYYY-MM-DD HH:MM or 10/Oct/2026:02:00:00 +0000)")
+    return ts if ts.tzinfo else ts.replace(tzinfo=ref_tz)
+
+def resolve_time_window(log_file_path, since=None, until=None):
+    # (since, until) as timezone-aware datetimes. A bare time of day for --until falls on the
+    # --since day, and a window that wraps midnight (e.g. 23:30 to 00:15) ends on the next day.
+    reference = first_apache_time(log_file_path)
+    since_ts = parse_time_bound(since, reference) if since else None
+    until_ts = parse_time_bound(until, since_ts or reference) if until else None
+    if since_ts and until_ts and until_ts <= since_ts and TIME_OF_DAY_PATTERN.match(until.strip()):
+        until_ts += timedelta(days=1)
+    if since_ts and until_ts and until_ts <= since_ts:
+        raise ValueError("--until must be later than --since")
+    return since_ts, until_ts
+
+def _timestamp_after(file, offset):
+    # (start offset, timestamp) of the first stamped line beginning after byte offset
+    # (or at 0); timestamp is None at end of file
+    file.seek(offset)
+    if offset:
+        file.readline()
+    while True:
+        pos = file.tell()
+        line = file.readline()
+        if not line:
+            return pos, None
+        ts = parse_apache_time(line.decode('utf-8', errors='replace'))
+        if ts:
+            return pos, ts
+
+def find_time_offset(file, target):
+    # Byte offset of the first line stamped at or after target in a time-ordered log opened
+    # in binary mode. Each probe seeks, skips the partial line and parses one timestamp, so
+    # the search costs O(log size) reads instead of a scan up to the window.
+    file.seek(0, 2)
+    lo, hi = 0, file.tell()
+    while lo < hi:
+        mid = (lo + hi) // 2
+        _, ts = _timestamp_after(file, mid)
+        if ts is None or ts >= target:
+            hi = mid
+        else:
+            lo = mid + 1
+    return _timestamp_after(file, lo)[0]
+
+def iter_apache_lines(log_file_path, since=None, until=None):
+    # Log lines, restricted to [since, until) when bounds are given. Only the bytes from the
+    # window start to just past its end are read; lines without a timestamp inside the
+    # window are kept.
+    if since is None and until is None:
+        with open(log_file_path, 'r', encoding='utf-8', errors='replace') as file:
+            yield from file
+        return
+
+    with open(log_file_path, 'rb') as file:
+        file.seek(find_time_offset(file, since - ORDER_SLACK) if since else 0)
+        for raw in file:
+            line = raw.decode('utf-8', errors='replace')
+            ts = parse_apache_time(line)
+            if ts is None:
+                yield line
+                continue
+            if until and ts >= until:
+                if ts >= until + ORDER_SLACK:
+                    break
+                continue
+            if since and ts < since:
+                continue
+            yield line
+
+# ── User agent storage ───────────────────────────────────────────────────────
+# A log has a few thousand distinct user agents across millions of lines, so each line
+# keeps a 4-byte id into a shared string table instead of its own copy of the string.
+
+class UserAgentTable:
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, user_agent):
+        ua_id = self.ids.get(user_agent)
+        if ua_id is None:
+            ua_id = len(self.strings)
+            self.ids[user_agent] = ua_id
+            self.strings.append(user_agent)
+        return ua_id
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class UserAgentColumn(Sequence):
+    # Per-line user agents as an array('I') of table ids. Reads like a list of strings
+    # (user_agents[idx], len, iteration); strings are only looked up when indexed.
+
+    def __init__(self, user_agents=(), table=None):
+        self.table = table if table is not None else UserAgentTable()
+        self.ids = array('I')
+        self.extend(user_agents)
+
+    def append(self, user_agent):
+        self.ids.append(self.table.intern(user_agent))
+
+    def extend(self, user_agents):
+        if isinstance(user_agents, UserAgentColumn) and user_agents.table is self.table:
+            self.ids.extend(user_agents.ids)
+            return
+        for user_agent in user_agents:
+            self.append(user_agent)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self.table.strings[ua_id] for ua_id in self.ids[idx]]
+        return self.table.strings[self.ids[idx]]
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def distinct(self):
+        return len(self.table)
+
+
+def apache_ipext(log_file_path, since=None, until=None):
     ips = []
-    user_agents = []
+    user_agents = UserAgentColumn()
     
     try:
-        with open(log_file_path, 'r', encoding='utf-8', errors='replace') as file:
-            for line in file:
-                ip_match = ip_pattern.search(line)
-                if ip_match:
-                    ip = ip_match.group()
-                    try:
-                        ipaddress.ip_address(ip)
-                        ua_match = user_agent_pattern.search(line)
-                        user_agent = ua_match.group(1) if ua_match else "N/A"
-                        ips.append(ip)
-                        user_agents.append(user_agent)
-                    except ValueError:
-                        # Invalid IP format
-                        continue
+        for line in iter_apache_lines(log_file_path, since, until):
+            parsed = parse_apache_line(line)
+            if parsed:
+                ips.append(parsed[0])
+                user_agents.append(parsed[1])
     except FileNotFoundError:
         colored_print(f"[!] Error: File {log_file_path} not found.", 'red', 'bold')
-        return [], []
+        return [], UserAgentColumn()
     except Exception as e:
         colored_print(f"[!] Error reading Apache log file: {str(e)}", 'red', 'bold')
-        return [], []
+        return [], UserAgentColumn()
         
     return ips, user_agents
 
+def iter_apache_records(log_file_path, since=None, until=None):
+    # Lazily yield (ip, user_agent, timestamp) per log line; timestamp may be None
+    for line in iter_apache_lines(log_file_path, since, until):
+        parsed = parse_apache_line(line)
+        if parsed:
+            yield parsed[0], parsed[1], parse_apache_time(line)
+
+def _has_csv_column(csv_file, column_name):
+    # Check the header up front (usecols would fail with a pandas ValueError) and report
+    # a missing column the way csv_ipext does; file objects are rewound afterwards
+    position = csv_file.tell() if hasattr(csv_file, 'tell') else None
+    columns = pd.read_csv(csv_file, nrows=0).columns
+    if position is not None:
+        csv_file.seek(position)
+    if column_name in columns:
+        return True
+    colored_print(f"[!] Error: Column '{column_name}' not found in the CSV file.", 'red', 'bold')
+    colored_print(f"[i] Available columns: {', '.join(columns)}", 'yellow')
+    return False
+
+def iter_csv_ips(csv_file, column_name=None, chunksize=50000):
+    # Chunked counterpart of csv_ipext: yields the IPs of each chunk without deduplication,
+    # so large files never have to be loaded into a single DataFrame.
+    ip_pattern = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
+    if column_name and not _has_csv_column(csv_file, column_name):
+        return
+    for chunk in pd.read_csv(csv_file, chunksize=chunksize, usecols=[column_name] if column_name else None):
+        ips = []
+        if column_name:
+            for value in chunk[column_name].astype(str):
+                if re.match(ip_pattern, value.strip()):
+                    ips.append(value.strip())
+        else:
+            for column in chunk.columns:
+                for value in chunk[column].astype(str):
+                    ips.extend(ip_pattern.findall(value))
+        yield ips
+
 def csv_ipext(csv_file_path, column_name=None):
     ip_pattern = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
     ips = []
@@ -74,15 +299,12 @@ def csv_ipext(csv_file_path, column_name=None):
         
     return ips
 
-def read_stdin_ips():
+def parse_ip_lines(lines):
+    # Pull IPs out of free-form text lines; lines without an IP are resolved as hostnames
     ip_pattern = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
     ips = []
-    
-    input_data = sys.stdin.read().strip()
-    if not input_data:
-        return []
-    
-    for line in input_data.split('\n'):
+
+    for line in lines:
         line = line.strip()
         if not line:
             continue
@@ -101,5 +323,27 @@ def read_stdin_ips():
                 pass
     return ips
 
+def iter_line_entries(lines):
+    # Streaming, lookup-free variant of parse_ip_lines: yields each valid IP on a line, or
+    # the line itself when it holds none (hostnames are resolved later, once per entry)
+    ip_pattern = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        matches = ip_pattern.findall(line)
+        if not matches:
+            yield line
+        for ip in matches:
+            if all(0 <= int(octet) <= 255 for octet in ip.split('.')):
+                yield ip
+
+def read_stdin_ips():
+    input_data = sys.stdin.read().strip()
+    if not input_data:
+        return []
+    
+    return parse_ip_lines(input_data.split('\n'))
+
 def colored_print(message, color, style=None):
     print(colored(message, color, attrs=[style] if style else []))
@@ -0,0 +1,95 @@
+import os
+import glob
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from . import colored_print
+from .ip_ext import apache_ipext, csv_ipext, iter_apache_records, resolve_time_window, UserAgentColumn
+
+logger = logging.getLogger("ipcheck")
+
+GLOB_CHARS = '*?['
+MAX_SCAN_THREADS = 8
+
+
+def expand_inputs(paths):
+    # Files named by each path: a directory contributes every regular file below it, a
+    # pattern (quoted so the shell leaves it alone) its matches; duplicates are dropped
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                files.extend(os.path.join(root, name) for name in sorted(names) if not name.startswith('.'))
+        elif any(char in path for char in GLOB_CHARS):
+            files.extend(match for match in sorted(glob.glob(path, recursive=True)) if os.path.isfile(match))
+        else:
+            files.append(path)
+    return list(dict.fromkeys(files))
+
+
+def scan_file(mode, path, column=None, since=None, until=None):
+    # (ips, user_agents) for one input file; user_agents is None outside Apache mode
+    if mode == "apache":
+        window = resolve_time_window(path, since, until) if since or until else (None, None)
+        ips, user_agents = apache_ipext(path, *window)
+        return ips, user_agents
+    if mode == "csv":
+        return csv_ipext(path, column), None
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.readlines(), None
+
+
+def scan_files(mode, files, column=None, since=None, until=None, max_threads=MAX_SCAN_THREADS):
+    # Extract every file concurrently; returns [(path, ips, user_agents)] in input order
+    def scan(path):
+        try:
+            return (path,) + scan_file(mode, path, column, since, until)
+        except (OSError, ValueError) as e:
+            colored_print(f"[!] Error: Skipping {path}: {e}", 'red', 'bold')
+            return path, [], None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_threads, len(files)))) as pool:
+        return list(pool.map(scan, files))
+
+
+def iter_apache_files(files, since=None, until=None):
+    # iter_apache_records over several logs in turn, each with its own time window
+    for path in files:
+        window = resolve_time_window(path, since, until) if since or until else (None, None)
+        yield from iter_apache_records(path, *window)
+
+
+def merged_output_name(files):
+    # Base name for a merged result: <first file>_and_<n>_more
+    first = os.path.splitext(os.path.basename(files[0]))[0]
+    return f"{first}_and_{len(files) - 1}_more"
+
+
+def run_multi(mode, files, ipcheck, output_path_for, per_file=False, column=None, since=None, until=None):
+    # Enrich several inputs with one shared cache, so an IP seen in many files is looked up
+    # once. ipcheck(ips, output_path, user_agents, cache) runs the per-output pipeline;
+    # output_path_for(name) maps a file (or merged) name to its result path.
+    scanned = scan_files(mode, files, column, since, until)
+    total = sum(len(ips) for _, ips, _ in scanned)
+    colored_print(f"[+] Scanned {len(files)} files, {total} entries", 'green', 'bold')
+
+    cache = {}
+    if per_file:
+        for path, ips, user_agents in scanned:
+            if ips:
+                colored_print(f"\n[FILE] {path}", 'yellow', 'bold')
+                ipcheck(ips, output_path_for(path), user_agents, cache)
+    else:
+        merged_ips = []
+        merged_agents = UserAgentColumn() if mode == "apache" else None
+        for _, ips, user_agents in scanned:
+            merged_ips.extend(ips)
+            if merged_agents is not None:
+                merged_agents.extend(user_agents if user_agents is not None else ["N/A"] * len(ips))
+        if merged_ips:
+            ipcheck(merged_ips, output_path_for(merged_output_name(files)), merged_agents, cache)
+
+    msg = f"Multi-file run: {len(files)} files, {total} entries, {len(cache)} unique entries enriched once"
+    colored_print(f"\n[+] {msg}", 'green', 'bold')
+    logger.info(msg)
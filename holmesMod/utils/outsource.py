@@ -0,0 +1,59 @@
+import ipaddress
+
+
+def _is_domain_pattern(entry):
+    # Anything that is not an IP, contains a dot and no whitespace or slashes
+    if ' ' in entry or '/' in entry or '.' not in entry:
+        return False
+    try:
+        ipaddress.ip_address(entry)
+        return False
+    except ValueError:
+        return True
+
+
+def _add_category(table, key, category):
+    categories = table.setdefault(key, [])
+    if category not in categories:
+        categories.append(category)
+
+
+class OutsourceIndex:
+    # Outsource list entries -> categories.
+    #
+    # IPs and other literal entries are matched exactly. Domains are matched by suffix:
+    # "evil.example" covers itself and every subdomain, "*.badcdn.net" only subdomains.
+    # Conceptually this is a trie on reversed labels (net -> badcdn -> ...); each trie node
+    # is stored as its label suffix in a flat dict rather than as a nested dict, which keeps
+    # multi-million-entry feeds to one dict slot per entry. A lookup probes one key per
+    # label of the queried name, whatever the size of the lists.
+
+    def __init__(self):
+        self._exact = {}
+        self._domains = {}
+        self._wildcards = {}
+
+    def add(self, entry, category):
+        entry = entry.strip()
+        if entry.startswith('*.'):
+            _add_category(self._wildcards, entry[2:].lower().rstrip('.'), category)
+        elif _is_domain_pattern(entry):
+            _add_category(self._domains, entry.lower().rstrip('.'), category)
+        else:
+            _add_category(self._exact, entry, category)
+
+    def get(self, entry, default=None):
+        # Every category matching entry, most specific match first, or default
+        found = list(self._exact.get(entry, ()))
+        # Top-level domains are never numeric, so IPs skip the suffix walk
+        if (self._domains or self._wildcards) and '.' in entry and not entry[-1:].isdigit():
+            labels = entry.lower().rstrip('.').split('.')
+            for depth in range(len(labels)):
+                suffix = '.'.join(labels[depth:])
+                found.extend(category for category in self._domains.get(suffix, ()) if category not in found)
+                if depth:
+                    found.extend(category for category in self._wildcards.get(suffix, ()) if category not in found)
+        return found or default
+
+    def __len__(self):
+        return len(self._exact) + len(self._domains) + len(self._wildcards)
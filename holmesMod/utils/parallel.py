@@ -0,0 +1,104 @@
+import os
+import time
+import multiprocessing
+
+import geoip2.database
+
+from .ip_checker import (
+    _enrich_record,
+    open_geo_readers,
+    load_outsrc_index,
+    colored_print,
+    logger,
+)
+
+DEFAULT_CHUNKSIZE = 32
+
+# Per-worker state, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(virtot, no_rdns):
+    # MODE_MMAP maps the .mmdb files instead of reading them into memory, so every
+    # worker shares the same page-cache pages rather than holding its own copy.
+    _worker['readers'] = open_geo_readers(mode=geoip2.database.MODE_MMAP)
+    _worker['outsrc_index'] = load_outsrc_index()
+    _worker['virtot'] = virtot
+    _worker['no_rdns'] = no_rdns
+
+
+def _enrich_in_worker(entry):
+    started = time.perf_counter()
+    record, _ = _enrich_record(
+        entry, _worker['virtot'], None, _worker['no_rdns'], _worker['readers'], _worker['outsrc_index']
+    )
+    return entry, record, os.getpid(), time.perf_counter() - started
+
+
+def _first_seen(entries):
+    seen = set()
+    for entry in entries:
+        if entry not in seen:
+            seen.add(entry)
+            yield entry
+
+
+class ShardedEnricher:
+    # Enriches the unique entries of a run across a process pool.
+    #
+    # Unique entries are handed out in first-seen order in small chunks (shards), which
+    # keeps workers balanced even when some entries wait on DNS or VirusTotal. Results
+    # come back in the same order, so the caller can walk its full entry list and get
+    # each row exactly when it reaches that entry's first occurrence.
+    #
+    # entries is consumed lazily by the pool, and each record is handed over once and
+    # then forgotten (callers keep their own cache). With unique=True the entries are
+    # not deduplicated again, so nothing here grows with the input.
+
+    def __init__(self, entries, workers, virtot=False, no_rdns=False, chunksize=DEFAULT_CHUNKSIZE, unique=False):
+        self.workers = workers
+        self.virtot = virtot
+        self.no_rdns = no_rdns
+        entries = (entry.strip() for entry in entries)
+        self._records = {}
+        self._done = 0
+        self._busy = {}
+        self._started = time.perf_counter()
+
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        self._pool = context.Pool(workers, initializer=_init_worker, initargs=(virtot, no_rdns))
+        self._results = self._pool.imap(_enrich_in_worker, entries if unique else _first_seen(entries), chunksize)
+
+    def record_for(self, entry):
+        # IPRecord for an entry (without User Agent), or None when it could not be enriched
+        entry = entry.strip()
+        while entry not in self._records:
+            try:
+                done_entry, record, pid, busy = next(self._results)
+            except StopIteration:
+                return None
+            self._records[done_entry] = record
+            self._done += 1
+            self._busy[pid] = self._busy.get(pid, 0.0) + busy
+        return self._records.pop(entry)
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+
+    def report(self):
+        wall = time.perf_counter() - self._started
+        busy = sum(self._busy.values())
+        speedup = busy / wall if wall > 0 else 0.0
+        msg = (f"Parallel enrichment: {self._done} unique entries on {self.workers} workers "
+               f"in {wall:.2f}s wall, {busy:.2f}s worker time, speedup x{speedup:.2f} "
+               f"({speedup / self.workers:.0%} of ideal)")
+        colored_print(f"\n[+] {msg}", 'green')
+        logger.info(msg)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
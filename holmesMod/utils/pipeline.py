@@ -0,0 +1,351 @@
+import csv
+import sys
+import time
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from . import colored_print
+from .ip_checker import (
+    _enrich_record,
+    _get_log_path,
+    _report_bogons,
+    open_geo_readers,
+    close_geo_readers,
+    load_outsrc_index,
+    resolve_output_path,
+    setup_logger,
+    create_excel_report,
+    logger,
+)
+from .ip_ext import parse_apache_line, iter_line_entries, iter_csv_ips
+from .records import record_schema
+from .cache import caches
+
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_BATCH_SIZE = 64
+SAMPLE_INTERVAL = 0.2
+DEFAULT_STAGE_WORKERS = {'extract': 1, 'enrich': 16}
+DEFAULT_DEDUP_ENTRIES = 1000000
+
+_DONE = object()
+_FAILED = object()
+
+
+# ── Generic staged pipeline ───────────────────────────────────────────────────
+
+class StagedPipeline:
+    # Runs a source and a chain of stages on threads connected by bounded queues.
+    #
+    # Items carry their source position, so stages with several workers may finish out of
+    # order; run() puts them back in order. A semaphore limits the items in flight between
+    # the source and run() to `window`, which bounds the reorder buffer as well as the
+    # queues: a slow stage blocks the ones before it instead of piling items up. (State a
+    # stage keeps itself, such as the Deduper below, is the stage's own business.)
+    # Queue depths are sampled while running: a queue that stays full points at a slow
+    # consumer, one that stays empty at a slow producer.
+
+    def __init__(self, source, queue_size=DEFAULT_QUEUE_SIZE, window=None):
+        # A zero-sized queue or window would never let an item through
+        if queue_size < 1 or (window is not None and window < 1):
+            raise ValueError(f"queue_size and window must be at least 1 (got {queue_size} and {window})")
+        self.source = source
+        self.queue_size = queue_size
+        self.window = window
+        self.stages = []
+        self._error = None
+        self._stop = threading.Event()
+
+    def stage(self, name, func, workers=1, ordered=False):
+        # func(payload) -> payload, called from `workers` threads at once. An ordered stage
+        # has one worker and sees payloads in source order.
+        self.stages.append({'name': name, 'func': func, 'workers': 1 if ordered else max(1, workers),
+                            'ordered': ordered, 'busy': 0.0, 'items': 0, 'lock': threading.Lock()})
+        return self
+
+    def _read_source(self, out, first_workers, slots):
+        try:
+            for seq, payload in enumerate(self.source):
+                slots.acquire()
+                if self._stop.is_set():
+                    break
+                out.put((seq, payload))
+        except BaseException as e:
+            self._error = self._error or e
+        finally:
+            for _ in range(first_workers):
+                out.put(_DONE)
+
+    def _in_order(self, inq):
+        # Items of inq in source order; bounded by the window like the final reorder
+        pending = {}
+        next_seq = 0
+        while True:
+            item = inq.get()
+            if item is _DONE:
+                return
+            pending[item[0]] = item
+            while next_seq in pending:
+                yield pending.pop(next_seq)
+                next_seq += 1
+
+    def _run_stage(self, stage, inq, outq, remaining, next_workers):
+        func = stage['func']
+        items = self._in_order(inq) if stage['ordered'] else iter(inq.get, _DONE)
+        try:
+            for seq, payload in items:
+                started = time.perf_counter()
+                if payload is not _FAILED:
+                    try:
+                        payload = func(payload)
+                    except BaseException as e:
+                        # Passed on as a placeholder so run() sees the failure in order
+                        self._error = self._error or e
+                        self._stop.set()
+                        payload = _FAILED
+                with stage['lock']:
+                    stage['busy'] += time.perf_counter() - started
+                    stage['items'] += 1
+                outq.put((seq, payload))
+        finally:
+            # The last worker of a stage to finish passes end-of-stream on
+            with stage['lock']:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                for _ in range(next_workers):
+                    outq.put(_DONE)
+
+    def _sample(self, queues, depths):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            for name, q in queues:
+                depths[name].append(q.qsize())
+
+    def run(self):
+        # Yield every payload in source order once it has passed all stages
+        window = self.window or self.queue_size * (2 + sum(stage['workers'] for stage in self.stages))
+        slots = threading.Semaphore(window)
+        names = ['source'] + [stage['name'] for stage in self.stages]
+        queues = [queue.Queue(self.queue_size) for _ in self.stages] + [queue.Queue(self.queue_size)]
+        self.queue_names = [f"{a} -> {b}" for a, b in zip(names, names[1:] + ['output'])]
+        self.depths = {name: [] for name in self.queue_names}
+
+        workers = [stage['workers'] for stage in self.stages] + [1]
+        threads = [threading.Thread(target=self._read_source, args=(queues[0], workers[0], slots), daemon=True)]
+        for i, stage in enumerate(self.stages):
+            remaining = [stage['workers']]
+            for _ in range(stage['workers']):
+                threads.append(threading.Thread(target=self._run_stage, daemon=True,
+                                                args=(stage, queues[i], queues[i + 1], remaining, workers[i + 1])))
+        threads.append(threading.Thread(target=self._sample, args=(list(zip(self.queue_names, queues)), self.depths),
+                                        daemon=True))
+        self._started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        pending = {}
+        next_seq = 0
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _DONE:
+                    break
+                if self._error:
+                    raise self._error
+                pending[item[0]] = item[1]
+                while next_seq in pending:
+                    yield pending.pop(next_seq)
+                    next_seq += 1
+                    slots.release()
+            if self._error:
+                raise self._error
+        finally:
+            self._stop.set()
+            self.wall = time.perf_counter() - self._started
+            # Unblock a source waiting for a slot so its thread can finish
+            slots.release()
+
+    def report(self):
+        lines = []
+        for name in self.queue_names:
+            samples = self.depths[name] or [0]
+            average = sum(samples) / len(samples)
+            full = sum(depth >= self.queue_size for depth in samples) / len(samples)
+            lines.append(f"{name}: avg {average:.1f}/{self.queue_size}, max {max(samples)}, full {full:.0%}")
+        for stage in self.stages:
+            utilisation = stage['busy'] / (self.wall * stage['workers']) if self.wall else 0.0
+            lines.append(f"{stage['name']} x{stage['workers']}: {stage['items']} batches, "
+                         f"{stage['busy']:.2f}s busy ({utilisation:.0%} of its workers' time)")
+        colored_print(f"\n[PIPELINE] {self.wall:.2f}s wall. Queue depth (a full queue means the stage "
+                      f"after it is the bottleneck):", 'cyan', 'bold')
+        for line in lines:
+            colored_print(f"  {line}", 'cyan')
+            logger.info(f"Pipeline {line}")
+
+
+# ── HolmesGeo stages: read, extract, dedupe, enrich, write ────────────────────
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def read_batches(mode, files, column=None, batch_size=DEFAULT_BATCH_SIZE):
+    # Source stage: raw lines (or CSV IPs, already extracted chunk-wise by pandas)
+    if mode == "stdin":
+        yield from _batches(sys.stdin, batch_size)
+        return
+    for path in files:
+        if mode == "csv":
+            for ips in iter_csv_ips(path, column):
+                yield from _batches(ips, batch_size)
+        else:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                yield from _batches(f, batch_size)
+
+
+def extractor(mode):
+    # Extract stage: [(entry, user_agent)] per batch
+    if mode == "apache":
+        def extract(lines):
+            return [parsed for parsed in map(parse_apache_line, lines) if parsed]
+    elif mode == "stdin":
+        def extract(lines):
+            return [(entry, None) for entry in iter_line_entries(lines)]
+    elif mode == "check":
+        def extract(lines):
+            return [(line.strip(), None) for line in lines if line.strip()]
+    else:
+        def extract(ips):
+            return [(ip.strip(), None) for ip in ips]
+    return extract
+
+
+class Deduper:
+    # Dedupe stage (ordered): the first occurrence of an entry owns a Future for its
+    # record; later occurrences share it and skip enrichment. Since owners always come
+    # earlier in the output than their duplicates, the writer never waits on a Future
+    # that has not been handed to the enrich stage yet.
+    #
+    # The Futures (and their records) of the last max_entries distinct entries are kept,
+    # least recently seen dropped first, so memory stays bounded on inputs with huge
+    # numbers of distinct entries; an entry seen again after being dropped is enriched
+    # again, mostly from the lookup caches.
+    def __init__(self, bogons=None, max_entries=DEFAULT_DEDUP_ENTRIES):
+        self.bogons = bogons
+        self.max_entries = max_entries
+        self.futures = OrderedDict()
+
+    def __call__(self, entries):
+        marked = []
+        for entry, user_agent in entries:
+            if self.bogons and self.bogons.check(entry):
+                continue
+            future = self.futures.get(entry)
+            owner = future is None
+            if owner:
+                future = self.futures[entry] = Future()
+                if len(self.futures) > self.max_entries:
+                    self.futures.popitem(last=False)
+            else:
+                self.futures.move_to_end(entry)
+            marked.append((entry, user_agent, future, owner))
+        return marked
+
+
+class Enricher:
+    # Enrich stage: looks up the entries a batch owns. Readers and outsource lists are
+    # shared by all enrich threads (lookups are read-only).
+    def __init__(self, virtot, no_rdns):
+        self.virtot = virtot
+        self.no_rdns = no_rdns
+        self.readers = open_geo_readers()
+        self.outsrc_index = load_outsrc_index()
+
+    def __call__(self, marked):
+        for entry, _, future, owner in marked:
+            if owner:
+                try:
+                    record, _ = _enrich_record(entry, self.virtot, None, self.no_rdns, self.readers, self.outsrc_index)
+                except Exception as e:
+                    future.set_exception(e)
+                    raise
+                future.set_result(record)
+        return marked
+
+    def close(self):
+        close_geo_readers(self.readers)
+
+
+def parse_stage_workers(spec):
+    # "extract=2,enrich=32" -> {'extract': 2, 'enrich': 32}
+    workers = dict(DEFAULT_STAGE_WORKERS)
+    for part in filter(None, (spec or '').split(',')):
+        name, _, count = part.partition('=')
+        if name.strip() not in workers or not count.strip().isdigit():
+            raise ValueError(f"Invalid stage workers '{part}' (expected e.g. extract=2,enrich=32)")
+        workers[name.strip()] = int(count)
+    return workers
+
+
+def run_pipeline(mode, files, output_path, virtot=False, no_rdns=False, no_output=False, bogons=None,
+                 column=None, stage_workers=None, queue_size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE):
+    # Same rows and files as ipcheck_mod (one row per entry occurrence, in input order),
+    # with reading, extraction, enrichment and writing overlapping instead of taking turns
+    workers = stage_workers or dict(DEFAULT_STAGE_WORKERS)
+    schema = record_schema(no_rdns, virtot, mode == "apache")
+    outfp = None if no_output else resolve_output_path(output_path)
+    log_path = _get_log_path(outfp or output_path)
+    setup_logger(log_path)
+    logger.info(f"Session started (pipeline mode). Output file: {outfp or 'stdout only'}")
+
+    enricher = Enricher(virtot, no_rdns)
+    pipeline = (StagedPipeline(read_batches(mode, files, column, batch_size), queue_size)
+                .stage('extract', extractor(mode), workers['extract'])
+                .stage('dedupe', Deduper(bogons), ordered=True)
+                .stage('enrich', enricher, workers['enrich']))
+
+    stdout_writer = csv.writer(sys.stdout, lineterminator='\n')
+    file = open(outfp, 'w', newline='') if outfp else None
+    written = skipped = 0
+    try:
+        writers = [stdout_writer] + ([csv.writer(file)] if file else [])
+        for writer in writers:
+            writer.writerow(schema.header)
+        # Write stage: runs here, consuming batches in input order
+        for marked in pipeline.run():
+            for entry, user_agent, future, _ in marked:
+                record = future.result()
+                if record is None:
+                    skipped += 1
+                    continue
+                if user_agent is not None:
+                    record = record._replace(user_agent=user_agent)
+                row = schema.to_row(record)
+                for writer in writers:
+                    writer.writerow(row)
+                written += 1
+    finally:
+        enricher.close()
+        if file:
+            file.close()
+
+    pipeline.report()
+    logger.info(f"Processing complete. Written: {written}, Skipped/Errored: {skipped}")
+    _report_bogons(bogons)
+    caches.report()
+    if outfp:
+        colored_print('\n\n\n[STAGE-1]', 'yellow', 'bold')
+        print(f'Result saved to: {outfp}')
+        colored_print(f'[LOG] Error log saved to: {log_path}', 'red', 'bold')
+        print("\n")
+        create_excel_report(outfp)
+    else:
+        colored_print(f'\n[LOG] Error log saved to: {log_path}', 'cyan', 'bold')
@@ -0,0 +1,236 @@
+import io
+import os
+import sys
+import time
+import signal
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from . import colored_print
+logger = logging.getLogger("ipcheck")
+
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+PEAK_POLL_INTERVAL = 0.5
+PEAK_GROWTH = 1.1
+
+
+class StackSampler:
+    # Statistical profiler: a CPU-time timer (ITIMER_PROF) interrupts the main thread every
+    # `interval` seconds and the current stack is counted. Cost is one stack walk per
+    # sample rather than a hook on every call, so it can stay on for real workloads.
+    # Stacks are written in the folded format read by speedscope and flamegraph.pl.
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def start(self):
+        self._previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous)
+
+    def hottest(self, limit):
+        # (function, self samples, inclusive samples), by self samples
+        own, inclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+        return [(name, count, inclusive[name]) for name, count in own.most_common(limit)]
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ThreadProfiles:
+    # cProfile only sees the thread that enabled it (before Python 3.12), so while the run
+    # is profiled every new thread starts its own profile through threading.setprofile:
+    # the hook runs once, on the thread's first call, and is replaced by the profile it
+    # enables. Pipeline stages and thread pools are thereby included. Profiles of threads
+    # that have finished are merged into the report; a thread still running at the end
+    # cannot be stopped safely from another thread, so it is only counted.
+
+    def __init__(self):
+        self.profiles = []
+        self._lock = threading.Lock()
+
+    def _start_thread(self, frame, event, arg):
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append((threading.current_thread(), profile))
+        profile.enable()
+
+    def start(self):
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._start_thread)
+
+    def stop(self):
+        threading.setprofile(None)
+
+    def merge_into(self, stats):
+        # Add the profiles of finished threads to stats; returns the number left out
+        with self._lock:
+            profiles = list(self.profiles)
+        running = 0
+        for thread, profile in profiles:
+            if thread.is_alive():
+                running += 1
+            else:
+                stats.add(profile)
+        return running
+
+
+class PeakSnapshotter:
+    # tracemalloc has no hook for a new peak, so a thread polls the traced size and takes
+    # a snapshot whenever it has grown by PEAK_GROWTH since the last one. The last
+    # snapshot is the allocation picture closest to the peak (within one poll interval).
+
+    def __init__(self, interval=PEAK_POLL_INTERVAL):
+        self.interval = interval
+        self.snapshot = None
+        self.size = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._poll, name="tracemalloc-peak", daemon=True)
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self.size * PEAK_GROWTH:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.size = current
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        # The run may have peaked after the last poll
+        self.sample()
+
+
+def _write_allocations(report, title, snapshot):
+    report.write(f"\n== {title} (top {TOP_ALLOCATIONS}) ==\n")
+    for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+        frame = stat.traceback[0]
+        report.write(f"{stat.size / 1024:>10.1f} KiB {stat.count:>9} blocks  {frame.filename}:{frame.lineno}\n")
+
+
+def _profile_base(results_dir):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(results_dir, f"profile_{timestamp}")
+
+
+def run_profiled(func, results_dir, mode='cprofile', console=None, memory=False):
+    # Run func() under a CPU profiler, then write a ranked report and the raw profile next
+    # to the results. The report is written even if func() fails or is interrupted. Worker
+    # processes started with --workers are not profiled. cProfile covers the threads the
+    # run starts (see ThreadProfiles); the sampler only sees the main thread.
+    # With memory, tracemalloc also runs (it slows allocation-heavy code several times
+    # over, so it is opt-in) and the report lists allocation sites near the peak and at exit.
+    # console is where the closing message goes (stderr when stdout carries results).
+    os.makedirs(results_dir, exist_ok=True)
+    base = _profile_base(results_dir)
+    use_sampler = mode == 'sample' and hasattr(signal, 'setitimer')
+    profiler = StackSampler() if use_sampler else cProfile.Profile()
+    threads = None if use_sampler else ThreadProfiles()
+
+    peak_snapshots = None
+    if memory:
+        tracemalloc.start()
+        peak_snapshots = PeakSnapshotter()
+        peak_snapshots.start()
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    if use_sampler:
+        profiler.start()
+    else:
+        threads.start()
+        profiler.enable()
+    try:
+        return func()
+    finally:
+        if use_sampler:
+            profiler.stop()
+        else:
+            profiler.disable()
+            threads.stop()
+            stats = pstats.Stats(profiler)
+            still_running = threads.merge_into(stats)
+        wall = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+        if memory:
+            peak_snapshots.stop()
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        raw_path = f"{base}.folded" if use_sampler else f"{base}.prof"
+        if use_sampler:
+            profiler.dump(raw_path)
+        else:
+            stats.dump_stats(raw_path)
+
+        report_path = f"{base}.txt"
+        with open(report_path, 'w') as report:
+            report.write(f"HolmesGeo profile ({'sampling' if use_sampler else 'cProfile'})\n")
+            report.write(f"Command: {' '.join(sys.argv)}\n")
+            report.write(f"Wall time: {wall:.2f}s, CPU time: {cpu:.2f}s\n")
+            if memory:
+                report.write(f"Traced memory: {current / 1e6:.1f} MB at exit, {peak / 1e6:.1f} MB peak\n")
+            if not use_sampler:
+                report.write(f"Threads profiled: {len(threads.profiles) - still_running + 1}"
+                             + (f" ({still_running} still running at exit, not included)" if still_running else "")
+                             + "\n")
+            report.write("\n")
+
+            report.write(f"== Hottest functions (top {TOP_FUNCTIONS}) ==\n")
+            if use_sampler:
+                total = max(profiler.samples, 1)
+                report.write(f"{'self %':>7} {'total %':>8}  function\n")
+                for name, own, inclusive in profiler.hottest(TOP_FUNCTIONS):
+                    report.write(f"{own / total:>7.1%} {inclusive / total:>8.1%}  {name}\n")
+            else:
+                for sort_key in ('tottime', 'cumulative'):
+                    stream = io.StringIO()
+                    stats.stream = stream
+                    stats.strip_dirs().sort_stats(sort_key).print_stats(TOP_FUNCTIONS)
+                    report.write(f"-- by {sort_key} --\n{stream.getvalue()}\n")
+
+            if memory:
+                if peak_snapshots.snapshot is not None:
+                    _write_allocations(report, f"Biggest allocation sites near the peak, "
+                                               f"{peak_snapshots.size / 1e6:.1f} MB traced", peak_snapshots.snapshot)
+                _write_allocations(report, "Biggest allocation sites still held at exit", snapshot)
+
+        msg = f"Profile written to {report_path} (raw: {raw_path}); wall {wall:.2f}s"
+        if memory:
+            msg += f", peak traced memory {peak / 1e6:.1f} MB"
+        colored_print(f"\n[PROFILE] {msg}", 'magenta', 'bold', file=console)
+        logger.info(msg)
@@ -0,0 +1,136 @@
+import math
+from array import array
+from functools import lru_cache
+from operator import attrgetter
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+# Placeholder written to CSV/Excel/JSON for a missing value; records themselves use None
+MISSING = 'N/A'
+
+
+class IPRecord(NamedTuple):
+    # One enriched entry. A fixed-size tuple (no per-row dict or over-allocated list);
+    # every field except ip is nullable.
+    ip: str
+    category: Optional[str] = None
+    city: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    country: Optional[str] = None
+    country_code: Optional[str] = None
+    continent: Optional[str] = None
+    asn_number: Optional[int] = None
+    asn_org: Optional[str] = None
+    network: Optional[str] = None
+    reverse_dns: Optional[str] = None
+    certificate_cn: Optional[str] = None
+    registrar: Optional[str] = None
+    user_agent: Optional[str] = None
+
+
+# Output column label -> record field, in output order
+COLUMNS = (
+    ('IP Address', 'ip'),
+    ('IP Category', 'category'),
+    ('City', 'city'),
+    ('City Latitude', 'latitude'),
+    ('City Longitude', 'longitude'),
+    ('Country', 'country'),
+    ('Country Code', 'country_code'),
+    ('Continent', 'continent'),
+    ('ASN Number', 'asn_number'),
+    ('ASN Organization', 'asn_org'),
+    ('Network', 'network'),
+    ('Reverse DNS', 'reverse_dns'),
+    ('Certificate CN', 'certificate_cn'),
+    ('Domain Registrar URL', 'registrar'),
+    ('User Agent', 'user_agent'),
+)
+FIELD_BY_COLUMN = dict(COLUMNS)
+FLOAT_FIELDS = ('latitude', 'longitude')
+
+
+def nullable(value):
+    # Map the legacy 'N/A' placeholder (and empty strings) to None
+    return None if value in (None, '', MISSING) else value
+
+
+class RecordSchema:
+    # The column layout selected by the run flags, and conversions from records to the
+    # row lists and dicts that writers and the HTTP API emit.
+
+    def __init__(self, header):
+        self.header = list(header)
+        self.fields = [FIELD_BY_COLUMN[column] for column in self.header]
+        self._values = attrgetter(*self.fields)
+
+    def values(self, record):
+        return self._values(record)
+
+    def to_row(self, record):
+        return [MISSING if value is None else value for value in self._values(record)]
+
+    def to_dict(self, record):
+        return dict(zip(self.header, self.to_row(record)))
+
+
+@lru_cache(maxsize=None)
+def record_schema(no_rdns, virtot, with_user_agent):
+    skipped = set()
+    if no_rdns:
+        skipped.add('reverse_dns')
+    if not virtot:
+        skipped.update(('certificate_cn', 'registrar'))
+    if not with_user_agent:
+        skipped.add('user_agent')
+    return RecordSchema(column for column, field in COLUMNS if field not in skipped)
+
+
+class ColumnBuffer:
+    # Column-oriented batch of records for writers and tables: one list per column, and
+    # latitude/longitude as packed doubles (NaN for missing), so holding N results costs
+    # N references per column instead of N row lists with boxed floats.
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.columns = {
+            field: array('d') if field in FLOAT_FIELDS else []
+            for field in schema.fields
+        }
+
+    def append(self, record):
+        for field, value in zip(self.schema.fields, self.schema.values(record)):
+            if field in FLOAT_FIELDS:
+                value = math.nan if value is None else value
+            self.columns[field].append(value)
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        first = self.schema.fields[0]
+        return len(self.columns[first])
+
+    def rows(self, start=0, stop=None):
+        # Row lists with MISSING placeholders, e.g. for csv.writer.writerows
+        columns = [self.columns[field][start:stop] for field in self.schema.fields]
+        for values in zip(*columns):
+            yield [MISSING if value is None or value != value else value for value in values]
+
+    def to_dataframe(self, start=0, stop=None, fill=MISSING):
+        data = {}
+        for column, field in zip(self.schema.header, self.schema.fields):
+            values = self.columns[field][start:stop]
+            series = pd.Series(values, dtype='float64' if field in FLOAT_FIELDS else 'object')
+            data[column] = series.astype(object).where(series.notna(), fill) if fill is not None else series
+        return pd.DataFrame(data, columns=self.schema.header)
+
+    def tail(self, n):
+        return self.to_dataframe(start=max(len(self) - n, 0))
+
+    def clear(self):
+        for field in self.columns:
+            self.columns[field] = array('d') if field in FLOAT_FIELDS else []
@@ -0,0 +1,92 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_ROWS = 2000000
+DEFAULT_MAX_ENTRIES = 16
+DEFAULT_MAX_AGE = 3600
+
+
+def content_key(chunks, *options):
+    # SHA-256 over the input bytes followed by the options that change the result, so the
+    # same upload analysed with the same settings maps to the same key
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    digest.update(repr(options).encode())
+    return digest.hexdigest()
+
+
+def iter_file_chunks(fileobj, chunk_size=HASH_CHUNK_SIZE):
+    fileobj.seek(0)
+    yield from iter(lambda: fileobj.read(chunk_size), b'')
+    fileobj.seek(0)
+
+
+class CachedResult:
+    # One finished analysis: the result table plus anything derived from it (CSV/XLSX
+    # bytes for the download buttons ...), built on first use and kept with the entry
+    def __init__(self, df):
+        self.df = df
+        self.created = time.monotonic()
+        self._artifacts = {}
+
+    def artifact(self, name, build):
+        if name not in self._artifacts:
+            self._artifacts[name] = build(self.df)
+        return self._artifacts[name]
+
+    def __len__(self):
+        return len(self.df)
+
+
+class ResultCache:
+    # Finished results by content key, least recently used first. Entries older than
+    # max_age seconds are dropped, and the oldest are evicted once the cache holds more
+    # than max_entries results or max_rows rows in total. Shared by every session.
+
+    def __init__(self, max_rows=DEFAULT_MAX_ROWS, max_entries=DEFAULT_MAX_ENTRIES, max_age=DEFAULT_MAX_AGE):
+        self.max_rows = max_rows
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, df):
+        entry = CachedResult(df)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = entry
+            self._rows += len(entry)
+            self._expire()
+            # The newest entry is kept even if it alone exceeds max_rows
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._rows > self.max_rows):
+                self._discard(next(iter(self._entries)))
+        return entry
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._rows -= len(entry)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.max_age
+        for key in [key for key, entry in self._entries.items() if entry.created < cutoff]:
+            self._discard(key)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._entries)
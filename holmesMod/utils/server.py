@@ -0,0 +1,296 @@
+import os
+import json
+import stat
+import logging
+import itertools
+import socketserver
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from . import colored_print
+from .engine import EnrichmentEngine
+from .geodb import GeoDatabases, DEFAULT_CHECK_INTERVAL
+from .ip_checker import load_outsrc_index
+from .cache import caches
+
+DEFAULT_ADDRESS = "127.0.0.1:8787"
+DEFAULT_CACHE_SIZE = 100000
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+logger = logging.getLogger("ipcheck")
+
+
+# ── Lookup service ────────────────────────────────────────────────────────────
+
+class LookupService:
+    # Keeps the GeoIP readers, outsource index and already-enriched records in memory
+    # so each request only pays for entries that have not been seen before.
+    # Updated GeoIP databases are picked up in the background and drop the record cache.
+    # Each drop starts a new generation; a lookup that was already running on the old
+    # readers does not store its record afterwards (as in CacheNamespace).
+    # VirusTotal is only queried when the service itself was started with virtot, so
+    # clients cannot spend the key of a daemon that was not meant to use it.
+
+    def __init__(self, virtot=False, no_rdns=False, cache_size=DEFAULT_CACHE_SIZE,
+                 db_check_interval=DEFAULT_CHECK_INTERVAL):
+        self.virtot = virtot
+        self.no_rdns = no_rdns
+        self.cache_size = cache_size
+        self._engines = {}
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.readers = GeoDatabases(check_interval=db_check_interval, on_reload=self._invalidate)
+        self.readers.start_watching()
+        self.outsrc_index = load_outsrc_index()
+
+    def _invalidate(self, changed_names=None):
+        with self._lock:
+            self._records.clear()
+            self._generation += 1
+
+    def _engine(self, virtot, no_rdns):
+        key = (virtot, no_rdns)
+        engine = self._engines.get(key)
+        if engine is None:
+            engine = EnrichmentEngine(virtot, no_rdns, self.readers, self.outsrc_index)
+            self._engines[key] = engine
+        return engine
+
+    def _cached_record(self, key):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self._records.move_to_end(key)
+            return record
+
+    def _store_record(self, key, record, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._records[key] = record
+            self._records.move_to_end(key)
+            while len(self._records) > self.cache_size:
+                self._records.popitem(last=False)
+
+    def _options(self, virtot, no_rdns):
+        virtot = self.virtot if virtot is None else bool(virtot) and self.virtot
+        no_rdns = self.no_rdns if no_rdns is None else no_rdns
+        return virtot, no_rdns
+
+    def header(self, virtot=None, no_rdns=None, user_agents=None):
+        virtot, no_rdns = self._options(virtot, no_rdns)
+        return self._engine(virtot, no_rdns).header(user_agents)
+
+    def lookup(self, entries, virtot=None, no_rdns=None, user_agents=None):
+        # Yield (entry, record-or-None) for each entry, in request order
+        virtot, no_rdns = self._options(virtot, no_rdns)
+        engine = self._engine(virtot, no_rdns)
+        schema = engine.schema(user_agents)
+
+        for i, entry in enumerate(entries):
+            entry = str(entry).strip()
+            key = (entry, virtot, no_rdns)
+            record = self._cached_record(key)
+            if record is None:
+                generation = self._generation
+                record = engine.enrich_record(entry)
+                if record is None:
+                    yield entry, None
+                    continue
+                self._store_record(key, record, generation)
+
+            if user_agents is not None:
+                record = record._replace(user_agent=user_agents[i] if i < len(user_agents) else "N/A")
+            yield entry, schema.to_dict(record)
+
+    def stats(self):
+        with self._lock:
+            cached = len(self._records)
+        return {
+            "status": "ok",
+            "cached_entries": cached,
+            "cache_size": self.cache_size,
+            "db_build": self.readers.build_dates(),
+            "db_build_epoch": self.readers.build_epochs(),
+            "lookup_caches": caches.stats(),
+        }
+
+    def close(self):
+        self.readers.close()
+
+
+# ── HTTP front-end ────────────────────────────────────────────────────────────
+
+class LookupRequestHandler(BaseHTTPRequestHandler):
+    # POST /lookup  {"entries": [...], "virtot": bool, "no_rdns": bool, "user_agents": [...]}
+    #               or a bare JSON list of entries.
+    # GET  /health  service and cache status.
+    # NDJSON is returned with ?format=ndjson or "Accept: application/x-ndjson".
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY each small
+    # response waits on the client's delayed ACK (~40ms) on keep-alive connections.
+    disable_nagle_algorithm = True
+    service = None
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) tuple
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self._send_json(200, self.service.stats())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/lookup":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        # The body of a rejected request is not read, so the connection cannot be reused
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self.close_connection = True
+            self._send_json(400, {"error": "Invalid Content-Length header"})
+            return
+        if length <= 0 or length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(400, {"error": "Request body missing or too large"})
+            return
+
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid JSON: {e}"})
+            return
+
+        if isinstance(payload, list):
+            payload = {"entries": payload}
+        entries = payload.get("entries") if isinstance(payload, dict) else None
+        if not isinstance(entries, list):
+            self._send_json(400, {"error": "Expected a JSON list of entries or {\"entries\": [...]}"})
+            return
+
+        user_agents = payload.get("user_agents")
+        if user_agents is not None and not (
+                isinstance(user_agents, list) and all(isinstance(ua, str) for ua in user_agents)):
+            self._send_json(400, {"error": "Expected \"user_agents\" to be a list of strings"})
+            return
+
+        options = {
+            "virtot": payload.get("virtot"),
+            "no_rdns": payload.get("no_rdns"),
+            "user_agents": user_agents,
+        }
+        ndjson = (
+            parse_qs(url.query).get("format", [""])[0] == "ndjson"
+            or "application/x-ndjson" in self.headers.get("Accept", "")
+        )
+
+        results = self.service.lookup(entries, **options)
+        if ndjson:
+            self._stream_ndjson(results)
+            return
+
+        records, skipped = [], []
+        try:
+            for entry, record in results:
+                if record is None:
+                    skipped.append(entry)
+                else:
+                    records.append(record)
+        except Exception as e:
+            logger.error(f"Lookup failed: {e}")
+            self._send_json(500, {"error": f"Lookup failed: {e}"})
+            return
+        self._send_json(200, {
+            "results": records,
+            "skipped": skipped,
+            "db_build_epoch": self.service.readers.build_epochs(),
+        })
+
+    def _stream_ndjson(self, results):
+        # The first result is computed before the status line, so a failing lookup can
+        # still be answered with a 500; later failures end the stream with an error line
+        try:
+            first = next(results, None)
+        except Exception as e:
+            logger.error(f"Lookup failed: {e}")
+            self._send_json(500, {"error": f"Lookup failed: {e}"})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for entry, record in itertools.chain([first] if first else [], results):
+                self._write_chunk(record if record is not None else {"entry": entry, "skipped": True})
+        except Exception as e:
+            logger.error(f"Lookup failed: {e}")
+            self._write_chunk({"error": f"Lookup failed: {e}"})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, line):
+        data = (json.dumps(line) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(address, service):
+    # address is "host:port" or "unix:/path/to.sock"
+    handler = type("BoundLookupRequestHandler", (LookupRequestHandler,), {"service": service})
+
+    if address.startswith("unix:"):
+        path = address[len("unix:"):]
+        if os.path.exists(path):
+            # Only a stale socket from an earlier daemon is replaced, never a regular file
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise OSError(f"{path} exists and is not a socket")
+            os.unlink(path)
+        return ThreadingUnixHTTPServer(path, handler)
+
+    host, _, port = address.rpartition(":")
+    return ThreadingHTTPServer((host or "127.0.0.1", int(port)), handler)
+
+
+def serve(address=DEFAULT_ADDRESS, virtot=False, no_rdns=False, cache_size=DEFAULT_CACHE_SIZE,
+          db_check_interval=DEFAULT_CHECK_INTERVAL):
+    service = LookupService(virtot, no_rdns, cache_size, db_check_interval)
+    try:
+        server = create_server(address, service)
+    except OSError as e:
+        colored_print(f"[!] Error: Cannot listen on {address}: {e}", "red", "bold")
+        service.close()
+        return
+    colored_print(f"[+] HolmesGeo lookup daemon listening on {address}", "green", "bold")
+    print("    POST /lookup (JSON or NDJSON), GET /health. Press Ctrl+C to stop.")
+    print(f"    GeoIP database build: {service.readers.build_dates()}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        colored_print("\n[!] Shutting down lookup daemon.", "yellow", "bold")
+    finally:
+        server.server_close()
+        service.close()
+        if address.startswith("unix:") and os.path.exists(address[len("unix:"):]):
+            os.unlink(address[len("unix:"):])
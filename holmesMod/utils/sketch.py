@@ -0,0 +1,108 @@
+import math
+import heapq
+import hashlib
+import logging
+
+from . import colored_print
+logger = logging.getLogger("ipcheck")
+
+# Counters tracked per requested top-K entry; more slots tighten the overcount bound
+DEFAULT_CAPACITY_FACTOR = 4
+DEFAULT_HLL_PRECISION = 14
+
+
+class SpaceSaving:
+    # Space-Saving heavy-hitter sketch (Metwally et al.): at most `capacity` counters.
+    # A new item takes over the smallest counter and inherits its count as error, so every
+    # reported count is an overestimate by at most `error`, and any item with more than
+    # total/capacity hits is guaranteed to be tracked.
+    #
+    # The smallest counter is found through a heap holding one entry per tracked item.
+    # Counts only grow, so heap keys are lower bounds: a popped entry that is stale is
+    # pushed back with its current count until an up-to-date one surfaces.
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError(f"Space-Saving needs at least one counter, got capacity {capacity}")
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+        self._heap = []
+
+    def add(self, item, n=1):
+        self.total += n
+        count = self.counts.get(item)
+        if count is not None:
+            self.counts[item] = count + n
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = n
+            self.errors[item] = 0
+            heapq.heappush(self._heap, (n, item))
+            return
+
+        while True:
+            floor, victim = heapq.heappop(self._heap)
+            current = self.counts[victim]
+            if current == floor:
+                break
+            heapq.heappush(self._heap, (current, victim))
+        del self.counts[victim]
+        del self.errors[victim]
+        self.counts[item] = floor + n
+        self.errors[item] = floor
+        heapq.heappush(self._heap, (floor + n, item))
+
+    def top(self, k):
+        # [(item, count, max_overcount)] for the k largest counters, largest first
+        ranked = heapq.nlargest(k, self.counts.items(), key=lambda item: item[1])
+        return [(item, count, self.errors[item]) for item, count in ranked]
+
+
+class HyperLogLog:
+    # Distinct-count estimate in 2**precision one-byte registers (16 KB at the default,
+    # about 0.8% standard error), independent of how many distinct items stream past.
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        self._rank_bits = 64 - precision
+
+    def add(self, item):
+        value = int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), 'big')
+        index = value >> self._rank_bits
+        rest = value & ((1 << self._rank_bits) - 1)
+        rank = self._rank_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting over the empty registers
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+def find_heavy_hitters(entries, k, capacity=None):
+    # Single pass over entries; returns (top list, total entries, estimated distinct entries)
+    sketch = SpaceSaving(capacity or k * DEFAULT_CAPACITY_FACTOR)
+    distinct = HyperLogLog()
+    for entry in entries:
+        sketch.add(entry)
+        distinct.add(entry)
+    return sketch.top(k), sketch.total, distinct.count()
+
+
+def report_heavy_hitters(top, total, distinct):
+    colored_print(f"\n[TOP-K] {total} entries, ~{distinct} distinct, enriching the top {len(top)}", 'yellow', 'bold')
+    print(f"{'Entry':<40} {'Hits':>10} {'Share':>7} {'Max over':>9}")
+    for entry, hits, error in top:
+        share = hits / total if total else 0.0
+        print(f"{entry[:40]:<40} {hits:>10} {share:>7.1%} {error:>9}")
+    logger.info(f"Top-K mode: {total} entries, ~{distinct} distinct, top {len(top)} enriched")
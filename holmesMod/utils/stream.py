@@ -0,0 +1,92 @@
+import csv
+import sys
+import json
+import time
+import logging
+from collections import OrderedDict
+from contextlib import redirect_stdout
+
+from . import colored_print
+from .engine import EnrichmentEngine
+from .ip_ext import iter_line_entries
+from .cache import caches
+
+logger = logging.getLogger("ipcheck")
+
+DEFAULT_CACHE_SIZE = 100000
+
+
+def iter_stdin_lines(stdin=None):
+    # readline() returns as soon as a full line is available, so lines from a slow
+    # producer (tail -F, grep --line-buffered) are handed on immediately
+    stdin = stdin or sys.stdin
+    return iter(stdin.readline, '')
+
+
+class StreamEnricher:
+    # Enriches entries one at a time with a bounded LRU of recent records, so a pipeline
+    # stage can run for days without its memory growing with the input.
+
+    def __init__(self, engine, bogons=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.engine = engine
+        self.bogons = bogons
+        self.cache_size = cache_size
+        self._records = OrderedDict()
+        self.lines = 0
+        self.written = 0
+
+    def record_for(self, entry):
+        if entry in self._records:
+            self._records.move_to_end(entry)
+            return self._records[entry]
+        record = self.engine.enrich_record(entry)
+        self._records[entry] = record
+        if len(self._records) > self.cache_size:
+            self._records.popitem(last=False)
+        return record
+
+    def enrich(self, entries):
+        # Yield a record per entry that could be enriched, as soon as it is enriched
+        for entry in entries:
+            self.lines += 1
+            if self.bogons and self.bogons.check(entry):
+                continue
+            record = self.record_for(entry)
+            if record is not None:
+                self.written += 1
+                yield record
+
+
+def stream_stdin(out, virtot=False, no_rdns=False, ndjson=False, bogons=None,
+                 cache_size=DEFAULT_CACHE_SIZE, stdin=None):
+    # Results go to `out` (the real stdout), one flushed line per record; every progress
+    # or warning message printed along the way is redirected to stderr.
+    started = time.monotonic()
+    with redirect_stdout(sys.stderr), EnrichmentEngine(virtot, no_rdns) as engine:
+        schema = engine.schema()
+        enricher = StreamEnricher(engine, bogons, cache_size)
+        writer = None if ndjson else csv.writer(out, lineterminator='\n')
+        try:
+            if writer:
+                writer.writerow(schema.header)
+                out.flush()
+            for record in enricher.enrich(iter_line_entries(iter_stdin_lines(stdin))):
+                if writer:
+                    writer.writerow(schema.to_row(record))
+                else:
+                    out.write(json.dumps(schema.to_dict(record)) + '\n')
+                out.flush()
+        except BrokenPipeError:
+            # The consumer went away (e.g. `| head`); stop quietly
+            pass
+        except KeyboardInterrupt:
+            pass
+
+        elapsed = time.monotonic() - started
+        msg = (f"Stream finished: {enricher.lines} entries read, {enricher.written} written "
+               f"in {elapsed:.1f}s")
+        if bogons and bogons.total:
+            msg += f", {bogons.total} private/reserved skipped ({bogons.summary()})"
+        colored_print(f"[+] {msg}", 'green')
+        logger.info(msg)
+        caches.report()
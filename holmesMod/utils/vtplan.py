@@ -0,0 +1,198 @@
+import json
+import ipaddress
+import logging
+from collections import Counter
+
+from . import colored_print
+from .checkpoint import load_vt_results
+from .ip_checker import _enrich_record, get_ssl_registrar
+from .records import nullable
+
+logger = logging.getLogger("ipcheck")
+
+PROGRESS_EVERY = 50
+DEFAULT_WINDOW = 1000
+
+
+def vt_target(entry, record):
+    # What get_ssl_registrar would be asked about for this entry: the domain (the entry
+    # itself, or the IP's reverse DNS name) when there is one, else the IP
+    try:
+        ipaddress.ip_address(entry)
+    except ValueError:
+        return entry
+    return record.reverse_dns or record.ip
+
+
+def local_registrar(record):
+    # The registrar VirusTotal reports for an IP is "AS{asn} ({as_owner})", which the
+    # local ASN database already knows
+    if record.asn_number is None:
+        return None
+    return f"AS{record.asn_number} ({record.asn_org or 'Unknown'})"
+
+
+class VTPlanner:
+    # Plans the VirusTotal calls of a run from records that were enriched without it.
+    #
+    # Entries are grouped by target, so IPs whose reverse DNS names coincide, or domains
+    # listed several times, cost one call. The registrar of an IP target comes from the
+    # local ASN data, and only the fields that need the API (certificate CN, the registrar
+    # of a domain) are fetched. Calls go out in order of total hits, so with a budget the
+    # most frequent indicators are the ones covered.
+    #
+    # Entries can be added in batches: execute() only calls targets that have not been
+    # queried yet, and the budget is shared by all batches. eligible, if given, is the
+    # set of entries allowed to spend budget (see WindowedVTPlan).
+
+    def __init__(self, lookup=get_ssl_registrar, budget=None, eligible=None):
+        self.lookup = lookup
+        self.budget = budget
+        self.eligible = eligible
+        self._batch = {}
+        self._target_of = {}
+        self._hits = {}
+        self._wanted = set()
+        self._results = {}
+        self.entries = 0
+        self.local = 0
+        self.calls = 0
+
+    def add(self, entry, record, hits=1):
+        self._batch[entry] = record
+        if record is None:
+            return
+        target = vt_target(entry, record)
+        self._target_of[entry] = target
+        self._hits[target] = self._hits.get(target, 0) + hits
+        self.entries += 1
+        self.local += target == record.ip
+        if self.eligible is None or entry in self.eligible:
+            self._wanted.add(target)
+
+    def plan(self):
+        # Targets not queried yet, most hits first (ties in first-seen order)
+        ordered = sorted((target for target in self._hits if target not in self._results),
+                         key=self._hits.get, reverse=True)
+        calls = [target for target in ordered if target in self._wanted]
+        if self.budget is not None:
+            calls = calls[:max(self.budget - self.calls, 0)]
+        return calls
+
+    def execute(self):
+        calls = self.plan()
+        for target in calls:
+            self._results[target] = self.lookup(target)
+            self.calls += 1
+            if self.calls % PROGRESS_EVERY == 0:
+                colored_print(f"[VT] {self.calls} calls done", 'cyan')
+
+    def apply(self, entry, record):
+        # record with the certificate and registrar fields of its target filled in
+        if record is None:
+            return None
+        target = self._target_of[entry]
+        certificate, registrar = self._results.get(target, (None, None))
+        if target == record.ip:
+            registrar = local_registrar(record) or registrar
+        return record._replace(certificate_cn=nullable(certificate), registrar=nullable(registrar))
+
+    def records(self):
+        # (entry, finished record) for the entries added since the last call, in the
+        # order added; the batch is forgotten afterwards (callers keep the records)
+        batch, self._batch = self._batch, {}
+        for entry, record in batch.items():
+            yield entry, self.apply(entry, record)
+            self._target_of.pop(entry, None)
+
+    def report(self):
+        over_budget = len(self._hits) - self.calls
+        msg = (f"VirusTotal: {self.calls} calls for {self.entries} entries "
+               f"({self.entries - len(self._hits)} duplicate lookups elided, "
+               f"{self.local} registrars from local ASN data"
+               + (f", {over_budget} targets over budget" if over_budget else "") + ")")
+        colored_print(f"\n[+] {msg}", 'green')
+        logger.info(msg)
+
+
+class WindowedVTPlan:
+    # Runs the VirusTotal plan of a run window by window, so rows keep being written (and
+    # checkpointed) while calls are made, and an interrupted run loses at most one
+    # window of calls. The caller calls prepare(i) before handling entry i: at the start
+    # of each window of `window` input positions, the window's new entries are enriched
+    # without VirusTotal, their calls are made, and the finished records go to cache.
+    #
+    # Hits are counted over the whole input first (no lookups), so calls within a window
+    # are ordered by total hits, and with a budget only the `budget` busiest entries may
+    # spend it, wherever in the input they first appear.
+    #
+    # With results_path, every answer is also appended to that file, and answers already
+    # in it (from an interrupted run being resumed) are reused instead of called again;
+    # they still count against the budget. Empty answers may be quota errors and are not
+    # kept.
+
+    def __init__(self, entries, cache, sharded, no_rdns, readers, outsrc_index, budget=None, skip=None,
+                 window=DEFAULT_WINDOW, start=0, results_path=None, lookup=get_ssl_registrar):
+        self.lookup = lookup
+        self.known = load_vt_results(results_path) if results_path else {}
+        self.reused = 0
+        self._log = open(results_path, 'a', encoding='utf-8') if results_path else None
+        self.entries = entries
+        self.cache = cache
+        self.sharded = sharded
+        self.no_rdns = no_rdns
+        self.readers = readers
+        self.outsrc_index = outsrc_index
+        self.skip = skip
+        self.window = window
+        self._next = start
+        self.hits = Counter(entry for entry in self._pending(start, len(entries)))
+        eligible = None
+        if budget is not None:
+            eligible = set(sorted(self.hits, key=self.hits.get, reverse=True)[:budget])
+        self.planner = VTPlanner(self._call, budget, eligible)
+        msg = (f"VirusTotal plan: {len(self.hits)} distinct entries, calls made in windows of "
+               f"{window} input entries" + (f", budget {budget} calls" if budget is not None else ""))
+        colored_print(f"[VT] {msg}", 'cyan', 'bold')
+        logger.info(msg)
+
+    def _call(self, target):
+        if target in self.known:
+            self.reused += 1
+            return self.known.pop(target)
+        result = self.lookup(target)
+        if self._log and tuple(result) != ("N/A", "N/A"):
+            self._log.write(json.dumps([target, *result]) + "\n")
+            self._log.flush()
+        return result
+
+    def _pending(self, start, stop):
+        for i in range(start, stop):
+            entry = self.entries[i].strip()
+            if entry not in self.cache and not (self.skip and self.skip(entry)):
+                yield entry
+
+    def prepare(self, i):
+        if i < self._next:
+            return
+        stop = min(i + self.window, len(self.entries))
+        self._next = stop
+        for entry in dict.fromkeys(self._pending(i, stop)):
+            if self.sharded:
+                record = self.sharded.record_for(entry)
+            else:
+                record, _ = _enrich_record(entry, False, None, self.no_rdns, self.readers, self.outsrc_index)
+            self.planner.add(entry, record, self.hits[entry])
+        self.planner.execute()
+        self.cache.update(self.planner.records())
+
+    def close(self):
+        if self._log:
+            self._log.close()
+
+    def report(self):
+        self.planner.report()
+        if self.reused:
+            msg = f"VirusTotal: {self.reused} answers reused from the interrupted run"
+            colored_print(f"[+] {msg}", 'green')
+            logger.info(msg)
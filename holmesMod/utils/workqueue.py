@@ -0,0 +1,379 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from . import colored_print
+from .ip_checker import _enrich_record, open_geo_readers, close_geo_readers, load_outsrc_index, logger
+from .records import IPRecord
+
+DEFAULT_UNIT_SIZE = 200
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+POLL_INTERVAL = 0.5
+PROGRESS_INTERVAL = 10
+
+# Unit states
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+
+
+def _encode_results(results):
+    # [(entry, IPRecord or None)] -> JSON; records travel as plain value lists
+    return json.dumps([[entry, list(record) if record is not None else None] for entry, record in results])
+
+
+def _decode_results(payload):
+    return [(entry, IPRecord(*values) if values is not None else None) for entry, values in json.loads(payload)]
+
+
+# ── Queue backends ────────────────────────────────────────────────────────────
+# A backend holds one run at a time: the run options, and work units of entries that
+# move pending -> leased -> done (or back to pending when a lease expires, and to failed
+# after max_attempts leases). Every method is safe to call from several processes
+# (SQLiteQueue) or threads (MemoryQueue).
+
+class SQLiteQueue:
+    # Work queue in one SQLite file, e.g. on storage every analysis box can reach.
+    # Leasing runs in an IMMEDIATE transaction, so two workers never get the same unit.
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self._local = threading.local()
+        self._timeout = timeout
+        with self._transaction() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            db.execute("CREATE TABLE IF NOT EXISTS units (id TEXT PRIMARY KEY, seq INTEGER, entries TEXT, "
+                       "state TEXT, worker TEXT, lease_expires REAL, attempts INTEGER DEFAULT 0, "
+                       "results TEXT, merged INTEGER DEFAULT 0)")
+            db.execute("CREATE INDEX IF NOT EXISTS units_state ON units (state, seq)")
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self._timeout, isolation_level=None)
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def start_run(self, units, options):
+        # Replace whatever the file held with a new run
+        run_id = uuid.uuid4().hex[:12]
+        with self._transaction() as db:
+            db.execute("DELETE FROM units")
+            db.execute("DELETE FROM meta")
+            db.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ('run_id', run_id), ('options', json.dumps(options)), ('state', 'open')])
+            db.executemany("INSERT INTO units (id, seq, entries, state) VALUES (?, ?, ?, ?)", [
+                (f"{run_id}-{seq}", seq, json.dumps(entries), PENDING) for seq, entries in enumerate(units)])
+        return run_id
+
+    def run_info(self):
+        # {'run_id', 'options', 'state'}, or None before the first run
+        rows = dict(self._db().execute("SELECT key, value FROM meta").fetchall())
+        if not rows:
+            return None
+        return {'run_id': rows['run_id'], 'options': json.loads(rows['options']), 'state': rows['state']}
+
+    def close_run(self):
+        with self._transaction() as db:
+            db.execute("UPDATE meta SET value = 'closed' WHERE key = 'state'")
+
+    def lease(self, worker, lease_seconds):
+        # (unit_id, entries) of the oldest pending unit, now leased to worker, or None
+        with self._transaction() as db:
+            row = db.execute("SELECT id, entries FROM units WHERE state = ? ORDER BY seq LIMIT 1",
+                             (PENDING,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE units SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                       "WHERE id = ?", (LEASED, worker, time.time() + lease_seconds, row[0]))
+        return row[0], json.loads(row[1])
+
+    def renew(self, unit_id, worker, lease_seconds):
+        # Extend a lease that is still held; False once it expired and was handed on
+        with self._transaction() as db:
+            cursor = db.execute("UPDATE units SET lease_expires = ? WHERE id = ? AND state = ? AND worker = ?",
+                                (time.time() + lease_seconds, unit_id, LEASED, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, unit_id, worker, results):
+        # Store a unit's results. A late result for an expired lease is still accepted
+        # while nobody else has completed the unit; enrichment is idempotent.
+        with self._transaction() as db:
+            cursor = db.execute("UPDATE units SET state = ?, worker = ?, results = ? WHERE id = ? AND state IN (?, ?)",
+                                (DONE, worker, _encode_results(results), unit_id, PENDING, LEASED))
+        return cursor.rowcount == 1
+
+    def requeue_expired(self, max_attempts):
+        # Expired leases go back to pending, or to failed after max_attempts; returns
+        # (requeued, failed)
+        now = time.time()
+        with self._transaction() as db:
+            failed = db.execute("UPDATE units SET state = ?, worker = NULL WHERE state = ? AND lease_expires < ? "
+                                "AND attempts >= ?", (FAILED, LEASED, now, max_attempts)).rowcount
+            requeued = db.execute("UPDATE units SET state = ?, worker = NULL WHERE state = ? AND lease_expires < ?",
+                                  (PENDING, LEASED, now)).rowcount
+        return requeued, failed
+
+    def take_finished(self):
+        # [(unit_id, state, worker, results)] for units done or failed since the last call
+        with self._transaction() as db:
+            rows = db.execute("SELECT id, state, worker, results FROM units WHERE state IN (?, ?) AND merged = 0",
+                              (DONE, FAILED)).fetchall()
+            db.executemany("UPDATE units SET merged = 1 WHERE id = ?", [(row[0],) for row in rows])
+        return [(unit_id, state, worker, _decode_results(results) if results else [])
+                for unit_id, state, worker, results in rows]
+
+    def counts(self):
+        return dict(self._db().execute("SELECT state, COUNT(*) FROM units GROUP BY state").fetchall())
+
+
+class MemoryQueue:
+    # The same queue held in memory, for workers running as threads of one process
+    # (tests, library use) without a file on disk
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = None
+        self._units = {}
+
+    def start_run(self, units, options):
+        run_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._meta = {'run_id': run_id, 'options': options, 'state': 'open'}
+            self._units = {
+                f"{run_id}-{seq}": {'seq': seq, 'entries': list(entries), 'state': PENDING, 'worker': None,
+                                    'lease_expires': 0.0, 'attempts': 0, 'results': None, 'merged': False}
+                for seq, entries in enumerate(units)
+            }
+        return run_id
+
+    def run_info(self):
+        with self._lock:
+            return dict(self._meta) if self._meta else None
+
+    def close_run(self):
+        with self._lock:
+            if self._meta:
+                self._meta['state'] = 'closed'
+
+    def lease(self, worker, lease_seconds):
+        with self._lock:
+            pending = [(unit['seq'], unit_id) for unit_id, unit in self._units.items() if unit['state'] == PENDING]
+            if not pending:
+                return None
+            unit_id = min(pending)[1]
+            unit = self._units[unit_id]
+            unit.update(state=LEASED, worker=worker, lease_expires=time.time() + lease_seconds,
+                        attempts=unit['attempts'] + 1)
+            return unit_id, list(unit['entries'])
+
+    def renew(self, unit_id, worker, lease_seconds):
+        with self._lock:
+            unit = self._units.get(unit_id)
+            if not unit or unit['state'] != LEASED or unit['worker'] != worker:
+                return False
+            unit['lease_expires'] = time.time() + lease_seconds
+            return True
+
+    def complete(self, unit_id, worker, results):
+        with self._lock:
+            unit = self._units.get(unit_id)
+            if not unit or unit['state'] not in (PENDING, LEASED):
+                return False
+            unit.update(state=DONE, worker=worker, results=list(results))
+            return True
+
+    def requeue_expired(self, max_attempts):
+        now = time.time()
+        requeued = failed = 0
+        with self._lock:
+            for unit in self._units.values():
+                if unit['state'] == LEASED and unit['lease_expires'] < now:
+                    if unit['attempts'] >= max_attempts:
+                        unit.update(state=FAILED, worker=None)
+                        failed += 1
+                    else:
+                        unit.update(state=PENDING, worker=None)
+                        requeued += 1
+        return requeued, failed
+
+    def take_finished(self):
+        finished = []
+        with self._lock:
+            for unit_id, unit in self._units.items():
+                if unit['state'] in (DONE, FAILED) and not unit['merged']:
+                    unit['merged'] = True
+                    finished.append((unit_id, unit['state'], unit['worker'], unit['results'] or []))
+        return finished
+
+    def counts(self):
+        with self._lock:
+            counts = {}
+            for unit in self._units.values():
+                counts[unit['state']] = counts.get(unit['state'], 0) + 1
+            return counts
+
+
+def open_queue(spec):
+    # "memory:" for an in-process queue, anything else ("sqlite:/path" or a plain path)
+    # is a SQLite queue file
+    if spec == 'memory:':
+        return MemoryQueue()
+    return SQLiteQueue(spec[len('sqlite:'):] if spec.startswith('sqlite:') else spec)
+
+
+# ── Coordinator ───────────────────────────────────────────────────────────────
+
+class QueueEnricher:
+    # Coordinator side: splits the unique entries of a run into work units on a queue and
+    # merges the workers' results. Used in place of ShardedEnricher, so the run's CSV,
+    # XLSX, checkpoints and stdout are written exactly as for a local run.
+
+    def __init__(self, entries, queue, virtot=False, no_rdns=False, unit_size=DEFAULT_UNIT_SIZE,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, poll_interval=POLL_INTERVAL):
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        unique = list(dict.fromkeys(entry.strip() for entry in entries))
+        units = [unique[i:i + unit_size] for i in range(0, len(unique), unit_size)]
+        self.total_units = len(units)
+        self.run_id = queue.start_run(units, {'virtot': virtot, 'no_rdns': no_rdns})
+        self._records = {}
+        self._finished = 0
+        self._failed_units = 0
+        self._retries = 0
+        self._per_worker = {}
+        self._started = time.perf_counter()
+        self._last_progress = self._started
+        msg = (f"Work queue {getattr(queue, 'path', 'in memory')}: {len(unique)} unique entries "
+               f"in {self.total_units} units, waiting for workers")
+        colored_print(f"[QUEUE] {msg}", 'cyan', 'bold')
+        logger.info(msg)
+
+    def _merge(self):
+        finished = self.queue.take_finished()
+        for unit_id, state, worker, results in finished:
+            self._finished += 1
+            if state == FAILED:
+                self._failed_units += 1
+                logger.warning(f"Work unit {unit_id} failed after {self.max_attempts} expired leases")
+            self._per_worker[worker] = self._per_worker.get(worker, 0) + len(results)
+            self._records.update(results)
+        return bool(finished)
+
+    def _poll(self):
+        requeued, failed = self.queue.requeue_expired(self.max_attempts)
+        self._retries += requeued
+        if requeued or failed:
+            logger.warning(f"Work queue: {requeued} expired leases requeued, {failed} units given up")
+        now = time.perf_counter()
+        if now - self._last_progress >= PROGRESS_INTERVAL:
+            self._last_progress = now
+            counts = self.queue.counts()
+            colored_print(f"[QUEUE] {self._finished}/{self.total_units} units finished, "
+                          f"{counts.get(LEASED, 0)} leased, {counts.get(PENDING, 0)} pending", 'cyan')
+        time.sleep(self.poll_interval)
+
+    def record_for(self, entry):
+        # IPRecord for an entry (without User Agent), or None when it could not be enriched
+        # or its unit failed; waits for the workers as needed
+        entry = entry.strip()
+        while entry not in self._records:
+            if self._merge():
+                continue
+            if self._finished >= self.total_units:
+                return None
+            self._poll()
+        return self._records[entry]
+
+    def close(self):
+        # Idle workers exit once the run is closed
+        self.queue.close_run()
+
+    def report(self):
+        wall = time.perf_counter() - self._started
+        workers = ', '.join(f"{worker}: {count}" for worker, count in sorted(self._per_worker.items()) if worker)
+        msg = (f"Distributed enrichment: {len(self._records)} entries in {self.total_units} units "
+               f"in {wall:.2f}s, {self._retries} expired leases retried, {self._failed_units} units failed "
+               f"(entries per worker: {workers or 'none'})")
+        colored_print(f"\n[+] {msg}", 'green')
+        logger.info(msg)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# ── Worker ────────────────────────────────────────────────────────────────────
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_worker(queue, worker=None, lease_seconds=DEFAULT_LEASE_SECONDS, poll_interval=POLL_INTERVAL, once=False):
+    # Lease units and enrich them with this host's resolver, databases and VirusTotal key.
+    # Runs are served one after another until interrupted (or, with once, until the first
+    # run joined is closed). A held lease is renewed once half of it has passed, so
+    # lease_seconds only has to cover one slow lookup; a worker that dies stops renewing
+    # and the coordinator hands its unit to someone else.
+    worker = worker or default_worker_id()
+    readers = open_geo_readers()
+    outsrc_index = load_outsrc_index()
+    done_units = done_entries = 0
+    run_id = None
+    colored_print(f"[WORKER] {worker} polling {getattr(queue, 'path', 'in-memory queue')}", 'cyan', 'bold')
+    try:
+        while True:
+            info = queue.run_info()
+            if info is None or info['state'] == 'closed' or info['run_id'] != run_id:
+                if once and run_id is not None:
+                    break
+                if info is None or info['state'] == 'closed':
+                    time.sleep(poll_interval)
+                    continue
+                run_id = info['run_id']
+                logger.info(f"Worker {worker} joined run {run_id}")
+
+            leased = queue.lease(worker, lease_seconds)
+            if leased is None:
+                time.sleep(poll_interval)
+                continue
+            unit_id, entries = leased
+            options = info['options']
+            results = []
+            renew_at = time.time() + lease_seconds / 2
+            for entry in entries:
+                record, _ = _enrich_record(entry, options['virtot'], None, options['no_rdns'], readers, outsrc_index)
+                results.append((entry, record))
+                if time.time() >= renew_at:
+                    renew_at = time.time() + lease_seconds / 2
+                    if not queue.renew(unit_id, worker, lease_seconds):
+                        logger.warning(f"Lease on {unit_id} expired while {worker} was still working on it")
+            if queue.complete(unit_id, worker, results):
+                done_units += 1
+                done_entries += len(entries)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_geo_readers(readers)
+
+    msg = f"Worker {worker} finished: {done_units} units, {done_entries} entries enriched"
+    colored_print(f"\n[+] {msg}", 'green')
+    logger.info(msg)
@@ -1,12 +1,31 @@
 import streamlit as st
-import subprocess
 import os
+import shutil
 import tempfile
+import time
 import pandas as pd
 from datetime import datetime
 import io
-import sys
-import re
+
+from holmesMod.utils.config import ensure_dirs_exist
+from holmesMod.utils.engine import EnrichmentEngine
+from holmesMod.utils.file_utils import get_output_path
+from holmesMod.utils.geodb import GeoDatabases
+from holmesMod.utils.ip_checker import (
+    load_outsrc_index,
+    resolve_output_path,
+    create_excel_report,
+)
+from holmesMod.utils.ip_ext import iter_csv_ips, parse_apache_line, parse_ip_lines
+from holmesMod.utils.records import ColumnBuffer
+from holmesMod.utils.result_cache import ResultCache, content_key, iter_file_chunks
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+UI_REFRESH_SECONDS = 1.0
+LIVE_TABLE_ROWS = 200
+CONSOLE_PREVIEW_ROWS = 1000
+PAGE_SIZES = [50, 100, 500, 1000]
+ALL_COUNTRIES = "All countries"
 
 # Page configuration
 st.set_page_config(
@@ -102,199 +121,253 @@ with st.sidebar:
 # Main content area with tabs
 tab1, tab2, tab3, tab4 = st.tabs(["Apache Logs", "CSV Files", "Text Input", "IP List File"])
 
-def run_holmesgeo(input_type, input_data, filename=None, column_name=None):
+@st.cache_resource
+def get_geo_readers():
+    # Opened once per server process and shared by every session and rerun;
+    # databases replaced by geoipupdate are reloaded in the background
+    ensure_dirs_exist()
+    return GeoDatabases(watch=True)
+
+@st.cache_resource
+def get_outsrc_index():
+    return load_outsrc_index()
+
+@st.cache_resource
+def get_result_cache():
+    # Finished results shared by every session and rerun, keyed by a hash of the input
+    # content and the options that change the result; evicted by total rows and age
+    return ResultCache()
+
+def result_options(input_type, column_name=None):
+    # Everything besides the input bytes that changes the result, including the GeoIP
+    # build so a database update is not answered from an older result
+    builds = get_geo_readers().build_dates()
+    return (input_type, column_name, use_virustotal and bool(vt_api_key), use_rdns, tuple(sorted(builds.items())))
+
+def upload_key(input_type, uploaded_file, column_name=None):
+    return content_key(iter_file_chunks(uploaded_file), *result_options(input_type, column_name))
+
+def spool_upload(uploaded_file, suffix):
+    # Copy the upload to disk in fixed-size chunks instead of decoding it into one string
+    uploaded_file.seek(0)
+    temp_file = tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix=suffix)
+    with temp_file:
+        shutil.copyfileobj(uploaded_file, temp_file, SPOOL_CHUNK_SIZE)
+    uploaded_file.seek(0)
+    return temp_file.name
+
+def preview_lines(uploaded_file, limit):
+    # Decode only the first few lines of an upload for the preview expander
+    uploaded_file.seek(0)
+    lines = []
+    for raw in uploaded_file:
+        lines.append(raw.decode('utf-8', errors='replace').rstrip('\r\n'))
+        if len(lines) >= limit:
+            break
+    uploaded_file.seek(0)
+    return lines
+
+def iter_spooled_entries(input_type, path, column_name=None):
+    # Yield (entry, user_agent, bytes_read) from a spooled upload, one record at a time
+    with open(path, 'rb') as f:
+        if input_type == 'csv':
+            seen = set()
+            for ips in iter_csv_ips(f, column_name):
+                done = f.tell()
+                for ip in ips:
+                    if ip not in seen:
+                        seen.add(ip)
+                        yield ip, None, done
+            return
+
+        done = 0
+        for raw in f:
+            done += len(raw)
+            line = raw.decode('utf-8', errors='replace')
+            if input_type == 'apache':
+                parsed = parse_apache_line(line)
+                if parsed:
+                    yield parsed[0], parsed[1], done
+            elif line.strip():
+                yield line, None, done
+
+def run_holmesgeo(input_type, entries, total_bytes=None):
+    # Enrich (entry, user_agent, bytes_read) tuples in-process, refreshing a progress bar
+    # and a partial results table while the stream is consumed. Returns (header, rows, error),
+    # rows being a ColumnBuffer.
     try:
-        # Create temporary file if needed
-        temp_file = None
-        if input_type in ['apache', 'csv', 'check']:
-            temp_file = tempfile.NamedTemporaryFile(mode='w', delete=False, 
-                                                     suffix=f'.{input_type}')
-            temp_file.write(input_data)
-            temp_file.close()
-            input_path = temp_file.name
-        else:
-            input_path = None
-        
-        # Build command
-        cmd = ['python3', '-m', 'holmesMod.main']
-        
-        if input_type == 'apache':
-            cmd.extend(['--apache', input_path])
-        elif input_type == 'csv':
-            cmd.extend(['--csv', input_path])
-            if column_name:
-                cmd.extend(['--column', column_name])
-        elif input_type == 'check':
-            cmd.extend(['--check', input_path])
-        elif input_type == 'stdin':
-            # For stdin, we'll pass data directly
-            pass
-        
-        # Add optional flags
         if use_virustotal and vt_api_key:
-            # Set environment variable for VT API key
             os.environ['VT_API_KEY'] = vt_api_key
-            cmd.append('--virtot')
-        
-        if not use_rdns:
-            cmd.append('--no-rdns')
-            
-        if no_output:
-            cmd.append('--no-output')
-            
-        # Execute command
-        if input_type == 'stdin':
-            process = subprocess.Popen(
-                ['python3', '-m', 'holmesMod.main'] + 
-                (['--virtot'] if use_virustotal and vt_api_key else []) +
-                (['--no-rdns'] if not use_rdns else []),
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = process.communicate(input=input_data)
-        else:
-            process = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                cwd=os.path.dirname(os.path.abspath(__file__))
+
+        engine = EnrichmentEngine(
+            virtot=use_virustotal and bool(vt_api_key),
+            no_rdns=not use_rdns,
+            readers=get_geo_readers(),
+            outsrc_index=get_outsrc_index(),
+        )
+        header = engine.header([] if input_type == 'apache' else None)
+
+        progress = st.progress(0.0, text="Starting...")
+        live_table = st.empty()
+        rows = ColumnBuffer(engine.schema([] if input_type == 'apache' else None))
+        processed = 0
+        start = time.monotonic()
+        last_refresh = start
+
+        def refresh(done, finished=False):
+            elapsed = max(time.monotonic() - start, 1e-6)
+            if finished:
+                fraction = 1.0
+            else:
+                fraction = min(done / total_bytes, 1.0) if total_bytes else 0.0
+            progress.progress(
+                fraction,
+                text=f"Processed {processed:,} entries ({processed / elapsed:,.1f} rows/sec), "
+                     f"{len(rows):,} enriched",
             )
-            stdout = process.stdout
-            stderr = process.stderr
-        
-        # Clean up temp file
-        if temp_file and os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
-        
-        return stdout, stderr, process.returncode if input_type != 'stdin' else process.returncode
-        
+            live_table.dataframe(rows.tail(LIVE_TABLE_ROWS), use_container_width=True)
+
+        done = 0
+        for entry, user_agent, done in entries:
+            record = engine.enrich_record(entry, user_agent)
+            processed += 1
+            if record is not None:
+                rows.append(record)
+
+            now = time.monotonic()
+            if now - last_refresh >= UI_REFRESH_SECONDS:
+                last_refresh = now
+                refresh(done)
+
+        refresh(done, finished=True)
+        live_table.empty()
+        return header, rows, None
+
     except Exception as e:
-        return None, str(e), 1
+        return None, None, str(e)
+
+def run_holmesgeo_upload(input_type, uploaded_file, column_name=None):
+    path = spool_upload(uploaded_file, f'.{input_type}')
+    try:
+        entries = iter_spooled_entries(input_type, path, column_name)
+        return run_holmesgeo(input_type, entries, os.path.getsize(path))
+    finally:
+        os.unlink(path)
+
+def save_results(df, filename=None):
+    # Mirror the CLI output: CSV + XLSX under holmesMod/results unless auto-save is disabled
+    outfp = resolve_output_path(get_output_path(filename))
+    df.to_csv(outfp, index=False)
+    create_excel_report(outfp)
+    return outfp
 
-def display_results(stdout, stderr, returncode):
-    if returncode != 0:
-        st.error(f"Error running HolmesGeo:\n{stderr}")
+def analyze(state_key, key, run, filename=None):
+    # Run the analysis unless the same input and options already have a cached result, and
+    # make it the current result of the tab so later reruns (downloads, pagination,
+    # filters) display it again without re-analysing
+    cache = get_result_cache()
+    entry = cache.get(key)
+    saved_to = None
+    if entry is None:
+        header, rows, error = run()
+        if error is not None:
+            st.error(f"Error running HolmesGeo:\n{error}")
+            return
+        if not rows:
+            st.warning("⚠️ No results found in the output.")
+            return
+        entry = cache.put(key, rows.to_dataframe())
+        if not no_output:
+            try:
+                saved_to = save_results(entry.df, filename)
+            except Exception as e:
+                st.error(f"Error saving results: {str(e)}")
+    st.session_state[state_key] = {'key': key, 'saved_to': saved_to}
+
+def show_result(state_key):
+    current = st.session_state.get(state_key)
+    if not current:
         return None
-    
-    # removing ansii codes, khusus untuk stdin output soalnya ini -> Kita g mw whole terminal printed.
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    clean_stdout = ansi_escape.sub('', stdout)
-    
-    # Split into lines and filter for CSV data only
-    lines = clean_stdout.split('\n')
-    csv_lines = []
-    header_found = False
-    
-    for line in lines:
-        line = line.strip()
-        # Skip empty lines
-        if not line:
-            continue
-        # Skip the ASCII art and instruction lines
-        if any(skip_pattern in line for skip_pattern in [
-            '====', '|', '.----', 'ITSEC', 'ASIA', 'Please provide',
-            'Usage Example:', 'python3 -m', './chk.sh', 'cat ', 'echo',
-            '[STAGE-1]', '[!]', 'Processing completed'
-        ]):
-            continue
-        
-        # Check if this is the header line (starts with "IP Address")
-        if line.startswith('IP Address'):
-            header_found = True
-            csv_lines.append(line)
-        # After header is found, collect data lines (contains commas and looks like CSV)
-        elif header_found and ',' in line and not line.startswith('['):
-            csv_lines.append(line)
-    
-    if not csv_lines:
-        st.warning("⚠️ No results found in the output.")
-        # Show raw output for debugging
-        with st.expander("Debug: Raw Console Output", expanded=False):
-            st.code(stdout)
+    entry = get_result_cache().get(current['key'])
+    if entry is None:
+        st.info("The previous result has expired from the cache. Run the analysis again to see it.")
         return None
-    
+    return display_results(entry, state_key, current['saved_to'])
+
+def build_search_text(df):
+    # One lower-cased string per row, built once per result, so a filter is a single
+    # vectorised substring search instead of one per column
+    text = df.iloc[:, 0].astype(str)
+    for column in df.columns[1:]:
+        text = text + '\x1f' + df[column].astype(str)
+    return text.str.lower()
+
+def build_xlsx(df):
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='HolmesGeo Results')
+    return output.getvalue()
+
+def filter_results(entry, query, country):
+    df = entry.df
+    mask = pd.Series(True, index=df.index)
+    if country != ALL_COUNTRIES and 'Country' in df.columns:
+        mask &= df['Country'] == country
+    if query:
+        mask &= entry.artifact('search_text', build_search_text).str.contains(query.lower(), regex=False)
+    return df[mask]
+
+def display_page(entry, state_key):
+    # Filter and slice on the server and send only the visible page to the browser
+    df = entry.df
+    col1, col2, col3 = st.columns([3, 2, 1])
+    with col1:
+        query = st.text_input("Filter rows", key=f'{state_key}_query',
+                              placeholder="IP, city, ASN organization, network ...").strip()
+    with col2:
+        countries = entry.artifact('countries', lambda df: sorted(df['Country'].unique()) if 'Country' in df.columns else [])
+        country = st.selectbox("Country", [ALL_COUNTRIES] + countries, key=f'{state_key}_country')
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f'{state_key}_page_size')
+
+    filtered = filter_results(entry, query, country)
+    pages = max((len(filtered) + page_size - 1) // page_size, 1)
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f'{state_key}_page')
+    start = (min(page, pages) - 1) * page_size
+    st.dataframe(filtered.iloc[start:start + page_size], use_container_width=True)
+    shown = f"{start + 1:,}-{min(start + page_size, len(filtered)):,}" if len(filtered) else "0"
+    st.caption(f"Rows {shown} of {len(filtered):,} matching ({len(df):,} total), page {min(page, pages)} of {pages}")
+
+def display_results(entry, state_key, saved_to=None):
+    df = entry.df
+
     # Display clean console output (CSV format only)
-    with st.expander("Console Output (CSV Format)", expanded=True):
-        st.code('\n'.join(csv_lines))
-    
-    # Try to parse as DataFrame
+    with st.expander(f"Console Output (CSV Format, first {CONSOLE_PREVIEW_ROWS} rows)", expanded=False):
+        st.code(df.head(CONSOLE_PREVIEW_ROWS).to_csv(index=False))
+
     try:
-        # Join CSV lines and parse with proper quoting
-        csv_content = '\n'.join(csv_lines)
-        
-        # Try multiple parsing strategies
-        df = None
-        parsing_errors = []
-        
-        # Strategy 1: Standard CSV parsing
-        try:
-            df = pd.read_csv(io.StringIO(csv_content))
-        except Exception as e1:
-            parsing_errors.append(f"Standard parsing: {str(e1)}")
-            
-            # Strategy 2: Skip bad lines (pandas >= 1.3.0)
-            try:
-                df = pd.read_csv(io.StringIO(csv_content), on_bad_lines='skip')
-                st.warning("⚠️ Some lines were skipped due to formatting issues.")
-            except Exception as e2:
-                parsing_errors.append(f"Skip bad lines: {str(e2)}")
-                
-                # Strategy 3: Use Python engine with different separator handling
-                try:
-                    df = pd.read_csv(io.StringIO(csv_content), engine='python', on_bad_lines='skip')
-                except Exception as e3:
-                    parsing_errors.append(f"Python engine: {str(e3)}")
-                    
-                    # Strategy 4: Manual parsing line by line
-                    try:
-                        lines_data = []
-                        header = None
-                        for i, line in enumerate(csv_lines):
-                            parts = line.split(',')
-                            if i == 0:
-                                header = parts
-                                expected_cols = len(header)
-                            else:
-                                # If line has extra commas, try to handle it
-                                if len(parts) > expected_cols:
-                                    # Merge extra parts (likely from fields with commas)
-                                    merged_parts = parts[:expected_cols-1] + [','.join(parts[expected_cols-1:])]
-                                    lines_data.append(merged_parts)
-                                elif len(parts) == expected_cols:
-                                    lines_data.append(parts)
-                                # Skip lines with too few columns
-                        
-                        if header and lines_data:
-                            df = pd.DataFrame(lines_data, columns=header)
-                            st.info("Data parsed with manual line processing.")
-                    except Exception as e4:
-                        parsing_errors.append(f"Manual parsing: {str(e4)}")
-        
-        if df is None:
-            raise Exception("All parsing strategies failed:\n" + "\n".join(parsing_errors))
-        
+        if saved_to:
+            st.caption(f"Results saved to: {saved_to}")
+
         st.success(f"✅ Analysis complete! Found {len(df)} IP addresses.")
+        builds = get_geo_readers().build_dates()
+        st.caption("GeoIP database build: " + ", ".join(f"{name} {date}" for name, date in builds.items() if date))
         
         # Display dataframe
         st.subheader("Results Table")
-        st.dataframe(df, use_container_width=True)
+        display_page(entry, state_key)
         
         # Download buttons
         col1, col2, col3 = st.columns(3)
         
-        # Prepare CSV data
-        csv_data = df.to_csv(index=False)
+        # Prepare CSV data (built once per result and kept with it)
+        csv_data = entry.artifact('csv', lambda df: df.to_csv(index=False))
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
         # Prepare Excel data
         xlsx_data = None
         try:
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='HolmesGeo Results')
-            xlsx_data = output.getvalue()
+            xlsx_data = entry.artifact('xlsx', build_xlsx)
         except Exception as e:
             st.error(f"Error creating Excel file: {str(e)}")
         
@@ -325,16 +398,18 @@ def display_results(stdout, stderr, returncode):
             # Download both as ZIP
             if xlsx_data:
                 import zipfile
-                zip_buffer = io.BytesIO()
-                with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                    # Add CSV
-                    zip_file.writestr(f"holmesgeo_results_{timestamp}.csv", csv_data)
-                    # Add Excel
-                    zip_file.writestr(f"holmesgeo_results_{timestamp}.xlsx", xlsx_data)
+                def build_zip(df):
+                    zip_buffer = io.BytesIO()
+                    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                        # Add CSV
+                        zip_file.writestr(f"holmesgeo_results_{timestamp}.csv", csv_data)
+                        # Add Excel
+                        zip_file.writestr(f"holmesgeo_results_{timestamp}.xlsx", xlsx_data)
+                    return zip_buffer.getvalue()
                 
                 st.download_button(
                     label="Download Both (ZIP)",
-                    data=zip_buffer.getvalue(),
+                    data=entry.artifact('zip', build_zip),
                     file_name=f"holmesgeo_results_{timestamp}.zip",
                     mime="application/zip",
                     use_container_width=True
@@ -370,9 +445,7 @@ def display_results(stdout, stderr, returncode):
         return df
         
     except Exception as e:
-        st.error(f"Error parsing results: {str(e)}")
-        with st.expander("Debug: Parsed CSV Lines", expanded=False):
-            st.code('\n'.join(csv_lines))
+        st.error(f"Error preparing results: {str(e)}")
         return None
 
 # Tab 1: Apache Logs
@@ -387,16 +460,12 @@ with tab1:
         
         # Preview
         with st.expander("Preview (first 20 lines)"):
-            content = apache_file.getvalue().decode('utf-8')
-            lines = content.split('\n')[:20]
-            st.code('\n'.join(lines))
+            st.code('\n'.join(preview_lines(apache_file, 20)))
         
         if st.button("Analyze Apache Log", key='analyze_apache'):
-            with st.spinner("Analyzing Apache log file..."):
-                apache_file.seek(0)  # Reset file pointer
-                content = apache_file.getvalue().decode('utf-8')
-                stdout, stderr, returncode = run_holmesgeo('apache', content, apache_file.name)
-                display_results(stdout, stderr, returncode)
+            analyze('apache_result', upload_key('apache', apache_file),
+                    lambda: run_holmesgeo_upload('apache', apache_file), apache_file.name)
+        show_result('apache_result')
 
 # Tab 2: CSV Files
 with tab2:
@@ -410,7 +479,7 @@ with tab2:
         
         # Read CSV to show columns
         try:
-            df_preview = pd.read_csv(csv_file)
+            df_preview = pd.read_csv(csv_file, nrows=10)
             csv_file.seek(0)  # Reset file pointer
             
             # Preview
@@ -435,11 +504,9 @@ with tab2:
                 selected_column = None
             
             if st.button("Analyze CSV", key='analyze_csv'):
-                with st.spinner("Analyzing CSV file..."):
-                    csv_file.seek(0)
-                    content = csv_file.getvalue().decode('utf-8')
-                    stdout, stderr, returncode = run_holmesgeo('csv', content, csv_file.name, selected_column)
-                    display_results(stdout, stderr, returncode)
+                analyze('csv_result', upload_key('csv', csv_file, selected_column),
+                        lambda: run_holmesgeo_upload('csv', csv_file, selected_column), csv_file.name)
+            show_result('csv_result')
                     
         except Exception as e:
             st.error(f"Error reading CSV file: {str(e)}")
@@ -458,11 +525,12 @@ with tab3:
     
     if st.button("Analyze IPs", key='analyze_text'):
         if text_input.strip():
-            with st.spinner("Analyzing IP addresses..."):
-                stdout, stderr, returncode = run_holmesgeo('stdin', text_input)
-                display_results(stdout, stderr, returncode)
+            entries = ((ip, None, 0) for ip in parse_ip_lines(text_input.splitlines()))
+            analyze('text_result', content_key([text_input.encode()], *result_options('stdin')),
+                    lambda: run_holmesgeo('stdin', entries))
         else:
             st.warning("Please enter at least one IP address.")
+    show_result('text_result')
 
 # Tab 4: IP List File
 with tab4:
@@ -476,16 +544,12 @@ with tab4:
         
         # Preview
         with st.expander("Preview (first 20 IPs)"):
-            content = ip_file.getvalue().decode('utf-8')
-            lines = content.split('\n')[:20]
-            st.code('\n'.join(lines))
+            st.code('\n'.join(preview_lines(ip_file, 20)))
         
         if st.button("Analyze IP List", key='analyze_iplist'):
-            with st.spinner("Analyzing IP list..."):
-                ip_file.seek(0)
-                content = ip_file.getvalue().decode('utf-8')
-                stdout, stderr, returncode = run_holmesgeo('check', content, ip_file.name)
-                display_results(stdout, stderr, returncode)
+            analyze('iplist_result', upload_key('check', ip_file),
+                    lambda: run_holmesgeo_upload('check', ip_file), ip_file.name)
+        show_result('iplist_result')
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from holmesMod.utils.aggregate import UNKNOWN, Aggregator
+from holmesMod.utils.bogon import BUILTIN_RANGES, BogonFilter, BogonTable
+from holmesMod.utils.records import IPRecord
+
+
+class FakeEngine:
+    def __init__(self):
+        self.calls = []
+
+    def enrich_record(self, ip):
+        self.calls.append(ip)
+        if ip == "bad":
+            return None
+        return IPRecord(ip=ip, country='US' if ip.startswith('8.') else 'AU', asn_number=1, asn_org='NET')
+
+
+def test_counts_hits_and_unique_ips_per_bucket():
+    engine = FakeEngine()
+    aggregator = Aggregator(engine, bucket='hour', bogons=BogonFilter(BogonTable(BUILTIN_RANGES)))
+    morning, noon = datetime(2024, 1, 1, 9, 15), datetime(2024, 1, 1, 12, 5)
+    for ip, timestamp in [("8.8.8.8", morning), ("8.8.4.4", morning), ("8.8.8.8", noon),
+                          ("1.1.1.1", noon), ("10.0.0.1", noon), ("bad", noon)]:
+        aggregator.add(ip, timestamp)
+
+    assert engine.calls == ["8.8.8.8", "8.8.4.4", "1.1.1.1", "bad"]
+    assert aggregator.lines == 6
+    assert aggregator.distinct_ips == 5
+    tables = aggregator.tables()
+    assert tables['country'] == (['Country', 'Hits', 'Unique IPs'],
+                                 [('US', 3, 2), ('AU', 1, 1), ('Private', 1, 1), (UNKNOWN, 1, 1)])
+    assert tables['asn'][1][0] == ('1 NET', 4, 3)
+    assert tables['country_timeline'][1][:2] == [('2024-01-01 09:00', 'US', 2), ('2024-01-01 12:00', 'AU', 1)]
+
+
+def test_no_timeline_without_bucket():
+    aggregator = Aggregator(FakeEngine())
+    aggregator.add("8.8.8.8")
+    assert set(aggregator.tables()) == {'country', 'asn', 'network', 'category'}
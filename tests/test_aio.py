@@ -0,0 +1,29 @@
+import asyncio
+import threading
+
+from holmesMod.utils import aio
+from holmesMod.utils.records import IPRecord
+
+
+def test_engine_runs_lookups_on_its_own_pool(monkeypatch):
+    threads = []
+
+    def enrich(ip, domain, rev_dns, no_rdns, readers, outsrc_index):
+        threads.append(threading.current_thread().name)
+        return IPRecord(ip=ip, category='Public'), None
+
+    async def resolve(name, executor=None):
+        return None
+
+    monkeypatch.setattr(aio, '_enrich_resolved', enrich)
+    monkeypatch.setattr(aio, 'async_resolve_host', resolve)
+    monkeypatch.setattr(aio, '_report_unresolved', lambda entry, outsrc_index: None)
+
+    async def main():
+        async with aio.AsyncEnrichmentEngine(no_rdns=True, concurrency=3, readers={}, outsrc_index=object()) as engine:
+            assert engine.executor._max_workers == 3
+            return await engine.enrich_all(["8.8.8.8", "unresolvable.invalid", "1.1.1.1"])
+
+    records = asyncio.run(main())
+    assert [record['IP Address'] for record in records] == ["8.8.8.8", "1.1.1.1"]
+    assert all(name.startswith('holmesgeo-aio') for name in threads)
@@ -0,0 +1,52 @@
+import io
+import json
+
+import pytest
+
+from holmesMod import CSVSink, HolmesGeo, HolmesGeoConfig, NDJSONSink
+from holmesMod.utils import engine
+from holmesMod.utils.records import IPRecord
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def enrich(entry, virtot, user_agent, no_rdns, readers, outsrc_index):
+        calls.append(entry)
+        if entry == "unknown.invalid":
+            return None, "unresolved"
+        return IPRecord(ip=entry, country='US', asn_number=15169), None
+
+    monkeypatch.setattr(engine, '_enrich_record', enrich)
+    return calls
+
+
+def test_enrich_yields_records_without_output(calls, capsys):
+    with HolmesGeo(HolmesGeoConfig(no_rdns=True), readers={}, outsrc_index=object()) as geo:
+        records = list(geo.enrich(["8.8.8.8", "10.0.0.1", "unknown.invalid", " 8.8.8.8 "]))
+        assert [record.ip for record in records] == ["8.8.8.8", "8.8.8.8"]
+        assert records[0].country == 'US' and records[0].user_agent is None
+        assert geo.stats == {'enriched': 2, 'failed': 1, 'bogon': 1, 'cached': 1}
+    assert calls == ["8.8.8.8", "unknown.invalid"]
+    assert capsys.readouterr() == ('', '')
+
+
+def test_bogons_can_be_included(calls):
+    with HolmesGeo(HolmesGeoConfig(include_bogons=True), readers={}, outsrc_index=object()) as geo:
+        assert geo.enrich_one("10.0.0.1").ip == "10.0.0.1"
+
+
+def test_sinks_match_the_cli_columns(calls):
+    csv_out, ndjson_out = io.StringIO(), io.StringIO()
+    geo = HolmesGeo(HolmesGeoConfig(no_rdns=True), sinks=[CSVSink(csv_out), NDJSONSink(ndjson_out)],
+                    readers={}, outsrc_index=object())
+    records = list(geo.enrich(["8.8.8.8", "1.1.1.1"], user_agents=["curl"]))
+    geo.close()
+
+    assert [record.user_agent for record in records] == ["curl", "N/A"]
+    lines = csv_out.getvalue().splitlines()
+    assert lines[0].split(",")[-1] == "User Agent"
+    assert lines[2].endswith(",N/A")
+    first = json.loads(ndjson_out.getvalue().splitlines()[0])
+    assert first['ASN Number'] == 15169 and first['City'] is None
@@ -0,0 +1,39 @@
+from holmesMod.utils.bogon import BUILTIN_RANGES, BogonFilter, BogonTable
+
+
+def test_builtin_ranges():
+    table = BogonTable(BUILTIN_RANGES)
+    assert table.classify("10.1.2.3") == 'Private'
+    assert table.classify("100.64.0.1") == 'CGNAT'
+    assert table.classify(" 127.0.0.1\n") == 'Loopback'
+    assert table.classify("fe80::1") == 'Link-Local'
+    assert table.classify("::ffff:8.8.8.8") == 'IPv4-Mapped'
+    assert table.classify("8.8.8.8") is None
+    assert table.classify("2606:4700::1111") is None
+    assert table.classify("example.com") is None
+
+
+def test_narrowest_range_wins():
+    table = BogonTable([('10.0.0.0/8', 'Private'), ('10.1.0.0/16', 'Lab')])
+    assert table.classify("10.1.9.9") == 'Lab'
+    assert table.classify("10.2.9.9") == 'Private'
+
+
+def test_load_file(tmp_path):
+    path = tmp_path / "bogons.txt"
+    path.write_text("# comment\n\n198.51.100.0/24 Test Net\n192.0.2.7\nnot-a-cidr\n2001:db8::/32  # inline\n")
+    table = BogonTable()
+    table.load_file(str(path))
+    assert table.classify("198.51.100.9") == 'Test Net'
+    assert table.classify("192.0.2.7") == 'Bogon'
+    assert table.classify("192.0.2.8") is None
+    assert table.classify("2001:db8::5") == 'Bogon'
+
+
+def test_filter_counts_per_category():
+    bogons = BogonFilter(BogonTable(BUILTIN_RANGES))
+    for entry in ("10.0.0.1", "192.168.1.1", "127.0.0.1", "8.8.8.8"):
+        bogons.check(entry)
+    assert bogons.total == 3
+    assert bogons.counts == {'Private': 2, 'Loopback': 1}
+    assert bogons.summary() == "Private: 2, Loopback: 1"
@@ -0,0 +1,81 @@
+from holmesMod.utils import cache as cache_mod
+from holmesMod.utils.ip_checker import outsrc_check
+from holmesMod.utils.outsource import OutsourceIndex
+from holmesMod.utils.cache import CacheNamespace, CacheRegistry, cached
+
+
+def test_lru_evicts_least_recently_used():
+    ns = CacheNamespace('t', capacity=2)
+    ns.store('a', 1)
+    ns.store('b', 2)
+    assert ns.lookup('a') == (True, 1)
+    ns.store('c', 3)
+    assert ns.lookup('b') == (False, None)
+    assert ns.lookup('a') == (True, 1)
+    assert ns.evictions == 1
+
+
+def test_ttl_and_negative_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_mod.time, 'monotonic', lambda: now[0])
+    ns = CacheNamespace('t', ttl=60, negative_ttl=5, negative=lambda value: value is None)
+    ns.store('good', 'x')
+    ns.store('bad', None)
+    now[0] += 10
+    assert ns.lookup('good') == (True, 'x')
+    assert ns.lookup('bad') == (False, None)
+    assert ns.expirations == 1
+    now[0] += 60
+    assert ns.lookup('good') == (False, None)
+
+
+def test_zero_negative_ttl_is_never_stored():
+    ns = CacheNamespace('t', negative_ttl=0, negative=lambda value: value == 'N/A')
+    ns.store('k', 'N/A')
+    assert len(ns) == 0
+
+
+def test_store_from_before_clear_is_dropped():
+    ns = CacheNamespace('t')
+    generation = ns.generation
+    ns.clear()
+    ns.store('k', 'stale', generation)
+    assert ns.lookup('k') == (False, None)
+    ns.store('k', 'fresh', ns.generation)
+    assert ns.lookup('k') == (True, 'fresh')
+
+
+def test_cached_decorator_counts_hits(monkeypatch):
+    registry = CacheRegistry({'t': dict(capacity=10)})
+    monkeypatch.setattr(cache_mod, 'caches', registry)
+    calls = []
+
+    @cached('t')
+    def lookup(value):
+        calls.append(value)
+        return value * 2
+
+    assert lookup(2) == 4
+    assert lookup(2) == 4
+    assert calls == [2]
+    assert registry.stats()['t']['hits'] == 1
+
+
+def test_outsource_answers_are_kept_per_index(monkeypatch):
+    monkeypatch.setattr(cache_mod, 'caches', CacheRegistry())
+    cdn, vpn = OutsourceIndex(), OutsourceIndex()
+    cdn.add("203.0.113.7", "CDN")
+    vpn.add("203.0.113.7", "VPN")
+    assert outsrc_check("203.0.113.7", cdn) == "CDN"
+    assert outsrc_check("203.0.113.7", vpn) == "VPN"
+    assert outsrc_check("203.0.113.7", cdn) == "CDN"
+
+
+def test_parse_cache_limits():
+    assert cache_mod.parse_cache_limits("rdns=5, geoip=0") == {'rdns': 5, 'geoip': 0}
+    try:
+        cache_mod.parse_cache_limits("nope=1")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown namespace accepted")
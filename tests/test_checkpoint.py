@@ -0,0 +1,88 @@
+import csv
+import os
+
+import pytest
+
+from holmesMod.utils import ip_checker
+from holmesMod.utils.checkpoint import (
+    checkpoint_path,
+    clear_checkpoint,
+    find_checkpoint,
+    load_vt_results,
+    run_fingerprint,
+    save_checkpoint,
+    vt_results_path,
+)
+from holmesMod.utils.records import IPRecord
+
+ENTRIES = [f"8.8.8.{i}" for i in range(10)]
+
+
+@pytest.fixture
+def enriched(monkeypatch):
+    # Offline ipcheck_mod: no GeoIP databases or outsource lists, and an enrichment that
+    # records what it was asked and can be made to fail on one entry
+    calls = []
+    fail_on = []
+
+    def enrich(entry, virtot, user_agent, no_rdns, readers, outsrc_index):
+        if entry in fail_on:
+            raise KeyboardInterrupt
+        calls.append(entry)
+        return IPRecord(ip=entry, category='Public', asn_number=15169, asn_org='GOOGLE'), None
+
+    monkeypatch.setattr(ip_checker, '_enrich_record', enrich)
+    monkeypatch.setattr(ip_checker, 'open_geo_readers', lambda: {})
+    monkeypatch.setattr(ip_checker, 'load_outsrc_index', lambda: None)
+    monkeypatch.setattr(ip_checker, 'create_excel_report', lambda path: None)
+    return calls, fail_on
+
+
+def _rows(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_fingerprint_depends_on_entries_and_header():
+    header = ['IP Address']
+    assert run_fingerprint(["1.1.1.1 "], header) == run_fingerprint(["1.1.1.1"], header)
+    assert run_fingerprint(["1.1.1.1"], header) != run_fingerprint(["1.1.1.2"], header)
+    assert run_fingerprint(["1.1.1.1"], header) != run_fingerprint(["1.1.1.1"], header + ['Reverse DNS'])
+
+
+def test_find_checkpoint_needs_matching_fingerprint_and_output(tmp_path):
+    output = str(tmp_path / "run.csv")
+    save_checkpoint(output, "abc", 10, 4, 0, 0)
+    assert find_checkpoint(str(tmp_path), "abc") is None
+    open(output, 'w').close()
+    assert find_checkpoint(str(tmp_path), "abc")['completed'] == 4
+    assert find_checkpoint(str(tmp_path), "other") is None
+
+    with open(vt_results_path(output), 'w') as f:
+        f.write('["example.com", "CN", "Registrar"]\n["cut')
+    assert load_vt_results(vt_results_path(output)) == {"example.com": ("CN", "Registrar")}
+    clear_checkpoint(output)
+    assert not os.path.exists(checkpoint_path(output))
+    assert not os.path.exists(vt_results_path(output))
+
+
+def test_resume_truncates_rows_past_checkpoint(tmp_path, enriched):
+    calls, fail_on = enriched
+    reference = str(tmp_path / "reference" / "run.csv")
+    ip_checker.ipcheck_mod(ENTRIES, reference, no_rdns=True)
+
+    output = str(tmp_path / "resumed" / "run.csv")
+    fail_on.append("8.8.8.7")
+    with pytest.raises(KeyboardInterrupt):
+        ip_checker.ipcheck_mod(ENTRIES, output, no_rdns=True, checkpoint_every=3)
+    assert os.path.exists(checkpoint_path(output))
+    # A row half-written after the checkpoint, as if the process had been killed
+    with open(output, 'a') as f:
+        f.write("8.8.8.99,Pub")
+
+    fail_on.clear()
+    del calls[:]
+    ip_checker.ipcheck_mod(ENTRIES, output, no_rdns=True, resume=True)
+    assert calls == ENTRIES[7:]
+    assert _rows(output) == _rows(reference)
+    assert not os.path.exists(checkpoint_path(output))
@@ -0,0 +1,50 @@
+import os
+
+from holmesMod.utils.extdedup import ExternalDeduper, dedup_external, pack_ip, unpack_ip
+
+ENTRIES = ["8.8.8.8", "1.1.1.1", "8.8.8.8", "example.com", "10.0.0.1", "1.1.1.1",
+           "::1", "example.com", "9.9.9.9", "  10.0.0.1\n", "", "2001:db8::1"]
+UNIQUE = ["8.8.8.8", "1.1.1.1", "example.com", "10.0.0.1", "::1", "9.9.9.9", "2001:db8::1"]
+
+
+def test_pack_roundtrip():
+    for ip in ("8.8.8.8", "::1", "2001:db8::1"):
+        assert unpack_ip(pack_ip(ip)) == ip
+    assert pack_ip("example.com") is None
+    assert pack_ip("08.8.8.8") is None
+
+
+def spilling_deduper(keep_order, tmp_path):
+    # The memory budget buffers at least 1024 entries; spill every 3 instead
+    deduper = ExternalDeduper(keep_order=keep_order, tmp_dir=str(tmp_path))
+    deduper.run_limit = 3
+    deduper.extend(ENTRIES)
+    return deduper
+
+
+def test_keeps_first_seen_order_across_spills(tmp_path):
+    deduper = spilling_deduper(True, tmp_path)
+    assert len(deduper._runs) >= 2
+    with deduper.finish() as unique:
+        assert list(unique) == UNIQUE
+        assert len(unique) == len(UNIQUE)
+        assert unique[2] == "example.com"
+        assert unique[-1] == "2001:db8::1"
+        assert unique[1:3] == ["1.1.1.1", "example.com"]
+        # Only the result file is left; spill runs are removed
+        assert os.listdir(tmp_path) == [os.path.basename(unique.path)]
+    assert os.listdir(tmp_path) == []
+
+
+def test_unordered_output_is_sorted_by_address(tmp_path):
+    with spilling_deduper(False, tmp_path).finish() as unique:
+        # IPv4 sorts as ::ffff:a.b.c.d
+        ips = [entry for entry in unique if entry != "example.com"]
+        assert ips == ["::1", "1.1.1.1", "8.8.8.8", "9.9.9.9", "10.0.0.1", "2001:db8::1"]
+        assert sorted(unique) == sorted(UNIQUE)
+
+
+def test_empty_input(tmp_path):
+    with dedup_external([], tmp_dir=str(tmp_path)) as unique:
+        assert len(unique) == 0
+        assert list(unique) == []
@@ -0,0 +1,62 @@
+import csv
+import json
+import os
+import sys
+
+import pytest
+
+from holmesMod import main
+from holmesMod.utils.cli import parse_arguments
+from holmesMod.utils.incremental import enriched_at_path, find_previous_result, load_previous_results
+
+HEADER = ['IP Address', 'Country', 'User Agent']
+
+
+@pytest.fixture
+def previous(tmp_path):
+    path = tmp_path / "feed_ipinfo.csv"
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerow(['8.8.8.8', 'United States', 'curl'])
+        writer.writerow(['1.1.1.1', 'Australia', 'wget'])
+        writer.writerow(['torn'])
+    with open(enriched_at_path(str(path)), 'w') as f:
+        json.dump({'8.8.8.8': 1000.0, '1.1.1.1': 9000.0}, f)
+    return str(path)
+
+
+def test_rows_are_reshaped_to_the_current_header(previous):
+    results = load_previous_results(previous, ['Country', 'IP Address'])
+    assert len(results) == 2
+    assert results.get('8.8.8.8') == (['United States', '8.8.8.8'], 1000.0)
+    assert load_previous_results(previous, ['IP Address', 'Reverse DNS']) is None
+
+
+def test_max_age_and_db_build_expire_rows(previous):
+    results = load_previous_results(previous, HEADER, max_age_hours=1)
+    now = 9000.0 + 1800
+    assert not results.is_reusable('8.8.8.8', now)
+    assert results.is_reusable('1.1.1.1', now)
+    assert results.get('8.8.8.8', now) is None
+    assert results.expired == 1
+
+    results = load_previous_results(previous, HEADER, db_epoch=5000)
+    assert not results.is_reusable('8.8.8.8')
+    assert results.is_reusable('1.1.1.1')
+
+
+def test_latest_versioned_result_is_picked(tmp_path, previous):
+    newer = tmp_path / "feed_ipinfo_v1.csv"
+    newer.write_text("IP Address\n")
+    os.utime(previous, (1000, 1000))
+    assert find_previous_result(str(tmp_path / "feed_ipinfo.csv")) == str(newer)
+
+
+@pytest.mark.parametrize("flags", [["--max-age", "24"], ["--refresh-on-db-update"]])
+def test_incremental_options_need_incremental(monkeypatch, capsys, flags):
+    monkeypatch.setattr(sys, 'argv', ['holmesMod', '--check', 'ips.txt', *flags])
+    with pytest.raises(SystemExit) as exit_info:
+        main.run(parse_arguments())
+    assert exit_info.value.code == 1
+    assert "only apply with --incremental" in capsys.readouterr().out
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from holmesMod.utils.ip_ext import (
+    UserAgentColumn,
+    apache_ipext,
+    find_time_offset,
+    iter_apache_lines,
+    iter_line_entries,
+    parse_apache_line,
+    parse_time_bound,
+    resolve_time_window,
+)
+
+UTC = timezone.utc
+
+
+def _line(ip, minute, agent="curl/8.0"):
+    return f'{ip} - - [10/Oct/2026:01:{minute:02d}:00 +0000] "GET / HTTP/1.1" 200 5 "-" "{agent}"\n'
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / "access.log"
+    lines = [_line(f"10.0.0.{minute}", minute) for minute in range(0, 60, 5)]
+    lines.insert(3, "garbage without a stamp\n")
+    path.write_text("".join(lines))
+    return str(path)
+
+
+def test_parse_apache_line():
+    assert parse_apache_line(_line("8.8.8.8", 0)) == ("8.8.8.8", "curl/8.0")
+    assert parse_apache_line('999.1.1.1 - - "GET /"') is None
+    assert parse_apache_line("no address here") is None
+
+
+def test_find_time_offset_lands_on_first_line_in_window(log):
+    with open(log, 'rb') as f:
+        offset = find_time_offset(f, datetime(2026, 10, 10, 1, 22, tzinfo=UTC))
+        f.seek(offset)
+        assert f.readline().startswith(b"10.0.0.25 ")
+        assert find_time_offset(f, datetime(2026, 10, 11, tzinfo=UTC)) == f.seek(0, 2)
+        assert find_time_offset(f, datetime(2026, 10, 9, tzinfo=UTC)) == 0
+
+
+def test_window_keeps_lines_in_since_until(log, monkeypatch):
+    # No slack, so the window edges are exact
+    monkeypatch.setattr('holmesMod.utils.ip_ext.ORDER_SLACK', timedelta(0))
+    since, until = resolve_time_window(log, "01:20", "01:35")
+    ips = [parse_apache_line(line)[0] for line in iter_apache_lines(log, since, until)]
+    assert ips == ["10.0.0.20", "10.0.0.25", "10.0.0.30"]
+
+
+def test_out_of_order_lines_within_slack_are_kept(tmp_path):
+    path = tmp_path / "access.log"
+    path.write_text(_line("10.0.0.1", 10) + _line("10.0.0.2", 21) + _line("10.0.0.3", 19) + _line("10.0.0.4", 30))
+    since, until = resolve_time_window(str(path), "01:20", "01:25")
+    ips = [parse_apache_line(line)[0] for line in iter_apache_lines(str(path), since, until)]
+    assert ips == ["10.0.0.2"]
+
+
+def test_time_bounds(log):
+    reference = datetime(2026, 10, 10, 1, 0, tzinfo=UTC)
+    assert parse_time_bound("02:30", reference) == datetime(2026, 10, 10, 2, 30, tzinfo=UTC)
+    assert parse_time_bound("10/Oct/2026:02:00:00 +0700", reference).utcoffset() == timedelta(hours=7)
+    assert parse_time_bound("2026-10-10 02:00", reference).tzinfo == UTC
+    with pytest.raises(ValueError):
+        parse_time_bound("yesterday", reference)
+
+    since, until = resolve_time_window(log, "23:30", "00:15")
+    assert until - since == timedelta(minutes=45)
+    with pytest.raises(ValueError):
+        resolve_time_window(log, "2026-10-10 02:00", "2026-10-10 01:00")
+
+
+def test_iter_line_entries():
+    lines = ["8.8.8.8 and 1.1.1.1\n", "\n", "  example.com \n", "300.1.1.1 bad\n"]
+    assert list(iter_line_entries(lines)) == ["8.8.8.8", "1.1.1.1", "example.com"]
+
+
+def test_user_agents_are_interned(log):
+    ips, user_agents = apache_ipext(log)
+    assert len(ips) == len(user_agents) == 12
+    assert user_agents.distinct == 1
+    assert user_agents[0] == user_agents[-1] == "curl/8.0"
+
+    column = UserAgentColumn(["a", "b", "a"])
+    assert list(column) == ["a", "b", "a"]
+    assert column[1:] == ["b", "a"]
+    assert column.ids.tolist() == [0, 1, 0]
+    merged = UserAgentColumn(table=column.table)
+    merged.extend(column)
+    merged.append("c")
+    assert list(merged) == ["a", "b", "a", "c"]
+    assert merged.distinct == column.distinct == 3
@@ -0,0 +1,49 @@
+import os
+
+from holmesMod.utils.multifile import expand_inputs, merged_output_name, run_multi
+
+
+def _log(ip, agent):
+    return f'{ip} - - [10/Oct/2026:01:00:00 +0000] "GET / HTTP/1.1" 200 5 "-" "{agent}"\n'
+
+
+def test_expand_inputs(tmp_path):
+    (tmp_path / "logs" / "old").mkdir(parents=True)
+    (tmp_path / "logs" / "b.log").write_text("")
+    (tmp_path / "logs" / "a.log").write_text("")
+    (tmp_path / "logs" / ".hidden").write_text("")
+    (tmp_path / "logs" / "old" / "c.log").write_text("")
+    logs = str(tmp_path / "logs")
+    files = expand_inputs([logs, os.path.join(logs, "*.log"), os.path.join(logs, "missing.log")])
+    assert [os.path.relpath(path, logs) for path in files] == ["a.log", "b.log", "old/c.log", "missing.log"]
+
+
+def test_merged_run_shares_one_output(tmp_path):
+    first, second = tmp_path / "first.log", tmp_path / "second.log"
+    first.write_text(_log("8.8.8.8", "curl") + _log("1.1.1.1", "wget"))
+    second.write_text(_log("8.8.8.8", "wget"))
+    runs = []
+
+    def ipcheck(ips, output_path, user_agents, cache):
+        runs.append((ips, output_path, list(user_agents)))
+        cache.update(dict.fromkeys(ips))
+
+    run_multi("apache", [str(first), str(second)], ipcheck, lambda name: f"out/{os.path.basename(name)}")
+    assert runs == [(["8.8.8.8", "1.1.1.1", "8.8.8.8"], "out/first_and_1_more", ["curl", "wget", "wget"])]
+    assert merged_output_name(["a/x.log", "b", "c"]) == "x_and_2_more"
+
+
+def test_per_file_run_shares_the_cache(tmp_path):
+    first, second, empty = tmp_path / "first.txt", tmp_path / "second.txt", tmp_path / "empty.txt"
+    first.write_text("8.8.8.8\n1.1.1.1\n")
+    second.write_text("8.8.8.8\n")
+    empty.write_text("")
+    caches = []
+
+    def ipcheck(ips, output_path, user_agents, cache):
+        assert user_agents is None
+        caches.append((os.path.basename(output_path), set(cache)))
+        cache.update(dict.fromkeys(ip.strip() for ip in ips))
+
+    run_multi("check", [str(first), str(second), str(empty)], ipcheck, lambda path: path, per_file=True)
+    assert caches == [("first.txt", set()), ("second.txt", {"8.8.8.8", "1.1.1.1"})]
@@ -0,0 +1,33 @@
+from holmesMod.utils.outsource import OutsourceIndex
+
+
+def _index(*entries):
+    index = OutsourceIndex()
+    for entry, category in entries:
+        index.add(entry, category)
+    return index
+
+
+def test_domains_match_themselves_and_subdomains():
+    index = _index(("evil.example", "MALWARE"), ("Tracker.NET.", "ADS"))
+    assert index.get("evil.example") == ["MALWARE"]
+    assert index.get("cdn.EVIL.example.") == ["MALWARE"]
+    assert index.get("a.b.tracker.net") == ["ADS"]
+    assert index.get("notevil.example") is None
+    assert index.get("example", "N/A") == "N/A"
+
+
+def test_wildcards_only_match_subdomains():
+    index = _index(("*.badcdn.net", "CDN"))
+    assert index.get("x.badcdn.net") == ["CDN"]
+    assert index.get("badcdn.net") is None
+
+
+def test_ips_are_exact_and_most_specific_match_comes_first():
+    index = _index(("8.8.8.8", "DNS"), ("8.8.8.0/24", "RANGE"), ("example.com", "SITE"),
+                   ("*.example.com", "SUB"), ("api.example.com", "API"), ("api.example.com", "API"))
+    assert index.get("8.8.8.8") == ["DNS"]
+    assert index.get("8.8.8.9") is None
+    assert index.get("8.8.8.0/24") == ["RANGE"]
+    assert index.get("api.example.com") == ["API", "SITE", "SUB"]
+    assert len(index) == 5
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from holmesMod.utils import parallel
+from holmesMod.utils.parallel import ShardedEnricher
+from holmesMod.utils.records import IPRecord
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason="workers inherit the stubs through fork")
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    # Workers are forked after this, so they see the stubs too
+    def enrich(entry, virtot, user_agent, no_rdns, readers, outsrc_index):
+        if entry == "bad":
+            return None, "unresolved"
+        return IPRecord(ip=entry, category=str(os.getpid())), None
+
+    monkeypatch.setattr(parallel, '_enrich_record', enrich)
+    monkeypatch.setattr(parallel, 'open_geo_readers', lambda mode=None: {})
+    monkeypatch.setattr(parallel, 'load_outsrc_index', lambda: None)
+
+
+def test_records_come_back_for_each_entry_across_workers():
+    entries = [f"10.0.{i // 256}.{i % 256}" for i in range(300)]
+    with ShardedEnricher(entries + ["bad", " 10.0.0.1 "], workers=3, chunksize=4) as sharded:
+        records = [sharded.record_for(entry) for entry in entries]
+        assert sharded.record_for("bad") is None
+        assert sharded._done == 301
+    assert [record.ip for record in records] == entries
+    # Enriched in the workers, not here
+    assert str(os.getpid()) not in {record.category for record in records}
+
+
+def test_unique_entries_are_not_deduplicated_again():
+    with ShardedEnricher(["8.8.8.8", "1.1.1.1"], workers=2, unique=True) as sharded:
+        assert sharded.record_for("1.1.1.1").ip == "1.1.1.1"
+        assert sharded.record_for("8.8.8.8").ip == "8.8.8.8"
+        assert sharded.record_for("9.9.9.9") is None
@@ -0,0 +1,112 @@
+import random
+import time
+
+import pytest
+
+from holmesMod.utils import ip_checker
+from holmesMod.utils import pipeline as pipeline_mod
+from holmesMod.utils.bogon import BUILTIN_RANGES, BogonFilter, BogonTable
+from holmesMod.utils.pipeline import Deduper, StagedPipeline, parse_stage_workers
+from holmesMod.utils.records import IPRecord
+
+
+def _jitter(value):
+    time.sleep(random.random() / 1000)
+    return value
+
+
+def test_output_keeps_source_order_with_parallel_stages():
+    seen = []
+
+    def record(value):
+        seen.append(value)
+        return value
+
+    pipeline = (StagedPipeline(range(200), queue_size=2)
+                .stage('square', lambda n: _jitter(n * n), workers=8)
+                .stage('ordered', record, ordered=True)
+                .stage('label', lambda n: _jitter(f"#{n}"), workers=4))
+    assert list(pipeline.run()) == [f"#{n * n}" for n in range(200)]
+    assert seen == [n * n for n in range(200)]
+
+
+def test_window_bounds_items_in_flight():
+    read = []
+
+    def source():
+        for n in range(100):
+            read.append(n)
+            yield n
+
+    pipeline = StagedPipeline(source(), queue_size=1, window=5).stage('double', lambda n: n * 2, workers=3)
+    results = pipeline.run()
+    assert next(results) == 0
+    time.sleep(0.2)
+    assert len(read) <= 7
+    assert list(results) == [n * 2 for n in range(1, 100)]
+
+
+def test_stage_error_is_raised():
+    def fail(n):
+        if n == 5:
+            raise ValueError("boom")
+        return n
+
+    pipeline = StagedPipeline(range(20)).stage('fail', fail, workers=4)
+    with pytest.raises(ValueError):
+        list(pipeline.run())
+
+
+def test_deduper_shares_futures_and_drops_bogons():
+    bogons = BogonFilter(BogonTable(BUILTIN_RANGES))
+    dedupe = Deduper(bogons)
+    marked = dedupe([("8.8.8.8", "ua1"), ("10.0.0.1", None), ("8.8.8.8", "ua2"), ("1.1.1.1", None)])
+    assert [(entry, ua, owner) for entry, ua, _, owner in marked] == [
+        ("8.8.8.8", "ua1", True), ("8.8.8.8", "ua2", False), ("1.1.1.1", None, True)]
+    assert marked[0][2] is marked[1][2]
+    assert bogons.total == 1
+
+
+def test_deduper_forgets_least_recently_seen():
+    dedupe = Deduper(max_entries=2)
+    dedupe([("a", None), ("b", None), ("a", None), ("c", None)])
+    assert list(dedupe.futures) == ["a", "c"]
+    [(_, _, _, owner)] = dedupe([("b", None)])
+    assert owner
+
+
+@pytest.mark.parametrize("options", [dict(queue_size=0), dict(queue_size=-1), dict(window=0)])
+def test_sizes_below_one_are_rejected(options):
+    with pytest.raises(ValueError):
+        StagedPipeline(range(3), **options)
+
+
+def test_parse_stage_workers():
+    assert parse_stage_workers("enrich=4") == {'extract': 1, 'enrich': 4}
+    with pytest.raises(ValueError):
+        parse_stage_workers("write=2")
+
+
+def test_run_pipeline_writes_the_same_rows_as_ipcheck_mod(tmp_path, monkeypatch):
+    def enrich(entry, virtot, user_agent, no_rdns, readers, outsrc_index):
+        _jitter(None)
+        if entry == "unknown.invalid":
+            return None, "unresolved"
+        return IPRecord(ip=entry, country='US'), None
+
+    for module in (pipeline_mod, ip_checker):
+        monkeypatch.setattr(module, '_enrich_record', enrich)
+        monkeypatch.setattr(module, 'open_geo_readers', lambda: {})
+        monkeypatch.setattr(module, 'load_outsrc_index', lambda: None)
+        monkeypatch.setattr(module, 'create_excel_report', lambda path: None)
+
+    entries = [f"8.8.{i % 7}.{i % 5}" for i in range(100)] + ["unknown.invalid", "10.0.0.1"]
+    source = tmp_path / "ips.txt"
+    source.write_text("\n".join(entries) + "\n")
+    bogons = BogonFilter(BogonTable(BUILTIN_RANGES))
+    pipeline_mod.run_pipeline("check", [str(source)], str(tmp_path / "piped.csv"), no_rdns=True, bogons=bogons,
+                              stage_workers={'extract': 2, 'enrich': 4}, queue_size=2, batch_size=8)
+    ip_checker.ipcheck_mod(entries, str(tmp_path / "plain.csv"), no_rdns=True,
+                           bogons=BogonFilter(BogonTable(BUILTIN_RANGES)))
+    assert (tmp_path / "piped.csv").read_text() == (tmp_path / "plain.csv").read_text()
+    assert bogons.total == 1
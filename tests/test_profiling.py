@@ -0,0 +1,46 @@
+import glob
+import pstats
+import sys
+import threading
+
+import pytest
+
+from holmesMod import main
+from holmesMod.utils.profiling import run_profiled
+
+
+def busy_in_worker_thread():
+    return sum(i * i for i in range(20000))
+
+
+def test_cprofile_includes_threads_started_by_the_run(tmp_path):
+    def run():
+        worker = threading.Thread(target=busy_in_worker_thread)
+        worker.start()
+        worker.join()
+        return "done"
+
+    assert run_profiled(run, str(tmp_path)) == "done"
+    [raw] = glob.glob(str(tmp_path / "*.prof"))
+    functions = {name for _, _, name in pstats.Stats(raw).stats}
+    assert 'busy_in_worker_thread' in functions
+    [report] = glob.glob(str(tmp_path / "*.txt"))
+    assert "Threads profiled: 2" in open(report).read()
+
+
+def test_memory_report(tmp_path):
+    run_profiled(lambda: [bytearray(1024) for _ in range(1000)], str(tmp_path), memory=True)
+    [report] = glob.glob(str(tmp_path / "*.txt"))
+    text = open(report).read()
+    assert "Traced memory:" in text
+    assert "still held at exit" in text
+
+
+def test_sampler_refuses_pipeline(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['holmesMod', '--check', 'ips.txt', '--pipeline', '--profile', 'sample'])
+    monkeypatch.setattr(main, 'ensure_dirs_exist', lambda: None)
+    monkeypatch.setattr(main, 'setup_logging', lambda stream=None: None)
+    monkeypatch.setattr(main, 'display_banner', lambda: None)
+    monkeypatch.setattr(main, 'display_guides', lambda: None)
+    with pytest.raises(SystemExit):
+        main.main()
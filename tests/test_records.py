@@ -0,0 +1,62 @@
+import math
+from types import SimpleNamespace
+
+from holmesMod.utils.ip_checker import _geo_record
+from holmesMod.utils.records import MISSING, ColumnBuffer, IPRecord, nullable, record_schema
+
+RECORD = IPRecord(ip="8.8.8.8", city="Mountain View", latitude=37.4, longitude=None, asn_number=15169,
+                  reverse_dns="dns.google", certificate_cn="dns.google", user_agent="curl")
+
+
+def test_schema_follows_the_run_flags():
+    assert record_schema(True, False, False).header == [
+        'IP Address', 'IP Category', 'City', 'City Latitude', 'City Longitude', 'Country', 'Country Code',
+        'Continent', 'ASN Number', 'ASN Organization', 'Network']
+    full = record_schema(False, True, True)
+    assert full.header[-4:] == ['Reverse DNS', 'Certificate CN', 'Domain Registrar URL', 'User Agent']
+    assert record_schema(True, False, False) is record_schema(True, False, False)
+
+
+def test_rows_and_dicts_use_the_missing_placeholder():
+    schema = record_schema(False, True, True)
+    row = schema.to_row(RECORD)
+    assert row[:5] == ["8.8.8.8", MISSING, "Mountain View", 37.4, MISSING]
+    assert schema.to_dict(RECORD)['User Agent'] == "curl"
+    assert schema.to_dict(RECORD)['Domain Registrar URL'] == MISSING
+    assert [nullable(value) for value in ("N/A", "", None, "x")] == [None, None, None, "x"]
+
+
+def test_column_buffer_round_trips_rows():
+    schema = record_schema(True, False, False)
+    buffer = ColumnBuffer(schema)
+    buffer.extend([RECORD, IPRecord(ip="1.1.1.1", latitude=-33.5)])
+    assert len(buffer) == 2
+    assert math.isnan(buffer.columns['longitude'][0])
+    assert list(buffer.rows()) == [schema.to_row(RECORD), schema.to_row(IPRecord(ip="1.1.1.1", latitude=-33.5))]
+    frame = buffer.tail(1)
+    assert frame['IP Address'].tolist() == ["1.1.1.1"]
+    assert frame['City Longitude'].tolist() == [MISSING]
+    buffer.clear()
+    assert len(buffer) == 0
+
+
+class FakeReader:
+    def __init__(self, **answers):
+        for method, answer in answers.items():
+            setattr(self, method, lambda ip, answer=answer: answer)
+
+
+def test_geo_record_keeps_zero_coordinates_missing():
+    city = SimpleNamespace(city=SimpleNamespace(names={'en': 'Null Island'}),
+                           location=SimpleNamespace(latitude=0.0, longitude=0.0),
+                           continent=SimpleNamespace(names={'en': 'Africa'}))
+    country = SimpleNamespace(country=SimpleNamespace(names={'en': 'Nowhere'}, iso_code='ZZ'))
+    asn = SimpleNamespace(autonomous_system_number=64500, autonomous_system_organization='TEST',
+                          ip_address='203.0.113.0', prefix_len=24)
+    readers = {'city': FakeReader(city=city), 'country': FakeReader(country=country), 'asn': FakeReader(asn=asn)}
+    record = _geo_record.uncached("203.0.113.5", readers)
+    assert (record.latitude, record.longitude) == (None, None)
+    assert (record.city, record.country_code, record.network) == ('Null Island', 'ZZ', '203.0.113.0/24')
+
+    readers['asn'] = None
+    assert _geo_record.uncached("203.0.113.5", readers) is None
@@ -0,0 +1,129 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from holmesMod.utils import engine, server
+from holmesMod.utils.records import IPRecord
+
+
+class FakeDatabases:
+    def __init__(self, check_interval=None, on_reload=None):
+        self.on_reload = on_reload
+
+    def start_watching(self):
+        pass
+
+    def build_epochs(self):
+        return {'city': 1}
+
+    def build_dates(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    # LookupService without GeoIP databases or outsource lists; enrichment records its
+    # (entry, virtot) calls and cannot enrich "bad"
+    calls = []
+
+    def enrich(entry, virtot, user_agent, no_rdns, readers, outsrc_index):
+        calls.append((entry, virtot))
+        if entry == "bad":
+            return None, None
+        return IPRecord(ip=entry, category='Public', country='US'), None
+
+    monkeypatch.setattr(engine, '_enrich_record', enrich)
+    monkeypatch.setattr(server, 'GeoDatabases', FakeDatabases)
+    monkeypatch.setattr(server, 'load_outsrc_index', lambda: None)
+    return calls
+
+
+@pytest.fixture
+def daemon(calls):
+    service = server.LookupService(no_rdns=True)
+    httpd = server.create_server("127.0.0.1:0", service)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _post(port, body, headers=None, path="/lookup"):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("POST", path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    status, data = response.status, response.read()
+    conn.close()
+    return status, data
+
+
+def test_repeated_entries_are_enriched_once(calls):
+    service = server.LookupService(no_rdns=True)
+    results = list(service.lookup(["8.8.8.8", "bad", " 8.8.8.8 "], user_agents=["curl"]))
+    assert [entry for entry, _ in results] == ["8.8.8.8", "bad", "8.8.8.8"]
+    assert results[1][1] is None
+    assert results[0][1]['User Agent'] == "curl"
+    assert results[2][1]['User Agent'] == "N/A"
+    assert calls == [("8.8.8.8", False), ("bad", False)]
+
+
+def test_virtot_needs_a_service_started_with_it(calls):
+    list(server.LookupService(no_rdns=True).lookup(["8.8.8.8"], virtot=True))
+    list(server.LookupService(virtot=True, no_rdns=True).lookup(["1.1.1.1"], virtot=True))
+    list(server.LookupService(virtot=True, no_rdns=True).lookup(["9.9.9.9"], virtot=False))
+    assert calls == [("8.8.8.8", False), ("1.1.1.1", True), ("9.9.9.9", False)]
+
+
+def test_lookup_json(daemon):
+    status, data = _post(daemon, json.dumps({"entries": ["8.8.8.8", "bad"], "virtot": True}))
+    body = json.loads(data)
+    assert status == 200
+    assert [record['IP Address'] for record in body['results']] == ["8.8.8.8"]
+    assert body['skipped'] == ["bad"]
+    assert 'Certificate CN' not in body['results'][0]
+
+
+def test_lookup_ndjson(daemon):
+    status, data = _post(daemon, json.dumps(["8.8.8.8", "bad"]), {"Accept": "application/x-ndjson"})
+    lines = [json.loads(line) for line in data.decode().splitlines()]
+    assert status == 200
+    assert lines == [{**lines[0], 'IP Address': "8.8.8.8"}, {"entry": "bad", "skipped": True}]
+
+
+@pytest.mark.parametrize("body, headers", [
+    ("[1", None),
+    ('{"entries": "8.8.8.8"}', None),
+    ('{"entries": ["8.8.8.8"], "user_agents": [1]}', None),
+    ('["8.8.8.8"]', {"Content-Length": "ten"}),
+])
+def test_bad_requests_get_400(daemon, body, headers):
+    status, data = _post(daemon, body, headers)
+    assert status == 400
+    assert "error" in json.loads(data)
+
+
+def test_reload_drops_cached_records(calls):
+    service = server.LookupService(no_rdns=True)
+    list(service.lookup(["8.8.8.8"]))
+    service.readers.on_reload(['city'])
+    list(service.lookup(["8.8.8.8"]))
+    assert calls == [("8.8.8.8", False)] * 2
+
+
+def test_lookup_running_across_a_reload_is_not_cached(monkeypatch, calls):
+    service = server.LookupService(no_rdns=True)
+
+    def enrich_during_reload(entry, virtot, user_agent, no_rdns, readers, outsrc_index):
+        calls.append((entry, virtot))
+        service.readers.on_reload(['city'])
+        return IPRecord(ip=entry), None
+
+    monkeypatch.setattr(engine, '_enrich_record', enrich_during_reload)
+    list(service.lookup(["8.8.8.8"]))
+    assert service.stats()['cached_entries'] == 0
@@ -0,0 +1,56 @@
+import random
+from collections import Counter
+
+import pytest
+
+from holmesMod.utils.sketch import HyperLogLog, SpaceSaving, find_heavy_hitters
+
+
+def test_space_saving_exact_while_under_capacity():
+    sketch = SpaceSaving(10)
+    for item in "aabbbc":
+        sketch.add(item)
+    assert sketch.top(2) == [('b', 3, 0), ('a', 2, 0)]
+    assert sketch.total == 6
+
+
+def test_space_saving_keeps_heavy_hitters_with_bounded_error():
+    rng = random.Random(1)
+    stream = ['heavy1'] * 500 + ['heavy2'] * 300 + [f"noise{rng.randrange(5000)}" for _ in range(2000)]
+    rng.shuffle(stream)
+    truth = Counter(stream)
+    sketch = SpaceSaving(20)
+    for item in stream:
+        sketch.add(item)
+    top = sketch.top(2)
+    assert [item for item, _, _ in top] == ['heavy1', 'heavy2']
+    for item, count, error in top:
+        # Overestimate by at most the reported error
+        assert truth[item] <= count <= truth[item] + error
+
+
+def test_hyperloglog_estimate_is_close():
+    hll = HyperLogLog()
+    for i in range(20000):
+        hll.add(f"10.0.{i // 256}.{i % 256}")
+        hll.add(f"10.0.{i // 256}.{i % 256}")
+    assert abs(hll.count() - 20000) < 20000 * 0.03
+
+
+def test_hyperloglog_small_range():
+    hll = HyperLogLog()
+    for item in ("a", "b", "c", "a"):
+        hll.add(item)
+    assert hll.count() == 3
+
+
+def test_find_heavy_hitters():
+    top, total, distinct = find_heavy_hitters(["1.1.1.1"] * 3 + ["8.8.8.8"], 1)
+    assert top == [("1.1.1.1", 3, 0)]
+    assert (total, distinct) == (4, 2)
+
+
+@pytest.mark.parametrize("k", [0, -1])
+def test_capacity_below_one_is_rejected(k):
+    with pytest.raises(ValueError):
+        find_heavy_hitters(["1.1.1.1"], k)
@@ -0,0 +1,48 @@
+import io
+import json
+
+import pytest
+
+from holmesMod.utils import engine
+from holmesMod.utils.bogon import BUILTIN_RANGES, BogonFilter, BogonTable
+from holmesMod.utils.records import IPRecord
+from holmesMod.utils.stream import StreamEnricher, stream_stdin
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def enrich(entry, virtot, user_agent, no_rdns, readers, outsrc_index):
+        calls.append(entry)
+        if entry == "unknown.invalid":
+            return None, "unresolved"
+        return IPRecord(ip=entry, country='US'), None
+
+    monkeypatch.setattr(engine, '_enrich_record', enrich)
+    monkeypatch.setattr(engine, 'open_geo_readers', lambda: {})
+    monkeypatch.setattr(engine, 'load_outsrc_index', lambda: None)
+    return calls
+
+
+def test_recent_records_are_reused_within_the_lru(calls):
+    enricher = StreamEnricher(engine.EnrichmentEngine(no_rdns=True), cache_size=2)
+    entries = ["8.8.8.8", "1.1.1.1", "8.8.8.8", "9.9.9.9", "1.1.1.1"]
+    assert [record.ip for record in enricher.enrich(entries)] == entries
+    assert calls == ["8.8.8.8", "1.1.1.1", "9.9.9.9", "1.1.1.1"]
+
+
+def test_stream_writes_one_line_per_record(calls):
+    out = io.StringIO()
+    stdin = io.StringIO("8.8.8.8\n10.0.0.1\nunknown.invalid\n1.1.1.1 8.8.8.8\n")
+    stream_stdin(out, no_rdns=True, bogons=BogonFilter(BogonTable(BUILTIN_RANGES)), stdin=stdin)
+    lines = out.getvalue().splitlines()
+    assert lines[0].startswith("IP Address,")
+    assert [line.split(",")[0] for line in lines[1:]] == ["8.8.8.8", "1.1.1.1", "8.8.8.8"]
+    assert calls == ["8.8.8.8", "unknown.invalid", "1.1.1.1"]
+
+
+def test_stream_ndjson(calls):
+    out = io.StringIO()
+    stream_stdin(out, no_rdns=True, ndjson=True, stdin=io.StringIO("8.8.8.8\n"))
+    assert [json.loads(line)['Country'] for line in out.getvalue().splitlines()] == ["US"]
@@ -0,0 +1,100 @@
+import csv
+import os
+
+import pytest
+
+from holmesMod.utils import ip_checker, parallel
+from holmesMod.utils.checkpoint import load_vt_results
+from holmesMod.utils.records import IPRecord
+from holmesMod.utils.vtplan import VTPlanner, WindowedVTPlan, vt_target
+
+
+def _record(ip, reverse_dns=None):
+    return IPRecord(ip=ip, category='Public', asn_number=15169, asn_org='GOOGLE', reverse_dns=reverse_dns)
+
+
+def test_shared_targets_cost_one_call_busiest_first():
+    calls = []
+
+    def lookup(target):
+        calls.append(target)
+        return f"cn-{target}", f"reg-{target}"
+
+    planner = VTPlanner(lookup)
+    planner.add("8.8.8.8", _record("8.8.8.8", "dns.google"), hits=1)
+    planner.add("8.8.4.4", _record("8.8.4.4", "dns.google"), hits=1)
+    planner.add("1.1.1.1", _record("1.1.1.1"), hits=5)
+    planner.add("bad", None)
+    planner.execute()
+    assert calls == ["1.1.1.1", "dns.google"]
+
+    records = dict(planner.records())
+    assert records["bad"] is None
+    assert records["8.8.4.4"].certificate_cn == "cn-dns.google"
+    # An IP target's registrar comes from the local ASN data
+    assert records["1.1.1.1"].registrar == "AS15169 (GOOGLE)"
+    assert vt_target("example.com", _record("93.184.216.34")) == "example.com"
+
+
+def test_budget_is_shared_across_batches():
+    planner = VTPlanner(lambda target: ("cn", "reg"), budget=2)
+    planner.add("1.1.1.1", _record("1.1.1.1"), hits=3)
+    planner.add("8.8.8.8", _record("8.8.8.8"), hits=2)
+    planner.add("9.9.9.9", _record("9.9.9.9"), hits=1)
+    planner.execute()
+    planner.add("4.4.4.4", _record("4.4.4.4"), hits=9)
+    planner.execute()
+    assert planner.calls == 2
+    records = dict(planner.records())
+    assert records["9.9.9.9"].certificate_cn is None
+    assert records["4.4.4.4"].certificate_cn is None
+
+
+def test_windowed_plan_logs_and_reuses_answers(tmp_path, monkeypatch):
+    monkeypatch.setattr('holmesMod.utils.vtplan._enrich_record',
+                        lambda entry, *args: (_record(entry), None))
+    results_path = str(tmp_path / "run.csv.vt")
+    calls = []
+    entries = ["1.1.1.1", "8.8.8.8", "1.1.1.1", "9.9.9.9"]
+    plan = WindowedVTPlan(entries, {}, None, True, {}, None, window=2, results_path=results_path,
+                          lookup=lambda target: calls.append(target) or (f"cn-{target}", "reg"))
+    plan.prepare(0)
+    assert calls == ["1.1.1.1", "8.8.8.8"]
+    plan.close()
+    assert load_vt_results(results_path) == {"1.1.1.1": ("cn-1.1.1.1", "reg"), "8.8.8.8": ("cn-8.8.8.8", "reg")}
+
+    calls.clear()
+    cache = {}
+    resumed = WindowedVTPlan(entries, cache, None, True, {}, None, window=2, results_path=results_path,
+                             lookup=lambda target: calls.append(target) or (f"cn-{target}", "reg"))
+    resumed.prepare(0)
+    resumed.prepare(2)
+    resumed.close()
+    assert calls == ["9.9.9.9"] and resumed.reused == 2
+    assert cache["8.8.8.8"].certificate_cn == "cn-8.8.8.8"
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="workers inherit the stubs through fork")
+def test_workers_make_the_virustotal_calls(tmp_path, monkeypatch):
+    # Forked workers see this stub and tag each record with the process that looked it up
+    def enrich(entry, virtot, user_agent, no_rdns, readers, outsrc_index):
+        return _record(entry)._replace(certificate_cn=str(os.getpid()) if virtot else None), None
+
+    def no_plan(*args, **kwargs):
+        pytest.fail("the VirusTotal plan ran in the parent process")
+
+    monkeypatch.setattr(parallel, '_enrich_record', enrich)
+    monkeypatch.setattr(parallel, 'open_geo_readers', lambda mode=None: {})
+    monkeypatch.setattr(parallel, 'load_outsrc_index', lambda: None)
+    for name, stub in (('open_geo_readers', lambda: {}), ('load_outsrc_index', lambda: None),
+                       ('create_excel_report', lambda path: None), ('_start_vt_plan', no_plan)):
+        monkeypatch.setattr(ip_checker, name, stub)
+
+    entries = [f"10.1.{i // 256}.{i % 256}" for i in range(40)]
+    output = str(tmp_path / "run.csv")
+    ip_checker.ipcheck_mod(entries, output, virtot=True, no_rdns=True, workers=2)
+    with open(output, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['IP Address'] for row in rows] == entries
+    callers = {row['Certificate CN'] for row in rows}
+    assert '' not in callers and str(os.getpid()) not in callers
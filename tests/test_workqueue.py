@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from holmesMod.utils import workqueue
+from holmesMod.utils.records import IPRecord
+from holmesMod.utils.workqueue import DONE, FAILED, PENDING, MemoryQueue, QueueEnricher, SQLiteQueue, open_queue
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def queue(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryQueue()
+    return SQLiteQueue(str(tmp_path / "queue.db"))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(workqueue.time, 'time', lambda: now[0])
+    return now
+
+
+def test_units_are_leased_once_in_order(queue, clock):
+    queue.start_run([["a", "b"], ["c"]], {'no_rdns': True})
+    assert queue.run_info()['options'] == {'no_rdns': True}
+    first = queue.lease("w1", 60)
+    second = queue.lease("w2", 60)
+    assert first[1] == ["a", "b"] and second[1] == ["c"]
+    assert queue.lease("w3", 60) is None
+
+
+def test_expired_lease_is_requeued_then_failed(queue, clock):
+    queue.start_run([["a"]], {})
+    unit_id, _ = queue.lease("w1", 10)
+    assert queue.requeue_expired(2) == (0, 0)
+    clock[0] += 11
+    assert queue.renew(unit_id, "w1", 10)
+    clock[0] += 11
+    assert queue.requeue_expired(2) == (1, 0)
+    assert queue.counts() == {PENDING: 1}
+    assert not queue.renew(unit_id, "w1", 10)
+
+    assert queue.lease("w2", 10)[0] == unit_id
+    clock[0] += 11
+    assert queue.requeue_expired(2) == (0, 1)
+    assert queue.take_finished() == [(unit_id, FAILED, None, [])]
+
+
+def test_late_result_is_accepted_until_completed(queue, clock):
+    queue.start_run([["8.8.8.8", "bad"]], {})
+    unit_id, _ = queue.lease("w1", 10)
+    clock[0] += 11
+    queue.requeue_expired(3)
+    results = [("8.8.8.8", IPRecord(ip="8.8.8.8", asn_number=15169)), ("bad", None)]
+    assert queue.complete(unit_id, "w1", results)
+    assert not queue.complete(unit_id, "w2", [])
+    assert queue.take_finished() == [(unit_id, DONE, "w1", results)]
+    assert queue.take_finished() == []
+
+
+def test_open_queue(tmp_path):
+    assert isinstance(open_queue("memory:"), MemoryQueue)
+    assert isinstance(open_queue(f"sqlite:{tmp_path / 'q.db'}"), SQLiteQueue)
+    assert isinstance(open_queue(str(tmp_path / "plain.db")), SQLiteQueue)
+
+
+def test_coordinator_gets_records_from_a_worker(monkeypatch):
+    def enrich(entry, virtot, user_agent, no_rdns, readers, outsrc_index):
+        if entry == "bad":
+            return None, "unresolved"
+        return IPRecord(ip=entry, reverse_dns=None if no_rdns else "host"), None
+
+    monkeypatch.setattr(workqueue, '_enrich_record', enrich)
+    monkeypatch.setattr(workqueue, 'open_geo_readers', lambda: {})
+    monkeypatch.setattr(workqueue, 'load_outsrc_index', lambda: None)
+
+    queue = MemoryQueue()
+    entries = ["8.8.8.8", "bad", "1.1.1.1", "8.8.8.8", "9.9.9.9"]
+    worker = threading.Thread(target=workqueue.run_worker, args=(queue, "w1"),
+                              kwargs={'poll_interval': 0.01, 'once': True})
+    with QueueEnricher(entries, queue, no_rdns=True, unit_size=2, poll_interval=0.01) as enricher:
+        worker.start()
+        records = [enricher.record_for(entry) for entry in entries]
+    worker.join(5)
+    assert not worker.is_alive()
+    assert [record.ip if record else None for record in records] == ["8.8.8.8", None, "1.1.1.1", "8.8.8.8", "9.9.9.9"]
+    assert records[0].reverse_dns is None
+    assert enricher._per_worker == {"w1": 4}